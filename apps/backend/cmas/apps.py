@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+class CmasConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'cmas'
+    verbose_name = 'Church Member Acquisition System'
+    
+    def ready(self):
+        # Registers the cache invalidation receivers; import errors must surface
+        import cmas.signals  # noqa F401
@@ -5,16 +5,23 @@ from django.utils import timezone
 from datetime import timedelta
 from apps.guests.models import GuestProfile, GuestVisit
 from apps.members.models import MemberProfile
+from core.result_cache import cached_result
 from .models import SpiritualDecision, GrowthCampaign, OutreachChannel
 
 logger = logging.getLogger(__name__)
 
+
+def _branch_scope(engine, *args, **kwargs):
+    return engine.branch.pk if engine.branch else None
+
+
 class CMASAnalyticsEngine:
     """Advanced analytics engine for Church Member Acquisition System"""
     
     def __init__(self, branch=None):
         self.branch = branch
     
+    @cached_result('cmas', branch_id=_branch_scope)
     def get_growth_metrics(self, period_days=30):
         """Get comprehensive growth metrics for the specified period"""
         end_date = timezone.now().date()
@@ -71,6 +78,7 @@ class CMASAnalyticsEngine:
             'average_visits_per_guest': round(total_visits / max(new_guests, 1), 1)
         }
     
+    @cached_result('cmas', branch_id=_branch_scope)
     def get_funnel_analysis(self, campaign_id=None):
         """Analyze guest conversion funnel"""
         funnel_data = {
@@ -123,6 +131,7 @@ class CMASAnalyticsEngine:
             )
         }
     
+    @cached_result('cmas', branch_id=_branch_scope)
     def get_campaign_performance(self):
         """Get performance metrics for all campaigns"""
         campaigns = GrowthCampaign.objects.all()
@@ -172,6 +181,7 @@ class CMASAnalyticsEngine:
         
         return round(cost_per_guest, 2)
     
+    @cached_result('cmas', branch_id=_branch_scope)
     def get_trend_analysis(self, period='weekly', weeks=12):
         """Get trend data for key metrics over time"""
         end_date = timezone.now()
@@ -0,0 +1,17 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from core.result_cache import bump_version
+from guests.models import GuestProfile, GuestVisit
+from .models import SpiritualDecision, GrowthCampaign
+
+@receiver([post_save, post_delete], sender=GuestProfile)
+@receiver([post_save, post_delete], sender=GuestVisit)
+@receiver([post_save, post_delete], sender=GrowthCampaign)
+def invalidate_branch_analytics(sender, instance, **kwargs):
+    """Drop cached CMAS analytics for the branch the record belongs to"""
+    bump_version('cmas', instance.branch_id)
+
+@receiver([post_save, post_delete], sender=SpiritualDecision)
+def invalidate_decision_analytics(sender, instance, **kwargs):
+    branch_id = GuestProfile.objects.filter(pk=instance.guest_id).values_list('branch_id', flat=True).first()
+    bump_version('cmas', branch_id)
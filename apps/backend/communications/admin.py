@@ -1,7 +1,9 @@
 from django.contrib import admin
 from .models import (
     CommunicationChannel, MessageTemplate, MessageCampaign, 
-    Message, Conversation, ConversationMessage, UserCommunicationPreference
+    Message, Conversation, ConversationMessage, UserCommunicationPreference,
+    SuppressionEntry, ContactPoint, AnnouncementReceipt, Notification,
+    NotificationDigestEntry
 )
 
 @admin.register(CommunicationChannel)
@@ -28,7 +30,7 @@ class MessageCampaignAdmin(admin.ModelAdmin):
 class MessageAdmin(admin.ModelAdmin):
     list_display = ['id', 'channel', 'to_user', 'status', 'sent_at', 'created_at']
     list_filter = ['channel', 'status', 'message_type']
-    search_fields = ['to_user__email', 'content']
+    search_fields = ['to_user__email', 'content', 'body__content']
     readonly_fields = ['sent_at', 'delivered_at', 'read_at']
 
 @admin.register(Conversation)
@@ -47,3 +49,34 @@ class UserCommunicationPreferenceAdmin(admin.ModelAdmin):
     list_display = ['user', 'channel', 'is_enabled', 'opt_in_date']
     list_filter = ['channel', 'is_enabled']
     search_fields = ['user__email']
+
+@admin.register(SuppressionEntry)
+class SuppressionEntryAdmin(admin.ModelAdmin):
+    list_display = ['value', 'contact_type', 'reason', 'source', 'created_at']
+    list_filter = ['contact_type', 'reason', 'source']
+    search_fields = ['value']
+
+@admin.register(ContactPoint)
+class ContactPointAdmin(admin.ModelAdmin):
+    list_display = ['user', 'contact_type', 'value', 'is_primary', 'is_verified', 'failure_count', 'last_failure_at']
+    list_filter = ['contact_type', 'is_primary', 'is_verified']
+    search_fields = ['value', 'user__email']
+    raw_id_fields = ['user']
+
+@admin.register(AnnouncementReceipt)
+class AnnouncementReceiptAdmin(admin.ModelAdmin):
+    list_display = ['message', 'user', 'read_at']
+    raw_id_fields = ['message', 'user']
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ['user', 'title', 'notification_type', 'is_read', 'created_at']
+    list_filter = ['notification_type', 'is_read']
+    search_fields = ['title', 'user__email']
+    raw_id_fields = ['user']
+
+@admin.register(NotificationDigestEntry)
+class NotificationDigestEntryAdmin(admin.ModelAdmin):
+    list_display = ['user', 'channel_type', 'category', 'title', 'deliver_after', 'attempts']
+    list_filter = ['channel_type', 'category']
+    raw_id_fields = ['user']
@@ -3,6 +3,7 @@ from ..models import (
     CommunicationChannel, MessageTemplate, MessageCampaign, 
     Message, Conversation, ConversationMessage, UserCommunicationPreference
 )
+from ..services.conversation_read_service import ConversationReadService
 
 class CommunicationChannelSerializer(serializers.ModelSerializer):
     class Meta:
@@ -32,9 +33,14 @@ class MessageCampaignSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'name', 'description', 'template', 'template_name',
             'audience_filter', 'schedule_type', 'scheduled_for', 'status',
-            'created_by', 'created_by_name', 'audience_count', 'created_at', 'updated_at'
+            'created_by', 'created_by_name', 'audience_count',
+            'total_messages', 'queued_count', 'sent_count', 'delivered_count', 'read_count',
+            'failed_count', 'total_opens', 'total_clicks', 'created_at', 'updated_at'
+        ]
+        read_only_fields = [
+            'created_by', 'status', 'total_messages', 'queued_count', 'sent_count',
+            'delivered_count', 'read_count', 'failed_count', 'total_opens', 'total_clicks'
         ]
-        read_only_fields = ['created_by', 'status']
     
     def get_audience_count(self, obj):
         from ..services.audience_service import AudienceService
@@ -44,27 +50,36 @@ class MessageSerializer(serializers.ModelSerializer):
     channel_name = serializers.CharField(source='channel.name', read_only=True)
     from_user_name = serializers.CharField(source='from_user.get_full_name', read_only=True)
     to_user_name = serializers.CharField(source='to_user.get_full_name', read_only=True)
+    subject = serializers.CharField(source='rendered_subject', read_only=True)
+    content = serializers.CharField(source='rendered_content', read_only=True)
+    read_at = serializers.SerializerMethodField()
     
     class Meta:
         model = Message
         fields = [
             'id', 'campaign', 'template', 'channel', 'channel_name',
             'message_type', 'from_user', 'from_user_name', 'to_user', 'to_user_name',
-            'to_group', 'subject', 'content', 'variables_used', 'status',
+            'to_group', 'to_address', 'subject', 'content', 'variables_used', 'status',
             'sent_at', 'delivered_at', 'read_at', 'open_count', 'click_count',
             'error_message', 'created_at', 'updated_at'
         ]
         read_only_fields = ['sent_at', 'delivered_at', 'read_at']
+    
+    def get_read_at(self, obj):
+        # Inbox querysets annotate the reader's own read time for broadcasts
+        read_at = getattr(obj, 'user_read_at', obj.read_at)
+        return serializers.DateTimeField().to_representation(read_at) if read_at else None
 
 class ConversationSerializer(serializers.ModelSerializer):
     participant_count = serializers.SerializerMethodField()
     last_message_preview = serializers.SerializerMethodField()
+    unread_count = serializers.IntegerField(read_only=True, default=0)
     
     class Meta:
         model = Conversation
         fields = [
             'id', 'subject', 'participant_count', 'last_message_preview',
-            'last_message_at', 'created_at'
+            'unread_count', 'last_message_at', 'created_at'
         ]
     
     def get_participant_count(self, obj):
@@ -90,7 +105,12 @@ class ConversationMessageSerializer(serializers.ModelSerializer):
     def get_is_read(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return obj.read_by.filter(id=request.user.id).exists()
+            if obj.sender_id == request.user.id:
+                return True
+            # Looked up once and shared by every message in a list
+            if 'last_read_message_id' not in self.context:
+                self.context['last_read_message_id'] = ConversationReadService.watermark(request.user, obj.conversation_id)
+            return obj.id <= self.context['last_read_message_id']
         return False
 
 class UserCommunicationPreferenceSerializer(serializers.ModelSerializer):
@@ -21,6 +21,7 @@ router.register(r'analytics', AnalyticsViewSet, basename='analytics')
 urlpatterns = [
     path('', include(router.urls)),
     path('send-message/', CommunicationAPIView.as_view(), name='send-message'),
+    path('provider-events/', ProviderEventWebhookView.as_view(), name='provider-events'),
 ]
 
 
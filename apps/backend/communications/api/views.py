@@ -1,26 +1,39 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.views import APIView
+from django.conf import settings
 from django.db import transaction
 from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from core.http_cache import ResponseCacheMixin
+from core.throttling import GCRARateThrottle
 
 from ..models import (
     CommunicationChannel, MessageTemplate, MessageCampaign, 
-    Message, Conversation, ConversationMessage, UserCommunicationPreference
+    Conversation, ConversationMessage, UserCommunicationPreference
 )
 from .serializers import *
 from ..services.template_service import TemplateService
+from ..services.suppression_service import SuppressionService
+from ..services.broadcast_service import BroadcastService
+from ..services.conversation_read_service import ConversationReadService
+from ..services.conversation_history_service import ConversationHistoryService, sender_display_name
+from ..services.presence_service import PresenceService
 from ..tasks import process_campaign, send_bulk_announcement
 
-class CommunicationChannelViewSet(viewsets.ReadOnlyModelViewSet):
+class CommunicationChannelViewSet(ResponseCacheMixin, viewsets.ReadOnlyModelViewSet):
     queryset = CommunicationChannel.objects.filter(is_active=True)
     serializer_class = CommunicationChannelSerializer
     permission_classes = [IsAuthenticated]
+    cache_namespace = 'communications'
+    cache_scope = 'role'
 
-class MessageTemplateViewSet(viewsets.ModelViewSet):
+class MessageTemplateViewSet(ResponseCacheMixin, viewsets.ModelViewSet):
     serializer_class = MessageTemplateSerializer
     permission_classes = [IsAuthenticated]
+    cache_namespace = 'communications'
     
     def get_queryset(self):
         return MessageTemplate.objects.filter(created_by=self.request.user)
@@ -28,9 +41,14 @@ class MessageTemplateViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
-class MessageCampaignViewSet(viewsets.ModelViewSet):
+class MessageCampaignViewSet(ResponseCacheMixin, viewsets.ModelViewSet):
     serializer_class = MessageCampaignSerializer
     permission_classes = [IsAuthenticated]
+    cache_namespace = 'communications'
+    # Delivery counters are bumped with UPDATEs that send no signals
+    cache_ttl = 60
+    throttle_classes = [GCRARateThrottle]
+    throttle_scopes = {'create': 'create-campaign', 'send': 'bulk-send'}
     
     def get_queryset(self):
         return MessageCampaign.objects.filter(created_by=self.request.user)
@@ -62,27 +80,43 @@ class MessageViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        # Users can see messages they sent or received
-        return Message.objects.filter(
-            models.Q(from_user=self.request.user) | 
-            models.Q(to_user=self.request.user)
-        ).distinct()
+        # Users can see messages they sent or received, plus announcements
+        # broadcast to their branch or groups
+        return BroadcastService.inbox_queryset(self.request.user).select_related(
+            'body', 'channel', 'from_user', 'to_user'
+        )
+    
+    @action(detail=True, methods=['post'])
+    def mark_read(self, request, pk=None):
+        message = self.get_object()
+        newly_read = BroadcastService.mark_read(message, request.user)
+        return Response({'status': 'marked as read' if newly_read else 'already read'})
 
 class ConversationViewSet(viewsets.ModelViewSet):
     serializer_class = ConversationSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return Conversation.objects.filter(participants=self.request.user)
+        return ConversationReadService.with_unread_counts(
+            Conversation.objects.filter(participants=self.request.user), self.request.user
+        )
     
     @action(detail=True, methods=['get'])
     def messages(self, request, pk=None):
+        """Newest messages from the cached tail; pass ?before=<next_cursor> for older pages"""
         conversation = self.get_object()
-        messages = conversation.messages.all()
-        serializer = ConversationMessageSerializer(
-            messages, many=True, context={'request': request}
-        )
-        return Response(serializer.data)
+        try:
+            limit = int(request.query_params['limit']) if 'limit' in request.query_params else None
+            page = ConversationHistoryService().get_page(
+                conversation.id, before=request.query_params.get('before'), limit=limit
+            ) or {'messages': [], 'next_cursor': None}
+        except ValueError:
+            return Response({'error': 'Invalid cursor or limit'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        watermark = ConversationReadService.watermark(request.user, conversation.id)
+        for message in page['messages']:
+            message['is_read'] = message['sender'] == request.user.id or message['id'] <= watermark
+        return Response(page)
     
     @action(detail=True, methods=['post'])
     def send_message(self, request, pk=None):
@@ -100,13 +134,31 @@ class ConversationViewSet(viewsets.ModelViewSet):
             sender=request.user,
             content=content
         )
+        history = ConversationHistoryService()
+        serialized = history.serialize(message, sender_display_name(request.user))
+        transaction.on_commit(lambda: history.append([serialized]))
         
         serializer = ConversationMessageSerializer(message, context={'request': request})
         return Response(serializer.data)
+    
+    @action(detail=True, methods=['get'])
+    def presence(self, request, pk=None):
+        """Online state of every participant, read from Redis in one call"""
+        conversation = self.get_object()
+        user_ids = list(conversation.participants.values_list('id', flat=True))
+        return Response(PresenceService().get_presence(user_ids))
+    
+    @action(detail=True, methods=['post'])
+    def mark_read(self, request, pk=None):
+        """Mark every message in the conversation as read"""
+        conversation = self.get_object()
+        ConversationReadService.mark_all_read(request.user, conversation.id)
+        return Response({'status': 'marked as read'})
 
-class UserCommunicationPreferenceViewSet(viewsets.ModelViewSet):
+class UserCommunicationPreferenceViewSet(ResponseCacheMixin, viewsets.ModelViewSet):
     serializer_class = UserCommunicationPreferenceSerializer
     permission_classes = [IsAuthenticated]
+    cache_namespace = 'communications'
     
     def get_queryset(self):
         return UserCommunicationPreference.objects.filter(user=self.request.user)
@@ -116,6 +168,8 @@ class UserCommunicationPreferenceViewSet(viewsets.ModelViewSet):
 
 class CommunicationAPIView(APIView):
     permission_classes = [IsAuthenticated]
+    throttle_classes = [GCRARateThrottle]
+    throttle_scope = 'send-message'
     
     def post(self, request):
         serializer = SendMessageSerializer(data=request.data)
@@ -160,3 +214,21 @@ class CommunicationAPIView(APIView):
                 )
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class ProviderEventWebhookView(APIView):
+    """Receive bounce, complaint and unsubscribe events from message providers"""
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    
+    def post(self, request):
+        expected_token = settings.COMMUNICATION_SETTINGS.get('PROVIDER_WEBHOOK_TOKEN', '')
+        token = request.query_params.get('token', '')
+        if not expected_token or not constant_time_compare(token, expected_token):
+            return Response({'error': 'Invalid token'}, status=status.HTTP_403_FORBIDDEN)
+        
+        events = request.data if isinstance(request.data, list) else [request.data]
+        source = request.query_params.get('source', 'sendgrid')
+        recorded = SuppressionService().record_provider_events(events, source=source)
+        
+        return Response({'recorded': recorded})
@@ -1,8 +1,15 @@
 import json
+import time
+from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth import get_user_model
 
+from .services.chat_buffer import get_chat_buffer
+from .services.conversation_history_service import ConversationHistoryService, sender_display_name
+from .services.notification_service import NotificationService, notification_group
+from .services.presence_service import PresenceService, TypingCoalescer
+
 User = get_user_model()
 
 class ChatConsumer(AsyncWebsocketConsumer):
@@ -18,6 +25,21 @@ class ChatConsumer(AsyncWebsocketConsumer):
         self.conversation_id = self.scope['url_route']['kwargs']['conversation_id']
         self.room_group_name = f'chat_{self.conversation_id}'
         
+        # Resolved once; every broadcast from this connection reuses it
+        self.user_info = {
+            'id': self.user.id,
+            'name': sender_display_name(self.user)
+        }
+        self.presence = PresenceService()
+        self.typing = TypingCoalescer(self.send_typing_indicator)
+        self.last_heartbeat = 0
+        
+        # The cached tail doubles as the existence check, so reconnects skip the database
+        history = await self.get_history_page()
+        if history is None:
+            await self.close()
+            return
+        
         # Join room group
         await self.channel_layer.group_add(
             self.room_group_name,
@@ -26,32 +48,54 @@ class ChatConsumer(AsyncWebsocketConsumer):
         
         await self.accept()
         
+        await self.heartbeat()
+        
         # Send conversation history
-        await self.send_conversation_history()
+        await self.send_conversation_history(history)
     
     async def disconnect(self, close_code):
+        if not hasattr(self, 'room_group_name'):
+            return
+        
+        await self.typing.close()
+        
         # Leave room group
         await self.channel_layer.group_discard(
             self.room_group_name,
             self.channel_name
         )
+        
+        # Don't leave this user's messages waiting on the next timer tick
+        await get_chat_buffer().flush()
     
     async def receive(self, text_data):
         text_data_json = json.loads(text_data)
         message_type = text_data_json.get('type', 'chat_message')
         
+        # Any client traffic counts as a heartbeat; clients idle longer send 'heartbeat'
+        await self.heartbeat()
+        
         if message_type == 'chat_message':
             await self.handle_chat_message(text_data_json)
         elif message_type == 'typing':
             await self.handle_typing_indicator(text_data_json)
         elif message_type == 'read_receipt':
             await self.handle_read_receipt(text_data_json)
+        elif message_type == 'load_history':
+            await self.handle_load_history(text_data_json)
     
     async def handle_chat_message(self, data):
         message = data['message']
         
-        # Save message to database
-        saved_message = await self.save_message(message)
+        # Buffered for a bulk insert; the real id follows in messages_persisted
+        try:
+            buffered = get_chat_buffer().add_message(
+                self.conversation_id, self.user.id, message,
+                sender_name=self.user_info['name']
+            )
+        except OverflowError:
+            await self.send(text_data=json.dumps({'type': 'error', 'error': 'Chat is busy, please retry'}))
+            return
         
         # Send message to room group
         await self.channel_layer.group_send(
@@ -59,50 +103,73 @@ class ChatConsumer(AsyncWebsocketConsumer):
             {
                 'type': 'chat_message',
                 'message': {
-                    'id': saved_message.id,
-                    'content': saved_message.content,
-                    'sender': {
-                        'id': self.user.id,
-                        'name': self.user.get_full_name() or self.user.email
-                    },
-                    'timestamp': saved_message.created_at.isoformat(),
+                    'id': buffered['provisional_id'],
+                    'provisional': True,
+                    'content': buffered['content'],
+                    'sender': self.user_info,
+                    'timestamp': buffered['created_at'].isoformat(),
                 }
             }
         )
     
     async def handle_typing_indicator(self, data):
-        is_typing = data['is_typing']
-        
+        # Keystroke events are coalesced to one broadcast per interval
+        await self.typing.update(data.get('is_typing', False))
+    
+    async def send_typing_indicator(self, is_typing):
         await self.channel_layer.group_send(
             self.room_group_name,
             {
                 'type': 'typing_indicator',
-                'user': {
-                    'id': self.user.id,
-                    'name': self.user.get_full_name() or self.user.email
-                },
+                'user': self.user_info,
                 'is_typing': is_typing
             }
         )
     
+    async def heartbeat(self):
+        """Refresh presence at most a few times per TTL"""
+        now = time.monotonic()
+        if now - self.last_heartbeat < self.presence.ttl / 3:
+            return
+        self.last_heartbeat = now
+        await sync_to_async(self.presence.heartbeat)(self.user.id)
+    
     async def handle_read_receipt(self, data):
         message_id = data['message_id']
         
-        # Mark message as read
-        await self.mark_message_as_read(message_id)
+        # Repeated receipts are neither stored nor re-broadcast
+        try:
+            is_new = get_chat_buffer().add_receipt(self.user.id, message_id, explicit=bool(data.get('explicit')))
+        except (TypeError, ValueError):
+            return
+        if not is_new:
+            return
         
         await self.channel_layer.group_send(
             self.room_group_name,
             {
                 'type': 'read_receipt',
                 'message_id': message_id,
-                'user': {
-                    'id': self.user.id,
-                    'name': self.user.get_full_name() or self.user.email
-                }
+                'user': self.user_info
             }
         )
     
+    async def handle_load_history(self, data):
+        """Send the page of history before the client's cursor"""
+        try:
+            page = await self.get_history_page(data.get('before'))
+        except ValueError:
+            await self.send(text_data=json.dumps({'type': 'error', 'error': 'Invalid history cursor'}))
+            return
+        if page is None:
+            return
+        
+        await self.send(text_data=json.dumps({
+            'type': 'history_page',
+            'messages': page['messages'],
+            'next_cursor': page['next_cursor']
+        }))
+    
     async def chat_message(self, event):
         """Receive message from room group"""
         await self.send(text_data=json.dumps({
@@ -126,48 +193,124 @@ class ChatConsumer(AsyncWebsocketConsumer):
             'user': event['user']
         }))
     
-    async def send_conversation_history(self):
-        """Send conversation history to connected client"""
-        messages = await self.get_conversation_messages()
+    async def messages_persisted(self, event):
+        """Map provisional message ids to their database ids"""
+        await self.send(text_data=json.dumps({
+            'type': 'messages_persisted',
+            'ids': event['ids']
+        }))
+    
+    async def send_conversation_history(self, history):
+        """Send the newest messages to a connected client"""
+        messages = list(history['messages'])
+        
+        # Messages still waiting in this process's write buffer
+        for buffered in get_chat_buffer().pending_messages(self.conversation_id):
+            messages.append({
+                'id': buffered['provisional_id'],
+                'conversation': buffered['conversation_id'],
+                'sender': buffered['sender_id'],
+                'sender_name': buffered['sender_name'],
+                'content': buffered['content'],
+                'created_at': buffered['created_at'].isoformat(),
+            })
         
         await self.send(text_data=json.dumps({
             'type': 'conversation_history',
-            'messages': messages
+            'messages': messages,
+            'next_cursor': history['next_cursor']
         }))
     
     @database_sync_to_async
-    def save_message(self, content):
-        """Save message to database"""
-        from .models import Conversation, ConversationMessage
-        
-        conversation = Conversation.objects.get(id=self.conversation_id)
-        message = ConversationMessage.objects.create(
-            conversation=conversation,
-            sender=self.user,
-            content=content
+    def get_history_page(self, before=None):
+        """Hot tail from the cache, or an older page by cursor"""
+        return ConversationHistoryService().get_page(self.conversation_id, before=before)
+
+
+class NotificationConsumer(AsyncWebsocketConsumer):
+    """WebSocket consumer for one user's in-app notifications"""
+    
+    async def connect(self):
+        self.user = self.scope["user"]
+        
+        if self.user.is_anonymous:
+            await self.close()
+            return
+        
+        self.group_name = notification_group(self.user.id)
+        self.notifications = NotificationService()
+        
+        await self.channel_layer.group_add(
+            self.group_name,
+            self.channel_name
         )
-        return message
+        
+        await self.accept()
+        
+        # Served from the cached counter, not a COUNT per connect
+        await self.send_unread_count(await self.get_unread_count())
     
-    @database_sync_to_async
-    def get_conversation_messages(self):
-        """Get conversation messages from database"""
-        from .models import Conversation, ConversationMessage
-        from .api.serializers import ConversationMessageSerializer
+    async def disconnect(self, close_code):
+        if not hasattr(self, 'group_name'):
+            return
         
-        conversation = Conversation.objects.get(id=self.conversation_id)
-        messages = conversation.messages.all().order_by('created_at')[:50]  # Last 50 messages
+        await self.channel_layer.group_discard(
+            self.group_name,
+            self.channel_name
+        )
+    
+    async def receive(self, text_data):
+        text_data_json = json.loads(text_data)
+        message_type = text_data_json.get('type')
+        
+        if message_type == 'mark_read':
+            try:
+                notification_id = int(text_data_json['notification_id'])
+            except (KeyError, TypeError, ValueError):
+                return
+            changed = await self.mark_read(notification_id)
+        elif message_type == 'mark_all_read':
+            changed = await self.mark_all_read()
+        else:
+            return
         
-        serializer = ConversationMessageSerializer(messages, many=True)
-        return serializer.data
+        if not changed:
+            return
+        
+        # Keep the user's other tabs and devices in step
+        await self.channel_layer.group_send(
+            self.group_name,
+            {
+                'type': 'unread_count',
+                'count': await self.get_unread_count()
+            }
+        )
+    
+    async def send_notification(self, event):
+        """Receive a new notification for this user"""
+        await self.send(text_data=json.dumps({
+            'type': 'notification',
+            'notification': event['notification']
+        }))
+    
+    async def unread_count(self, event):
+        """Receive an updated unread count for this user"""
+        await self.send_unread_count(event['count'])
+    
+    async def send_unread_count(self, count):
+        await self.send(text_data=json.dumps({
+            'type': 'unread_count',
+            'count': count
+        }))
     
     @database_sync_to_async
-    def mark_message_as_read(self, message_id):
-        """Mark message as read by current user"""
-        from .models import ConversationMessage, MessageReadReceipt
-        
-        message = ConversationMessage.objects.get(id=message_id)
-        receipt, created = MessageReadReceipt.objects.get_or_create(
-            user=self.user,
-            message=message
-        )
-        return receipt
+    def get_unread_count(self):
+        return self.notifications.unread_count(self.user.id)
+    
+    @database_sync_to_async
+    def mark_read(self, notification_id):
+        return self.notifications.mark_read(notification_id, self.user.id)
+    
+    @database_sync_to_async
+    def mark_all_read(self):
+        return self.notifications.mark_all_read(self.user.id)
@@ -3,8 +3,8 @@ from django.utils import timezone
 from datetime import timedelta
 import logging
 
-from communications.models import Message, MessageCampaign
-from communications.tasks import cleanup_old_messages
+from communications.models import MessageCampaign
+from communications.services.archive_service import MessageArchiver
 
 logger = logging.getLogger(__name__)
 
@@ -26,7 +26,17 @@ class Command(BaseCommand):
         parser.add_argument(
             '--archive',
             action='store_true',
-            help='Archive instead of delete (if archiving is implemented)'
+            help='Write messages to compressed JSONL archives before deleting them'
+        )
+        parser.add_argument(
+            '--archive-dir',
+            type=str,
+            help='Directory for archive files (default: COMMUNICATION_SETTINGS ARCHIVE_DIR)'
+        )
+        parser.add_argument(
+            '--time-budget',
+            type=int,
+            help='Stop after this many seconds; the next run continues (default: 600)'
         )
     
     def handle(self, *args, **options):
@@ -39,22 +49,20 @@ class Command(BaseCommand):
         # Calculate cutoff date
         cutoff_date = timezone.now() - timedelta(days=days)
         
-        # Find old messages
-        old_messages = Message.objects.filter(
-            created_at__lte=cutoff_date,
-            status__in=['sent', 'delivered', 'read', 'failed']
-        )
-        
-        # Find old campaigns
-        old_campaigns = MessageCampaign.objects.filter(
-            created_at__lte=cutoff_date,
-            status__in=['sent', 'cancelled']
+        archiver = MessageArchiver(
+            archive_dir=options.get('archive_dir'),
+            time_budget_seconds=options.get('time_budget')
         )
+        old_messages = archiver.expired_messages(cutoff_date)
         
         if dry_run:
+            old_campaigns = MessageCampaign.objects.filter(
+                created_at__lte=cutoff_date,
+                status__in=['sent', 'cancelled']
+            )
             self.stdout.write(
                 self.style.WARNING(
-                    f"DRY RUN: Would delete {old_messages.count()} messages and "
+                    f"DRY RUN: Would remove {old_messages.count()} messages and up to "
                     f"{old_campaigns.count()} campaigns older than {days} days"
                 )
             )
@@ -62,30 +70,25 @@ class Command(BaseCommand):
             # Show sample of what would be deleted
             if old_messages.exists():
                 self.stdout.write("Sample messages that would be deleted:")
-                for msg in old_messages[:5]:
+                for msg in old_messages.select_related('to_user')[:5]:
                     self.stdout.write(f"  - Message {msg.id} to {msg.to_user} ({msg.status})")
             
             return
         
-        # Perform actual cleanup
+        # Remove messages in short batches so the live table is never locked for long
         try:
-            # Delete messages
-            messages_count = old_messages.count()
-            old_messages.delete()
-            
-            # Delete campaigns (this will cascade to related messages)
-            campaigns_count = old_campaigns.count()
-            old_campaigns.delete()
+            result = archiver.run(cutoff_date, write_files=archive)
             
             self.stdout.write(
                 self.style.SUCCESS(
-                    f"Successfully deleted {messages_count} messages and "
-                    f"{campaigns_count} campaigns older than {days} days"
+                    f"Removed {result['messages_archived']} messages and "
+                    f"{result['campaigns_deleted']} campaigns older than {days} days"
                 )
             )
-            
-            # Also trigger the async cleanup task for comprehensive cleanup
-            cleanup_old_messages.delay(days)
+            for path in result['files']:
+                self.stdout.write(f"  - Archived to {path}")
+            if not result['completed']:
+                self.stdout.write(self.style.WARNING("Time budget reached; run again to continue"))
             
         except Exception as e:
             self.stdout.write(
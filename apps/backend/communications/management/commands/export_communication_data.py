@@ -1,11 +1,14 @@
-import csv
+import os
 import json
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
-from datetime import timedelta, datetime
+from datetime import timedelta
 
-from communications.models import Message, MessageCampaign
 from communications.services.analytics_service import AnalyticsService
+from communications.services.export_service import (
+    MessageExporter, MESSAGE_COLUMNS, CAMPAIGN_COLUMNS, EXPORT_FORMATS
+)
 
 class Command(BaseCommand):
     help = 'Export communication data for analysis or backup'
@@ -13,20 +16,34 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument(
             '--format',
-            choices=['csv', 'json'],
+            choices=EXPORT_FORMATS + ('json',),
             default='csv',
-            help='Output format (default: csv)'
+            help='Output format: csv, jsonl (json is an alias) or parquet (default: csv)'
         )
         parser.add_argument(
             '--days',
             type=int,
             default=30,
-            help='Export data from last N days (default: 30)'
+            help='Export data from last N days (default: 30, ignored with --watermark)'
         )
         parser.add_argument(
             '--output',
             type=str,
-            help='Output file path (default: print to stdout)'
+            help=(
+                'Output file path; csv/jsonl are gzip-compressed (default: print to stdout). '
+                'JSONL on stdout tags each line with a record_type of message, campaign or analytics'
+            )
+        )
+        parser.add_argument(
+            '--watermark',
+            type=str,
+            help='Watermark file for incremental exports of messages newer than the last run'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Rows fetched per database round-trip (default: 2000)'
         )
         parser.add_argument(
             '--include-analytics',
@@ -35,135 +52,67 @@ class Command(BaseCommand):
         )
     
     def handle(self, *args, **options):
-        format_type = options['format']
-        days = options['days']
+        format_type = 'jsonl' if options['format'] == 'json' else options['format']
         output_file = options['output']
-        include_analytics = options['include_analytics']
-        
-        cutoff_date = timezone.now() - timedelta(days=days)
+        watermark_file = options['watermark']
         
-        # Get data
-        messages = Message.objects.filter(created_at__gte=cutoff_date)
-        campaigns = MessageCampaign.objects.filter(created_at__gte=cutoff_date)
+        if format_type == 'parquet' and not output_file:
+            raise CommandError('Parquet export needs --output')
+        if format_type == 'csv' and not output_file:
+            # One CSV stream cannot hold messages, campaigns and analytics together
+            raise CommandError('CSV export to stdout is not supported; use --output, or --format jsonl')
+        # Messages, campaigns and analytics share stdout as typed JSONL records
+        tagged = not output_file
         
-        if include_analytics:
-            analytics_service = AnalyticsService()
-            analytics_data = analytics_service.get_engagement_trends(days)
+        exporter = MessageExporter(chunk_size=options['chunk_size'])
         
-        # Prepare data based on format
-        if format_type == 'csv':
-            data = self._prepare_csv_data(messages, campaigns, analytics_data if include_analytics else None)
-            output = self._convert_to_csv(data)
-        else:  # json
-            data = self._prepare_json_data(messages, campaigns, analytics_data if include_analytics else None)
-            output = json.dumps(data, indent=2, default=str)
+        after_id = exporter.read_watermark(watermark_file) if watermark_file else None
+        since = None if watermark_file else timezone.now() - timedelta(days=options['days'])
         
-        # Output results
-        if output_file:
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(output)
-            self.stdout.write(self.style.SUCCESS(f"Data exported to {output_file}"))
-        else:
-            self.stdout.write(output)
-    
-    def _prepare_csv_data(self, messages, campaigns, analytics_data):
-        """Prepare data for CSV export"""
-        data = {
-            'messages': [],
-            'campaigns': [],
-            'analytics': []
-        }
+        # Messages
+        result = self._export(
+            exporter,
+            self._tag(exporter.message_rows(exporter.message_queryset(since=since, after_id=after_id)), 'message', tagged),
+            MESSAGE_COLUMNS, format_type, output_file
+        )
+        self.stderr.write(f"Exported {result['rows']} messages")
         
-        # Messages data
-        for msg in messages:
-            data['messages'].append({
-                'id': msg.id,
-                'campaign_id': msg.campaign.id if msg.campaign else '',
-                'channel': msg.channel.channel_type,
-                'from_user': msg.from_user.email,
-                'to_user': msg.to_user.email if msg.to_user else '',
-                'status': msg.status,
-                'subject': msg.subject,
-                'sent_at': msg.sent_at,
-                'delivered_at': msg.delivered_at,
-                'read_at': msg.read_at,
-                'open_count': msg.open_count,
-                'click_count': msg.click_count,
-                'created_at': msg.created_at
-            })
+        if watermark_file and result['last_id'] is not None:
+            exporter.write_watermark(watermark_file, result['last_id'])
         
-        # Campaigns data
-        for campaign in campaigns:
-            data['campaigns'].append({
-                'id': campaign.id,
-                'name': campaign.name,
-                'template': campaign.template.name,
-                'schedule_type': campaign.schedule_type,
-                'status': campaign.status,
-                'scheduled_for': campaign.scheduled_for,
-                'created_at': campaign.created_at
-            })
+        # Campaigns and analytics are small and go to sibling files, or follow on stdout
+        campaigns_result = self._export(
+            exporter, self._tag(exporter.campaign_rows(since=since), 'campaign', tagged),
+            CAMPAIGN_COLUMNS, format_type, self._sibling_path(output_file, 'campaigns') if output_file else None
+        )
+        self.stderr.write(f"Exported {campaigns_result['rows']} campaigns")
         
-        # Analytics data
-        if analytics_data:
-            for daily_metric in analytics_data.get('daily_metrics', []):
-                data['analytics'].append({
-                    'date': daily_metric['date'],
-                    'total_messages': daily_metric['total_messages'],
-                    'opened_messages': daily_metric['opened_messages'],
-                    'clicked_messages': daily_metric['clicked_messages'],
-                    'response_rate': daily_metric['response_rate']
-                })
+        if options['include_analytics']:
+            analytics_data = AnalyticsService().get_engagement_trends(options['days'])
+            if output_file:
+                analytics_path = self._sibling_path(output_file, 'analytics', extension='.json')
+                with open(analytics_path, 'w', encoding='utf-8') as f:
+                    json.dump(analytics_data, f, indent=2, cls=DjangoJSONEncoder)
+            else:
+                self.stdout.write(json.dumps({'record_type': 'analytics', **analytics_data}, cls=DjangoJSONEncoder))
         
-        return data
+        if output_file:
+            self.stdout.write(self.style.SUCCESS(f"Data exported to {output_file}"))
     
-    def _prepare_json_data(self, messages, campaigns, analytics_data):
-        """Prepare data for JSON export"""
-        return {
-            'export_date': timezone.now().isoformat(),
-            'period_days': 30,
-            'messages_count': messages.count(),
-            'campaigns_count': campaigns.count(),
-            'messages': list(messages.values(
-                'id', 'campaign', 'channel', 'from_user', 'to_user',
-                'status', 'subject', 'sent_at', 'delivered_at', 'read_at',
-                'open_count', 'click_count', 'created_at'
-            )),
-            'campaigns': list(campaigns.values(
-                'id', 'name', 'template', 'schedule_type', 'status',
-                'scheduled_for', 'created_at'
-            )),
-            'analytics': analytics_data if analytics_data else {}
-        }
+    def _export(self, exporter, rows, columns, format_type, path):
+        try:
+            return exporter.write(rows, columns, format_type, path=path, stream=self.stdout)
+        except ValueError as e:
+            raise CommandError(str(e))
     
-    def _convert_to_csv(self, data):
-        """Convert data to CSV format"""
-        output = []
-        
-        # Messages CSV
-        if data['messages']:
-            output.append("MESSAGES")
-            writer = csv.DictWriter(output, fieldnames=data['messages'][0].keys())
-            writer.writeheader()
-            for row in data['messages']:
-                writer.writerow(row)
-            output.append("")
-        
-        # Campaigns CSV
-        if data['campaigns']:
-            output.append("CAMPAIGNS")
-            writer = csv.DictWriter(output, fieldnames=data['campaigns'][0].keys())
-            writer.writeheader()
-            for row in data['campaigns']:
-                writer.writerow(row)
-            output.append("")
-        
-        # Analytics CSV
-        if data['analytics']:
-            output.append("ANALYTICS")
-            writer = csv.DictWriter(output, fieldnames=data['analytics'][0].keys())
-            writer.writeheader()
-            for row in data['analytics']:
-                writer.writerow(row)
-        
-        return '\n'.join(output)
+    @staticmethod
+    def _tag(rows, record_type, tagged):
+        if not tagged:
+            return rows
+        return ({'record_type': record_type, **row} for row in rows)
+    
+    def _sibling_path(self, output_file, name, extension=None):
+        """messages.csv.gz -> messages-campaigns.csv.gz"""
+        directory, filename = os.path.split(output_file)
+        base, _, suffix = filename.partition('.')
+        return os.path.join(directory, f"{base}-{name}{extension or ('.' + suffix if suffix else '')}")
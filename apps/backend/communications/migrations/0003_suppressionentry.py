@@ -0,0 +1,27 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communications', '0002_optimization_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SuppressionEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('contact_type', models.CharField(choices=[('email', 'Email'), ('phone', 'Phone (SMS)'), ('whatsapp', 'WhatsApp')], max_length=20)),
+                ('value', models.CharField(max_length=255)),
+                ('reason', models.CharField(choices=[('hard_bounce', 'Hard Bounce'), ('invalid', 'Invalid Address'), ('unsubscribe', 'Unsubscribed'), ('complaint', 'Spam Complaint')], max_length=20)),
+                ('source', models.CharField(blank=True, max_length=50)),
+                ('details', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'communication_suppressions',
+                'unique_together': {('contact_type', 'value')},
+            },
+        ),
+    ]
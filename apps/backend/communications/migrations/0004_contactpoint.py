@@ -0,0 +1,93 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def normalize_phone(phone):
+    """
+    E.164 normalization as it stood when this migration was written. Frozen
+    here so later changes to the app's normalize_phone cannot change what
+    this backfill does.
+    """
+    if not phone:
+        return ''
+
+    phone = phone.strip()
+    digits = ''.join(c for c in phone if c.isdigit())
+    if not digits:
+        return ''
+
+    if phone.startswith('+'):
+        pass
+    elif digits.startswith('00'):
+        digits = digits[2:]
+    else:
+        country_code = settings.COMMUNICATION_SETTINGS.get('DEFAULT_COUNTRY_CODE', '')
+        if digits.startswith('0') and country_code:
+            digits = country_code + digits.lstrip('0')
+
+    if not 8 <= len(digits) <= 15:
+        return ''
+    return f"+{digits}"
+
+
+def backfill_contact_points(apps, schema_editor):
+    """Create email and phone contact points from the existing user records"""
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    ContactPoint = apps.get_model('communications', 'ContactPoint')
+
+    batch = []
+    for user_id, email, phone_number in User.objects.values_list('id', 'email', 'phone_number').iterator(chunk_size=2000):
+        if email:
+            batch.append(ContactPoint(user_id=user_id, contact_type='email', value=email.strip().lower()))
+        phone = normalize_phone(phone_number)
+        if phone:
+            batch.append(ContactPoint(user_id=user_id, contact_type='phone', value=phone))
+            batch.append(ContactPoint(user_id=user_id, contact_type='whatsapp', value=phone))
+
+        if len(batch) >= 2000:
+            ContactPoint.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+
+    ContactPoint.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('communications', '0003_suppressionentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='to_address',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.CreateModel(
+            name='ContactPoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('contact_type', models.CharField(choices=[('email', 'Email'), ('phone', 'Phone (E.164)'), ('whatsapp', 'WhatsApp (E.164)'), ('fcm_token', 'FCM Device Token')], max_length=20)),
+                ('value', models.CharField(max_length=255)),
+                ('is_verified', models.BooleanField(default=False)),
+                ('is_primary', models.BooleanField(default=True)),
+                ('failure_count', models.IntegerField(default=0)),
+                ('last_failure_at', models.DateTimeField(blank=True, null=True)),
+                ('last_failure_reason', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='contact_points', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'communication_contact_points',
+                'unique_together': {('user', 'contact_type', 'value')},
+                'indexes': [
+                    models.Index(fields=['user', 'contact_type'], name='contact_user_type_idx'),
+                    models.Index(fields=['contact_type', 'value'], name='contact_type_value_idx'),
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_contact_points, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('churches', '0001_initial'),
+        ('communications', '0005_messagebody'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='to_branch',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='churches.branch'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['to_branch', 'created_at'], name='msg_branch_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['to_group', 'created_at'], name='msg_group_created_idx'),
+        ),
+        migrations.CreateModel(
+            name='AnnouncementReceipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('read_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('message', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='receipts', to='communications.message')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='announcement_receipts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'announcement_receipts',
+                'unique_together': {('message', 'user')},
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('churches', '0001_initial'),
+        ('communications', '0006_broadcast_announcements'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('total', models.IntegerField(default=0)),
+                ('sent', models.IntegerField(default=0)),
+                ('delivered', models.IntegerField(default=0)),
+                ('read', models.IntegerField(default=0)),
+                ('failed', models.IntegerField(default=0)),
+                ('opened', models.IntegerField(default=0)),
+                ('clicked', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('branch', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, to='churches.branch')),
+                ('campaign', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, to='communications.messagecampaign')),
+                ('channel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='communications.communicationchannel')),
+            ],
+            options={
+                'db_table': 'message_daily_stats',
+                'indexes': [models.Index(fields=['date', 'channel'], name='msg_stats_date_channel_idx')],
+                'constraints': [models.UniqueConstraint(fields=('date', 'channel', 'branch', 'campaign'), name='message_daily_stats_key', nulls_distinct=False)],
+            },
+        ),
+    ]
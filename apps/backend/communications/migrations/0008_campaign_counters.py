@@ -0,0 +1,51 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communications', '0007_messagedailystats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='messagecampaign',
+            name='total_messages',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='messagecampaign',
+            name='queued_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='messagecampaign',
+            name='sent_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='messagecampaign',
+            name='delivered_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='messagecampaign',
+            name='read_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='messagecampaign',
+            name='failed_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='messagecampaign',
+            name='total_opens',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='messagecampaign',
+            name='total_clicks',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_watermarks(apps, schema_editor):
+    """Start each participant's watermark at the newest message they have a receipt for"""
+    ConversationParticipant = apps.get_model('communications', 'ConversationParticipant')
+    MessageReadReceipt = apps.get_model('communications', 'MessageReadReceipt')
+
+    newest_read = MessageReadReceipt.objects.filter(
+        user=OuterRef('user'),
+        message__conversation=OuterRef('conversation'),
+    ).values('user').annotate(newest=Max('message_id')).values('newest')
+
+    ConversationParticipant.objects.update(
+        last_read_message_id=Coalesce(Subquery(newest_read[:1]), 0, output_field=models.BigIntegerField())
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communications', '0008_campaign_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversationparticipant',
+            name='last_read_message_id',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='conversationmessage',
+            index=models.Index(fields=['conversation', 'id'], name='conv_msg_conv_id_idx'),
+        ),
+        migrations.RunPython(backfill_watermarks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('communications', '0011_notification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationDigestEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('channel_type', models.CharField(choices=[('email', 'Email'), ('sms', 'SMS'), ('whatsapp', 'WhatsApp'), ('push', 'Push Notification'), ('in_app', 'In-App Message'), ('announcement', 'Announcement')], max_length=20)),
+                ('category', models.CharField(default='info', max_length=50)),
+                ('title', models.CharField(max_length=255)),
+                ('message', models.TextField()),
+                ('data', models.JSONField(blank=True, default=dict)),
+                ('deliver_after', models.DateTimeField()),
+                ('attempts', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notification_digest_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'notification_digest_entries',
+                'ordering': ['created_at'],
+                'indexes': [
+                    models.Index(fields=['deliver_after'], name='digest_deliver_after_idx'),
+                    models.Index(fields=['user', 'channel_type'], name='digest_user_channel_idx'),
+                ],
+            },
+        ),
+    ]
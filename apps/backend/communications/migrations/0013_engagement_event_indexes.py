@@ -0,0 +1,23 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communications', '0012_notificationdigestentry'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['read_at'], name='msg_read_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['message_type', 'created_at'], name='msg_type_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='announcementreceipt',
+            index=models.Index(fields=['read_at'], name='announcement_read_at_idx'),
+        ),
+    ]
@@ -1,6 +1,10 @@
+import hashlib
+from functools import lru_cache
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.template import Template, Context
 from django.utils import timezone
+from core.tracking import FieldTrackerMixin
 
 User = get_user_model()
 
@@ -55,7 +59,7 @@ class MessageTemplate(models.Model):
     def __str__(self):
         return self.name
 
-class MessageCampaign(models.Model):
+class MessageCampaign(FieldTrackerMixin, models.Model):
     CAMPAIGN_STATUS = (
         ('draft', 'Draft'),
         ('scheduled', 'Scheduled'),
@@ -78,11 +82,59 @@ class MessageCampaign(models.Model):
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    
+    # Denormalized message counters, kept current with F() updates
+    total_messages = models.IntegerField(default=0)
+    queued_count = models.IntegerField(default=0)
+    sent_count = models.IntegerField(default=0)
+    delivered_count = models.IntegerField(default=0)
+    read_count = models.IntegerField(default=0)
+    failed_count = models.IntegerField(default=0)
+    total_opens = models.IntegerField(default=0)
+    total_clicks = models.IntegerField(default=0)
 
     class Meta:
         db_table = 'message_campaigns'
         ordering = ['-created_at']
 
+@lru_cache(maxsize=256)
+def _compile_template(source):
+    # Compiled once per worker; a campaign's messages all share one body
+    return Template(source)
+
+class MessageBody(models.Model):
+    """
+    Template text shared by many messages, stored once per unique content.
+    Messages keep only their per-recipient variables and are rendered on read.
+    """
+    digest = models.CharField(max_length=64, unique=True)  # sha256 of subject + content
+    subject = models.CharField(max_length=255, blank=True)
+    content = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'message_bodies'
+
+    @staticmethod
+    def compute_digest(subject, content):
+        return hashlib.sha256(f"{subject}\x00{content}".encode('utf-8')).hexdigest()
+
+    @classmethod
+    def for_text(cls, subject, content):
+        """Get or create the body row for this exact text"""
+        body, _ = cls.objects.get_or_create(
+            digest=cls.compute_digest(subject, content),
+            defaults={'subject': subject, 'content': content}
+        )
+        return body
+
+    def render(self, variables):
+        context = Context(variables or {})
+        return {
+            'subject': _compile_template(self.subject).render(context),
+            'content': _compile_template(self.content).render(context),
+        }
+
 class Message(models.Model):
     MESSAGE_STATUS = (
         ('queued', 'Queued'),
@@ -107,10 +159,15 @@ class Message(models.Model):
     from_user = models.ForeignKey(User, related_name='sent_messages', on_delete=models.CASCADE)
     to_user = models.ForeignKey(User, related_name='received_messages', null=True, blank=True, on_delete=models.CASCADE)
     to_group = models.ForeignKey('groups.Group', null=True, blank=True, on_delete=models.CASCADE)
+    to_branch = models.ForeignKey('churches.Branch', null=True, blank=True, on_delete=models.CASCADE)
+    
+    # Ready-to-send address resolved from ContactPoint at fan-out
+    to_address = models.CharField(max_length=255, blank=True)
     
-    # Content
+    # Content: either stored inline, or a shared body rendered with variables_used
+    body = models.ForeignKey(MessageBody, null=True, blank=True, related_name='messages', on_delete=models.PROTECT)
     subject = models.CharField(max_length=255, blank=True)
-    content = models.TextField()
+    content = models.TextField(blank=True)
     variables_used = models.JSONField(default=dict)
     
     # Delivery
@@ -133,6 +190,68 @@ class Message(models.Model):
         indexes = [
             models.Index(fields=['status', 'sent_at']),
             models.Index(fields=['to_user', 'created_at']),
+            models.Index(fields=['to_branch', 'created_at'], name='msg_branch_created_idx'),
+            models.Index(fields=['to_group', 'created_at'], name='msg_group_created_idx'),
+            models.Index(fields=['read_at'], name='msg_read_at_idx'),
+            models.Index(fields=['message_type', 'created_at'], name='msg_type_created_idx'),
+        ]
+
+    def _rendered(self):
+        if not hasattr(self, '_rendered_cache'):
+            if self.body_id:
+                self._rendered_cache = self.body.render(self.variables_used)
+            else:
+                self._rendered_cache = {'subject': self.subject, 'content': self.content}
+        return self._rendered_cache
+
+    @property
+    def rendered_subject(self):
+        """Subject as the recipient sees it"""
+        return self._rendered()['subject']
+
+    @property
+    def rendered_content(self):
+        """Body text as the recipient sees it"""
+        return self._rendered()['content']
+
+    @property
+    def is_broadcast(self):
+        """Fan-out-on-read announcement addressed to a branch or group"""
+        return self.to_user_id is None and (self.to_branch_id is not None or self.to_group_id is not None)
+
+class MessageDailyStats(models.Model):
+    """
+    Daily rollup of message counts per channel, branch and campaign.
+    Status counters hold the number of that day's messages currently in
+    each status; opened/clicked count messages opened or clicked at least once.
+    """
+    date = models.DateField()
+    channel = models.ForeignKey(CommunicationChannel, on_delete=models.CASCADE)
+    # No FK constraints: rollups outlive archived campaigns
+    branch = models.ForeignKey('churches.Branch', null=True, blank=True, on_delete=models.DO_NOTHING, db_constraint=False)
+    campaign = models.ForeignKey(MessageCampaign, null=True, blank=True, on_delete=models.DO_NOTHING, db_constraint=False)
+    
+    total = models.IntegerField(default=0)
+    sent = models.IntegerField(default=0)
+    delivered = models.IntegerField(default=0)
+    read = models.IntegerField(default=0)
+    failed = models.IntegerField(default=0)
+    opened = models.IntegerField(default=0)
+    clicked = models.IntegerField(default=0)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'message_daily_stats'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'channel', 'branch', 'campaign'],
+                name='message_daily_stats_key',
+                nulls_distinct=False
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'channel'], name='msg_stats_date_channel_idx'),
         ]
 
 class Conversation(models.Model):
@@ -149,6 +268,8 @@ class ConversationParticipant(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE)
     is_active = models.BooleanField(default=True)
+    # Every message in the conversation up to this id has been read
+    last_read_message_id = models.BigIntegerField(default=0)
     joined_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -165,8 +286,15 @@ class ConversationMessage(models.Model):
     class Meta:
         db_table = 'conversation_messages'
         ordering = ['created_at']
+        indexes = [
+            # Unread counts compare ids against the read watermark
+            models.Index(fields=['conversation', 'id'], name='conv_msg_conv_id_idx'),
+            # History pages are keyset-paginated on (created_at, id)
+            models.Index(fields=['conversation', '-created_at', '-id'], name='conv_msg_history_idx'),
+        ]
 
 class MessageReadReceipt(models.Model):
+    """Explicit per-message receipt, only stored where the UI shows who has seen a message"""
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     message = models.ForeignKey(ConversationMessage, on_delete=models.CASCADE)
     read_at = models.DateTimeField(auto_now_add=True)
@@ -184,3 +312,118 @@ class UserCommunicationPreference(models.Model):
     class Meta:
         db_table = 'user_communication_preferences'
         unique_together = ['user', 'channel']
+
+class SuppressionEntry(models.Model):
+    """Contact points we must never send to again (hard bounces, unsubscribes)"""
+    CONTACT_TYPES = (
+        ('email', 'Email'),
+        ('phone', 'Phone (SMS)'),
+        ('whatsapp', 'WhatsApp'),
+    )
+    
+    REASONS = (
+        ('hard_bounce', 'Hard Bounce'),
+        ('invalid', 'Invalid Address'),
+        ('unsubscribe', 'Unsubscribed'),
+        ('complaint', 'Spam Complaint'),
+    )
+    
+    contact_type = models.CharField(max_length=20, choices=CONTACT_TYPES)
+    value = models.CharField(max_length=255)  # Normalized address
+    reason = models.CharField(max_length=20, choices=REASONS)
+    source = models.CharField(max_length=50, blank=True)  # Provider or subsystem that reported it
+    details = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'communication_suppressions'
+        unique_together = ['contact_type', 'value']
+
+    def __str__(self):
+        return f"{self.value} ({self.contact_type}: {self.reason})"
+
+class ContactPoint(models.Model):
+    """A normalized address a user can be reached at on a delivery channel"""
+    CONTACT_TYPES = (
+        ('email', 'Email'),
+        ('phone', 'Phone (E.164)'),
+        ('whatsapp', 'WhatsApp (E.164)'),
+        ('fcm_token', 'FCM Device Token'),
+    )
+    
+    user = models.ForeignKey(User, related_name='contact_points', on_delete=models.CASCADE)
+    contact_type = models.CharField(max_length=20, choices=CONTACT_TYPES)
+    value = models.CharField(max_length=255)  # Normalized address or device token
+    is_verified = models.BooleanField(default=False)
+    is_primary = models.BooleanField(default=True)
+    
+    # Delivery health
+    failure_count = models.IntegerField(default=0)
+    last_failure_at = models.DateTimeField(null=True, blank=True)
+    last_failure_reason = models.CharField(max_length=255, blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'communication_contact_points'
+        unique_together = ['user', 'contact_type', 'value']
+        indexes = [
+            models.Index(fields=['user', 'contact_type'], name='contact_user_type_idx'),
+            models.Index(fields=['contact_type', 'value'], name='contact_type_value_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} {self.contact_type}: {self.value}"
+
+class AnnouncementReceipt(models.Model):
+    """Per-user read state of a broadcast message, created only when the user opens it"""
+    message = models.ForeignKey(Message, related_name='receipts', on_delete=models.CASCADE)
+    user = models.ForeignKey(User, related_name='announcement_receipts', on_delete=models.CASCADE)
+    read_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'announcement_receipts'
+        unique_together = ['message', 'user']
+        indexes = [
+            models.Index(fields=['read_at'], name='announcement_read_at_idx'),
+        ]
+
+class Notification(models.Model):
+    """In-app notification shown in the user's notification tray"""
+    user = models.ForeignKey(User, related_name='notifications', on_delete=models.CASCADE)
+    title = models.CharField(max_length=255)
+    message = models.TextField()
+    notification_type = models.CharField(max_length=50, default='info')
+    data = models.JSONField(default=dict, blank=True)
+    is_read = models.BooleanField(default=False)
+    read_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'notifications'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'is_read'], name='notification_user_read_idx'),
+        ]
+
+class NotificationDigestEntry(models.Model):
+    """A low-priority notification held back to be sent in a per-user digest"""
+    user = models.ForeignKey(User, related_name='notification_digest_entries', on_delete=models.CASCADE)
+    channel_type = models.CharField(max_length=20, choices=CommunicationChannel.CHANNEL_TYPES)
+    category = models.CharField(max_length=50, default='info')
+    title = models.CharField(max_length=255)
+    message = models.TextField()
+    data = models.JSONField(default=dict, blank=True)
+    # When the digest this entry belongs to is sent; shared by the whole window
+    deliver_after = models.DateTimeField()
+    attempts = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'notification_digest_entries'
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['deliver_after'], name='digest_deliver_after_idx'),
+            models.Index(fields=['user', 'channel_type'], name='digest_user_channel_idx'),
+        ]
@@ -0,0 +1,53 @@
+from datetime import date
+from typing import Dict, Any
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Exists, F, OuterRef, Q, Sum
+
+from ..models import CommunicationChannel, Message
+
+User = get_user_model()
+
+
+class AnalyticsQueries:
+    """
+    Aggregate queries behind the analytics endpoints.
+
+    Each method runs a fixed number of queries however many channels or
+    users there are: per-channel figures come from one annotated query
+    over the active channels, with conditional aggregates in place of a
+    COUNT per channel or per status.
+    """
+
+    @staticmethod
+    def channel_message_totals(start_date: date):
+        """Active channels annotated with message totals from the daily rollup"""
+        in_period = Q(messagedailystats__date__gte=start_date)
+        return CommunicationChannel.objects.filter(is_active=True).annotate(
+            total_messages=Sum('messagedailystats__total', filter=in_period, default=0),
+            successful_messages=Sum(
+                F('messagedailystats__sent') + F('messagedailystats__delivered') + F('messagedailystats__read'),
+                filter=in_period, default=0
+            ),
+            failed_messages=Sum('messagedailystats__failed', filter=in_period, default=0),
+        ).order_by('id')
+
+    @staticmethod
+    def channel_opt_ins(users=None):
+        """Active channels annotated with `opted_in`, optionally within an audience"""
+        opted_in = Q(usercommunicationpreference__is_enabled=True)
+        if users is not None:
+            opted_in &= Q(usercommunicationpreference__user__in=users.values('id'))
+        return CommunicationChannel.objects.filter(is_active=True).annotate(
+            opted_in=Count('usercommunicationpreference', filter=opted_in)
+        ).order_by('id')
+
+    @staticmethod
+    def audience_summary(users) -> Dict[str, Any]:
+        """Audience size and users who have read at least one message, in one query"""
+        has_read = Exists(Message.objects.filter(to_user=OuterRef('pk'), read_at__isnull=False))
+        # Segment filters can join to groups; filtering by id counts each member once
+        return User.objects.filter(id__in=users.values('id')).aggregate(
+            audience_size=Count('id'),
+            responsive_users=Count('id', filter=Q(has_read)),
+        )
@@ -1,10 +1,12 @@
-from django.db.models import Count, Avg, Q, F
+from django.db.models import Sum
 from django.utils import timezone
 from datetime import timedelta, datetime
 from typing import Dict, List, Any
 import logging
 
-from ..models import Message, MessageCampaign, CommunicationChannel
+from core.result_cache import cached_result
+from ..models import Message, MessageCampaign, MessageDailyStats
+from .analytics_queries import AnalyticsQueries
 
 logger = logging.getLogger(__name__)
 
@@ -17,18 +19,19 @@ class AnalyticsService:
     def get_campaign_performance(self, campaign_id: int) -> Dict[str, Any]:
         """Get detailed performance metrics for a campaign"""
         try:
+            # Counters are maintained on the campaign row as messages change state
             campaign = MessageCampaign.objects.get(id=campaign_id)
             messages = Message.objects.filter(campaign=campaign)
             
-            total_messages = messages.count()
-            sent_messages = messages.filter(status='sent').count()
-            delivered_messages = messages.filter(status='delivered').count()
-            read_messages = messages.filter(status='read').count()
-            failed_messages = messages.filter(status='failed').count()
+            total_messages = campaign.total_messages
+            sent_messages = campaign.sent_count
+            delivered_messages = campaign.delivered_count
+            read_messages = campaign.read_count
+            failed_messages = campaign.failed_count
             
             # Engagement metrics
-            total_opens = messages.aggregate(total_opens=Sum('open_count'))['total_opens'] or 0
-            total_clicks = messages.aggregate(total_clicks=Sum('click_count'))['total_clicks'] or 0
+            total_opens = campaign.total_opens
+            total_clicks = campaign.total_clicks
             
             # Calculate rates
             delivery_rate = (delivered_messages / total_messages * 100) if total_messages > 0 else 0
@@ -69,22 +72,18 @@ class AnalyticsService:
             logger.error(f"Campaign {campaign_id} not found for analytics")
             return {'error': 'Campaign not found'}
     
+    @cached_result('communications')
     def get_channel_performance(self, days: int = 30) -> Dict[str, Any]:
         """Get performance metrics by channel"""
-        start_date = timezone.now() - timedelta(days=days)
+        start_date = timezone.localdate() - timedelta(days=days)
         
         channel_data = []
-        channels = CommunicationChannel.objects.filter(is_active=True)
         
-        for channel in channels:
-            messages = Message.objects.filter(
-                channel=channel,
-                created_at__gte=start_date
-            )
-            
-            total_messages = messages.count()
-            successful_messages = messages.filter(status__in=['sent', 'delivered', 'read']).count()
-            failed_messages = messages.filter(status='failed').count()
+        # One query annotates every active channel with its rollup totals
+        for channel in AnalyticsQueries.channel_message_totals(start_date):
+            total_messages = channel.total_messages
+            successful_messages = channel.successful_messages
+            failed_messages = channel.failed_messages
             
             success_rate = (successful_messages / total_messages * 100) if total_messages > 0 else 0
             
@@ -114,33 +113,36 @@ class AnalyticsService:
             'summary': self._get_channel_summary(channel_data),
         }
     
+    @cached_result('communications')
     def get_engagement_trends(self, days: int = 90) -> Dict[str, Any]:
         """Get engagement trends over time"""
-        end_date = timezone.now()
+        end_date = timezone.localdate()
         start_date = end_date - timedelta(days=days)
         
-        # Daily engagement data
-        daily_data = []
-        current_date = start_date
+        # Daily engagement data, read from the rollup in one query
+        daily_stats = {
+            row['date']: row
+            for row in MessageDailyStats.objects.filter(date__gte=start_date, date__lte=end_date).values('date').annotate(
+                total_messages=Sum('total'),
+                opened_messages=Sum('opened'),
+                clicked_messages=Sum('clicked'),
+                read_messages=Sum('read'),
+            ).order_by()
+        }
         
-        while current_date <= end_date:
-            next_date = current_date + timedelta(days=1)
-            
-            day_messages = Message.objects.filter(
-                created_at__gte=current_date,
-                created_at__lt=next_date
-            )
-            
-            day_metrics = {
-                'date': current_date.date().isoformat(),
-                'total_messages': day_messages.count(),
-                'opened_messages': day_messages.filter(open_count__gt=0).count(),
-                'clicked_messages': day_messages.filter(click_count__gt=0).count(),
-                'response_rate': self._calculate_daily_response_rate(day_messages),
-            }
+        daily_data = []
+        for offset in range(days + 1):
+            day = start_date + timedelta(days=offset)
+            stats = daily_stats.get(day, {})
+            total_messages = stats.get('total_messages') or 0
             
-            daily_data.append(day_metrics)
-            current_date = next_date
+            daily_data.append({
+                'date': day.isoformat(),
+                'total_messages': total_messages,
+                'opened_messages': stats.get('opened_messages') or 0,
+                'clicked_messages': stats.get('clicked_messages') or 0,
+                'response_rate': self._calculate_daily_response_rate(stats.get('read_messages') or 0, total_messages),
+            })
         
         return {
             'period': f"Last {days} days",
@@ -148,6 +150,7 @@ class AnalyticsService:
             'trend_analysis': self._analyze_engagement_trends(daily_data),
         }
     
+    @cached_result('communications', branch_id=lambda service, segment_filters=None: (segment_filters or {}).get('branch_id'))
     def get_audience_insights(self, segment_filters: Dict[str, Any] = None) -> Dict[str, Any]:
         """Get insights about audience communication preferences"""
         from .advanced_audience_service import AdvancedAudienceService
@@ -161,33 +164,29 @@ class AnalyticsService:
             User = get_user_model()
             users = User.objects.filter(is_active=True)
         
+        summary = AnalyticsQueries.audience_summary(users)
+        audience_size = summary['audience_size']
+        
         # Channel preferences
         channel_preferences = {}
-        for channel in CommunicationChannel.objects.filter(is_active=True):
-            preference_count = users.filter(
-                usercommunicationpreference__channel=channel,
-                usercommunicationpreference__is_enabled=True
-            ).count()
+        for channel in AnalyticsQueries.channel_opt_ins(users):
             channel_preferences[channel.channel_type] = {
-                'count': preference_count,
-                'percentage': (preference_count / users.count() * 100) if users.count() > 0 else 0
+                'count': channel.opted_in,
+                'percentage': (channel.opted_in / audience_size * 100) if audience_size > 0 else 0
             }
         
         # Response patterns
-        responsive_users = users.filter(
-            received_messages__read_at__isnull=False
-        ).distinct().count()
-        
-        response_rate = (responsive_users / users.count() * 100) if users.count() > 0 else 0
+        responsive_users = summary['responsive_users']
+        response_rate = (responsive_users / audience_size * 100) if audience_size > 0 else 0
         
         return {
-            'audience_size': users.count(),
+            'audience_size': audience_size,
             'channel_preferences': channel_preferences,
             'engagement_metrics': {
                 'responsive_users': responsive_users,
                 'response_rate': round(response_rate, 2),
             },
-            'recommendations': self._generate_audience_recommendations(users),
+            'recommendations': self._generate_audience_recommendations(audience_size),
         }
     
     def _get_time_to_first_open(self, messages):
@@ -229,11 +228,9 @@ class AnalyticsService:
             'most_effective_channel': max(channel_data, key=lambda x: x['metrics']['success_rate']) if channel_data else None,
         }
     
-    def _calculate_daily_response_rate(self, day_messages):
+    def _calculate_daily_response_rate(self, read_messages, total_messages):
         """Calculate response rate for a specific day"""
-        total_messages = day_messages.count()
-        responded_messages = day_messages.filter(read_at__isnull=False).count()
-        return (responded_messages / total_messages * 100) if total_messages > 0 else 0
+        return (read_messages / total_messages * 100) if total_messages > 0 else 0
     
     def _analyze_engagement_trends(self, daily_data):
         """Analyze trends in engagement data"""
@@ -261,12 +258,12 @@ class AnalyticsService:
             'change_percentage': ((recent_avg - previous_avg) / previous_avg * 100) if previous_avg > 0 else 0,
         }
     
-    def _generate_audience_recommendations(self, users):
+    def _generate_audience_recommendations(self, audience_size):
         """Generate communication recommendations based on audience analysis"""
         recommendations = []
         
         # Sample recommendations
-        if users.count() < 100:
+        if audience_size < 100:
             recommendations.append("Consider personalized 1-on-1 communication for better engagement")
         
         # Add more sophisticated recommendations based on your analytics
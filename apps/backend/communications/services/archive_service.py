@@ -0,0 +1,156 @@
+import os
+import re
+import gzip
+import json
+import time
+import logging
+from typing import Dict, Any, Optional
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from core.backpressure import BackpressureController
+from ..models import Message, MessageCampaign
+
+logger = logging.getLogger(__name__)
+
+# Messages in these states will not change any more and can leave the live table
+ARCHIVABLE_STATUSES = ['sent', 'delivered', 'read', 'failed']
+
+# messages-<first pk>-<last pk>.jsonl.gz, inside a directory per month
+ARCHIVE_FILE_PATTERN = re.compile(r'messages-(?P<first>\d+)-(?P<last>\d+)\.jsonl\.gz')
+
+ARCHIVE_FIELDS = [
+    'id', 'campaign_id', 'template_id', 'channel_id', 'message_type',
+    'from_user_id', 'to_user_id', 'to_group_id', 'to_branch_id', 'to_address',
+    'body_id', 'variables_used', 'status', 'sent_at', 'delivered_at', 'read_at',
+    'open_count', 'click_count', 'error_message', 'created_at', 'updated_at',
+]
+
+
+class MessageArchiver:
+    """
+    Retention for the messages table.
+
+    Expired messages are copied to gzip-compressed JSONL files and then
+    deleted in small keyset-paginated batches. Every batch runs in its own
+    short transaction, so the live table is never locked for long. Each
+    run stops after its time budget; the next run carries on where it
+    stopped.
+
+    Each batch is written to its own file per month of created_at, named
+    by its pk range, so a batch retried after a failed delete replaces its
+    earlier file instead of archiving the same messages twice.
+    """
+
+    def __init__(self, archive_dir: Optional[str] = None, time_budget_seconds: Optional[int] = None):
+        config = settings.COMMUNICATION_SETTINGS
+        self.archive_dir = archive_dir or config.get('ARCHIVE_DIR') or os.path.join(settings.BASE_DIR, 'archive', 'messages')
+        self.time_budget_seconds = time_budget_seconds or config.get('ARCHIVE_TIME_BUDGET_SECONDS', 600)
+
+    def expired_messages(self, cutoff):
+        return Message.objects.filter(created_at__lt=cutoff, status__in=ARCHIVABLE_STATUSES)
+
+    def run(self, cutoff, write_files: bool = True) -> Dict[str, Any]:
+        """Archive (optionally) and delete messages created before `cutoff`"""
+        started = time.monotonic()
+        archived = 0
+        completed = True
+        files = set()
+
+        controller = BackpressureController('archive_messages')
+        queryset = self.expired_messages(cutoff).select_related('body')
+
+        for chunk, _ in controller.iter_queryset(queryset):
+            if write_files:
+                files.update(self._write_chunk(chunk))
+
+            with transaction.atomic():
+                Message.objects.filter(pk__in=[message.pk for message in chunk]).delete()
+            archived += len(chunk)
+
+            if time.monotonic() - started > self.time_budget_seconds:
+                completed = False
+                break
+
+        campaigns_deleted = self._delete_empty_campaigns(cutoff) if completed else 0
+
+        logger.info(
+            f"Message retention: {archived} messages removed, {campaigns_deleted} campaigns deleted, "
+            f"{'completed' if completed else 'time budget reached'}"
+        )
+        return {
+            'messages_archived': archived,
+            'campaigns_deleted': campaigns_deleted,
+            'completed': completed,
+            'files': sorted(files),
+        }
+
+    def _write_chunk(self, chunk):
+        """Write a chunk to one archive file per month; returns the paths written"""
+        by_month = {}
+        for message in chunk:
+            record = {field: getattr(message, field) for field in ARCHIVE_FIELDS}
+            # Archives must be readable without the live body table
+            record['subject'] = message.rendered_subject
+            record['content'] = message.rendered_content
+            by_month.setdefault(message.created_at.strftime('%Y-%m'), []).append(record)
+
+        paths = []
+        for month, records in by_month.items():
+            month_dir = os.path.join(self.archive_dir, month)
+            os.makedirs(month_dir, exist_ok=True)
+            # Chunks come in pk order
+            first_pk, last_pk = records[0]['id'], records[-1]['id']
+            path = os.path.join(month_dir, f"messages-{first_pk}-{last_pk}.jsonl.gz")
+            stale = self._unfinished_files(month_dir, first_pk, last_pk)
+
+            # Written in full under a temporary name, so a crash never leaves a partial file
+            temp_path = f"{path}.tmp"
+            with gzip.open(temp_path, 'wt', encoding='utf-8') as archive_file:
+                for record in records:
+                    archive_file.write(json.dumps(record, cls=DjangoJSONEncoder) + '\n')
+            os.replace(temp_path, path)
+
+            for stale_path in stale:
+                if stale_path != path:
+                    os.remove(stale_path)
+            paths.append(path)
+
+        return paths
+
+    def _unfinished_files(self, month_dir, first_pk, last_pk):
+        """
+        Files written for a chunk whose delete never committed: they start
+        inside this chunk's pk range and their first message is still live.
+        Their messages are archived again by this chunk or the next ones.
+        """
+        files = {}
+        for name in os.listdir(month_dir):
+            match = ARCHIVE_FILE_PATTERN.fullmatch(name)
+            if match and first_pk <= int(match['first']) <= last_pk:
+                files[int(match['first'])] = os.path.join(month_dir, name)
+        if not files:
+            return []
+        live = set(Message.objects.filter(pk__in=files).values_list('pk', flat=True))
+        return [path for first, path in files.items() if first in live]
+
+    def _delete_empty_campaigns(self, cutoff) -> int:
+        """
+        Delete finished campaigns whose messages have all been archived.
+        Campaigns that still own messages are kept, since deleting them
+        would null out campaign_id on every remaining row.
+        """
+        campaigns = MessageCampaign.objects.filter(
+            created_at__lt=cutoff,
+            status__in=['sent', 'cancelled']
+        ).exclude(Exists(Message.objects.filter(campaign=OuterRef('pk'))))
+
+        deleted = 0
+        campaign_ids = list(campaigns.values_list('id', flat=True)[:1000])
+        if campaign_ids:
+            with transaction.atomic():
+                deleted, _ = MessageCampaign.objects.filter(id__in=campaign_ids).delete()
+        return deleted
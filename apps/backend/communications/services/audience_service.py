@@ -1,6 +1,7 @@
 from django.contrib.auth import get_user_model
 from django.db.models import Q
 from typing import List, Dict, Any
+from .group_membership import group_user_ids
 
 User = get_user_model()
 
@@ -23,9 +24,9 @@ class AudienceService:
                 role_conditions |= Q(groups__name=role)
             queryset = queryset.filter(role_conditions)
         
-        # Group/Department filter
+        # Group/Department filter (groups.Group, the same groups broadcasts address), as a subquery
         if filters.get('group_id'):
-            queryset = queryset.filter(groups__id=filters['group_id'])
+            queryset = queryset.filter(pk__in=group_user_ids(filters['group_id']))
         
         # Member status filter
         if filters.get('member_status'):
@@ -0,0 +1,132 @@
+import logging
+import re
+from typing import Dict, Any, Optional
+
+from django.db import IntegrityError, transaction
+from django.template.base import Lexer, TokenType
+from django.db.models import Q, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from ..models import Message, MessageBody, AnnouncementReceipt
+from .message_stats_service import MessageStatsService, KEY_FIELDS
+from .group_membership import user_group_ids
+
+logger = logging.getLogger(__name__)
+
+# Channels whose messages are read in the app rather than pushed to a device
+FAN_OUT_ON_READ_CHANNELS = ('in_app', 'announcement')
+
+# Audience filters that can be resolved at read time from the reader alone
+BROADCAST_FILTER_KEYS = {'branch_id', 'group_id'}
+
+# Template variables filled in per recipient; a single broadcast row has no recipient
+PER_RECIPIENT_VARIABLES = {'name', 'email', 'branch'}
+
+# Bare names in a {{ }} or {% %} tag, not attributes such as `event.name`
+_TAG_NAME = re.compile(r'(?<![\w.])[A-Za-z_]\w*')
+
+
+def uses_recipient_variables(*sources) -> bool:
+    """Whether template text refers to any per-recipient variable"""
+    for source in sources:
+        for token in Lexer(source or '').tokenize():
+            if token.token_type in (TokenType.VAR, TokenType.BLOCK):
+                if PER_RECIPIENT_VARIABLES.intersection(_TAG_NAME.findall(token.contents)):
+                    return True
+    return False
+
+
+class BroadcastService:
+    """
+    Fan-out-on-read for in-app announcements.
+
+    An announcement to a whole branch or group is stored as one Message row
+    with to_user empty. Read state is kept sparsely in AnnouncementReceipt,
+    one row per user who actually opened it, and merged into each user's
+    inbox at query time.
+    """
+
+    @staticmethod
+    def can_fan_out_on_read(channel_type: str, filters: Optional[Dict[str, Any]], template) -> bool:
+        """
+        Only branch/group audiences on in-app channels qualify, and only for
+        templates that read the same for everyone: the single row is
+        rendered without any recipient's name, email or branch.
+        """
+        keys = {key for key, value in (filters or {}).items() if value}
+        return (
+            channel_type in FAN_OUT_ON_READ_CHANNELS and bool(keys) and keys <= BROADCAST_FILTER_KEYS
+            and not uses_recipient_variables(template.subject, template.content)
+        )
+
+    @staticmethod
+    def create_broadcast(template, sender, filters: Dict[str, Any], campaign=None) -> Message:
+        """Store a single announcement row for the whole audience"""
+        message = Message.objects.create(
+            campaign=campaign,
+            template=template,
+            channel=template.channel,
+            body=MessageBody.for_text(template.subject, template.content),
+            from_user=sender,
+            to_branch_id=filters.get('branch_id'),
+            to_group_id=filters.get('group_id'),
+            status='queued',
+            message_type='announcement'
+        )
+        MessageStatsService().record_created([message])
+        logger.info(
+            f"Created broadcast message {message.id} for branch {message.to_branch_id} / group {message.to_group_id}"
+        )
+        return message
+
+    @staticmethod
+    def broadcast_filter(user) -> Q:
+        """Broadcast rows addressed to the user's branch and/or groups"""
+        # to_group is a groups.Group, not one of the user's auth groups (roles)
+        group_ids = user_group_ids(user)
+        branch_id = getattr(user, 'branch_id', None)
+
+        # A row targeting both a branch and a group reaches their intersection
+        branch_matches = Q(to_branch__isnull=True)
+        if branch_id:
+            branch_matches |= Q(to_branch_id=branch_id)
+        group_matches = Q(to_group__isnull=True)
+        if group_ids:
+            group_matches |= Q(to_group_id__in=group_ids)
+
+        return (
+            Q(to_user__isnull=True, message_type='announcement') &
+            (Q(to_branch__isnull=False) | Q(to_group__isnull=False)) &
+            branch_matches & group_matches
+        )
+
+    @classmethod
+    def inbox_queryset(cls, user):
+        """
+        Direct messages merged with the broadcasts the user can see.
+        Annotates `user_read_at`, the read time from the user's point of view.
+        """
+        receipts = AnnouncementReceipt.objects.filter(message=OuterRef('pk'), user=user)
+        return Message.objects.filter(
+            Q(to_user=user) | Q(from_user=user) | cls.broadcast_filter(user)
+        ).annotate(
+            user_read_at=Coalesce(Subquery(receipts.values('read_at')[:1]), 'read_at')
+        )
+
+    @classmethod
+    def mark_read(cls, message: Message, user) -> bool:
+        """Record that the user read a message; returns False if it was already read"""
+        if not message.is_broadcast:
+            with transaction.atomic():
+                unread = Message.objects.select_for_update(of=('self',)).filter(pk=message.pk, to_user=user, read_at__isnull=True)
+                rows = list(unread.values('status', *KEY_FIELDS))
+                unread.update(read_at=timezone.now(), status='read')
+                MessageStatsService().record_row_transitions(rows, 'read')
+            return bool(rows)
+
+        try:
+            _, created = AnnouncementReceipt.objects.get_or_create(message=message, user=user)
+        except IntegrityError:
+            created = False
+        return created
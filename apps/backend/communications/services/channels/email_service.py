@@ -1,7 +1,9 @@
 import sendgrid
 from sendgrid.helpers.mail import Mail, From, To, Subject, PlainTextContent, HtmlContent
+from typing import Dict, Any
 from django.conf import settings
 from ...models import Message
+from ..tracking_service import TrackingService
 
 class EmailChannelService:
     """Email delivery service using SendGrid"""
@@ -14,12 +16,12 @@ class EmailChannelService:
         """Send email via SendGrid"""
         try:
             # Create SendGrid mail object
-            to_email = To(message.to_user.email)
-            subject = Subject(message.subject)
+            to_email = To(message.to_address or message.to_user.email)
+            subject = Subject(message.rendered_subject)
             
             # Create both HTML and plain text content
-            html_content = HtmlContent(message.content)
-            plain_content = PlainTextContent(message.plain_content if hasattr(message, 'plain_content') else message.content)
+            html_content = HtmlContent(TrackingService.instrument_html(message.id, message.rendered_content))
+            plain_content = PlainTextContent(message.plain_content if hasattr(message, 'plain_content') else message.rendered_content)
             
             # Build email
             email = Mail(
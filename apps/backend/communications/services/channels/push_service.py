@@ -4,6 +4,7 @@ from firebase_admin.exceptions import FirebaseError
 from django.conf import settings
 import logging
 from ...models import Message
+from ..contact_point_service import ContactPointService
 
 logger = logging.getLogger(__name__)
 
@@ -25,15 +26,16 @@ class PushNotificationService:
         """Send push notification via FCM"""
         try:
             # Get user's FCM tokens
-            fcm_tokens = self._get_user_fcm_tokens(message.to_user)
+            fcm_tokens = self._get_user_fcm_tokens(message.to_user_id)
             
             if not fcm_tokens:
                 return {'status': 'failed', 'error': 'User has no FCM tokens'}
             
             # Create notification message
+            content = message.rendered_content
             notification = messaging.Notification(
-                title=message.subject or "THOGMi Notification",
-                body=message.content[:100] + '...' if len(message.content) > 100 else message.content
+                title=message.rendered_subject or "THOGMi Notification",
+                body=content[:100] + '...' if len(content) > 100 else content
             )
             
             # Send to all user devices
@@ -66,15 +68,45 @@ class PushNotificationService:
                 'error': str(e)
             }
     
-    def _get_user_fcm_tokens(self, user):
-        """Get FCM tokens for a user from their profile"""
+    def send_to_user(self, user_id, title, body, data=None) -> dict:
+        """Send a notification without a Message row (e.g. a digest) to all of a user's devices"""
+        fcm_tokens = self._get_user_fcm_tokens(user_id)
+        if not fcm_tokens:
+            return {'status': 'failed', 'error': 'User has no FCM tokens', 'no_devices': True}
+
+        notification = messaging.Notification(
+            title=title,
+            body=body[:100] + '...' if len(body) > 100 else body
+        )
+        successful_sends = 0
+        for token in fcm_tokens:
+            try:
+                messaging.send(messaging.Message(
+                    notification=notification,
+                    token=token,
+                    data={
+                        **(data or {}),
+                        'type': 'church_notification',
+                        'click_action': 'FLUTTER_NOTIFICATION_CLICK'
+                    }
+                ))
+                successful_sends += 1
+            except FirebaseError as e:
+                logger.error(f"FCM send failed for token {token[:10]}...: {str(e)}")
+                ContactPointService.record_failure('fcm_token', token, str(e))
+
+        return {
+            'status': 'sent' if successful_sends else 'failed',
+            'successful_sends': successful_sends,
+            'total_attempts': len(fcm_tokens)
+        }
+
+    def _get_user_fcm_tokens(self, user_id):
+        """Get the FCM device tokens registered for a user"""
         try:
-            # Assuming user profile has FCM tokens stored
-            if hasattr(user, 'profile') and hasattr(user.profile, 'fcm_tokens'):
-                return user.profile.fcm_tokens.all()  # Assuming a related model for tokens
-            return []
+            return ContactPointService.get_values(user_id, 'fcm_token')
         except Exception as e:
-            logger.error(f"Error getting FCM tokens for user {user.id}: {str(e)}")
+            logger.error(f"Error getting FCM tokens for user {user_id}: {str(e)}")
             return []
     
     def _send_to_token(self, token, notification, message):
@@ -82,7 +114,7 @@ class PushNotificationService:
         try:
             fcm_message = messaging.Message(
                 notification=notification,
-                token=token.token,  # Assuming token is a string
+                token=token,
                 data={
                     'message_id': str(message.id),
                     'type': 'church_notification',
@@ -95,15 +127,16 @@ class PushNotificationService:
             return {
                 'success': True,
                 'message_id': response,
-                'token': token.token[:10] + '...'  # Log partial token for security
+                'token': token[:10] + '...'  # Log partial token for security
             }
             
         except FirebaseError as e:
-            logger.error(f"FCM send failed for token {token.token[:10]}...: {str(e)}")
+            logger.error(f"FCM send failed for token {token[:10]}...: {str(e)}")
+            ContactPointService.record_failure('fcm_token', token, str(e))
             return {
                 'success': False,
                 'error': str(e),
-                'token': token.token[:10] + '...'
+                'token': token[:10] + '...'
             }
     
     def subscribe_to_topic(self, tokens, topic):
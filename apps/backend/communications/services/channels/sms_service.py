@@ -1,6 +1,8 @@
+from typing import Dict, Any
 from twilio.rest import Client
 from django.conf import settings
 from ...models import Message
+from ..contact_point_service import normalize_phone
 
 class SMSChannelService:
     """SMS delivery service using Twilio"""
@@ -13,15 +15,17 @@ class SMSChannelService:
     
     def send(self, message: Message) -> Dict[str, Any]:
         """Send SMS via Twilio"""
+        to_phone = None
         try:
-            # Ensure user has a phone number
-            if not message.to_user.profile.phone:
+            # Address resolved at fan-out; direct sends fall back to the user record
+            to_phone = message.to_address or normalize_phone(message.to_user.phone_number)
+            if not to_phone:
                 return {'status': 'failed', 'error': 'User has no phone number'}
             
             twilio_message = self.client.messages.create(
-                body=message.content,
+                body=message.rendered_content,
                 from_=settings.TWILIO_PHONE_NUMBER,  # Make sure this is set in settings
-                to=message.to_user.profile.phone
+                to=to_phone
             )
             
             return {
@@ -33,5 +37,7 @@ class SMSChannelService:
         except Exception as e:
             return {
                 'status': 'failed',
-                'error': str(e)
+                'error': str(e),
+                'error_code': getattr(e, 'code', None),
+                'to': to_phone
             }
@@ -2,6 +2,7 @@ from twilio.rest import Client
 from django.conf import settings
 import logging
 from ...models import Message
+from ..contact_point_service import normalize_phone
 
 logger = logging.getLogger(__name__)
 
@@ -17,12 +18,14 @@ class WhatsAppChannelService:
     
     def send(self, message: Message) -> dict:
         """Send WhatsApp message via Twilio"""
+        to_phone = None
         try:
-            # Ensure user has a phone number
-            if not hasattr(message.to_user, 'profile') or not message.to_user.profile.phone:
+            # Address resolved at fan-out; direct sends fall back to the user record
+            to_phone = message.to_address or normalize_phone(message.to_user.phone_number)
+            if not to_phone:
                 return {'status': 'failed', 'error': 'User has no phone number'}
             
-            to_whatsapp = f"whatsapp:{message.to_user.profile.phone}"
+            to_whatsapp = f"whatsapp:{to_phone}"
             
             # Check if this is a template message (contains variables)
             if message.variables_used and len(message.variables_used) > 0:
@@ -34,13 +37,15 @@ class WhatsAppChannelService:
             logger.error(f"WhatsApp sending failed for message {message.id}: {str(e)}")
             return {
                 'status': 'failed',
-                'error': str(e)
+                'error': str(e),
+                'error_code': getattr(e, 'code', None),
+                'to': to_phone
             }
     
     def _send_text_message(self, message: Message, to_whatsapp: str) -> dict:
         """Send regular text WhatsApp message"""
         twilio_message = self.client.messages.create(
-            body=message.content,
+            body=message.rendered_content,
             from_=self.whatsapp_number,
             to=to_whatsapp
         )
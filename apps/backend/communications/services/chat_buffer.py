@@ -0,0 +1,232 @@
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Dict, Any, List, Optional, Set, Tuple
+from uuid import uuid4
+
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import Conversation, ConversationMessage, MessageReadReceipt
+from .conversation_read_service import ConversationReadService
+from .conversation_history_service import ConversationHistoryService
+
+logger = logging.getLogger(__name__)
+
+PROVISIONAL_PREFIX = 'tmp-'
+
+# How many flushed provisional ids and receipts to remember for de-duplication
+RECENT_LIMIT = 10000
+
+
+class ChatWriteBuffer:
+    """
+    Per-process write-behind buffer for chat messages and read receipts.
+
+    Consumers hand messages and receipts to the buffer and broadcast at
+    once with a provisional id ('tmp-...'). A background task persists
+    everything gathered in the last flush interval with one bulk INSERT
+    per table, then tells each conversation group the real ids. Receipts
+    are de-duplicated against pending and recently persisted ones and
+    advance each reader's watermark once per conversation; per-message
+    receipt rows are written only for receipts the client marks explicit.
+    """
+
+    def __init__(self, flush_interval: Optional[float] = None, max_buffered: Optional[int] = None):
+        config = settings.COMMUNICATION_SETTINGS
+        self.flush_interval = flush_interval or config.get('CHAT_FLUSH_INTERVAL_MS', 250) / 1000
+        self.max_buffered = max_buffered or config.get('CHAT_MAX_BUFFERED', 20000)
+        self._messages: List[Dict[str, Any]] = []
+        self._receipts: Set[Tuple[int, Any]] = set()
+        self._explicit: Set[Tuple[int, Any]] = set()
+        self._resolved: Dict[str, int] = {}
+        self._recent_receipts: Dict[Tuple[int, int], bool] = {}
+        self._task = None
+        self._lock = asyncio.Lock()
+
+    # Intake
+    def add_message(self, conversation_id: int, sender_id: int, content: str, sender_name: str = '') -> Dict[str, Any]:
+        """Buffer a chat message; returns it with its provisional id"""
+        if len(self._messages) >= self.max_buffered:
+            raise OverflowError('Chat write buffer is full')
+        message = {
+            'provisional_id': f"{PROVISIONAL_PREFIX}{uuid4().hex}",
+            'conversation_id': int(conversation_id),
+            'sender_id': sender_id,
+            'sender_name': sender_name,
+            'content': content,
+            'created_at': timezone.now(),
+        }
+        self._messages.append(message)
+        self._ensure_flusher()
+        return message
+
+    def add_receipt(self, user_id: int, message_id, explicit: bool = False) -> bool:
+        """
+        Buffer a read receipt; returns False if it is a duplicate. Explicit
+        receipts also keep a per-message row, for "seen by" displays.
+        """
+        message_id = self._resolved.get(message_id, message_id)
+        if not self._is_provisional(message_id):
+            message_id = int(message_id)
+        key = (user_id, message_id)
+        if key in self._receipts or key in self._recent_receipts:
+            if explicit and key in self._receipts:
+                self._explicit.add(key)
+            return False
+        self._receipts.add(key)
+        if explicit:
+            self._explicit.add(key)
+        self._ensure_flusher()
+        return True
+
+    def pending_messages(self, conversation_id: int) -> List[Dict[str, Any]]:
+        """Buffered messages for a conversation, for history sent on connect"""
+        return [message for message in self._messages if message['conversation_id'] == int(conversation_id)]
+
+    # Flushing
+    def _ensure_flusher(self):
+        if self._task is not None and not self._task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop (management commands, tests); callers flush explicitly
+            return
+        self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        while self._messages or self._receipts:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def take_pending(self):
+        messages, receipts, explicit = self._messages, self._receipts, self._explicit
+        self._messages, self._receipts, self._explicit = [], set(), set()
+        return messages, receipts, explicit
+
+    async def flush(self):
+        """Persist everything buffered so far and announce the real ids"""
+        async with self._lock:
+            messages, receipts, explicit = self.take_pending()
+            if not messages and not receipts:
+                return
+            try:
+                persisted = await database_sync_to_async(self.persist)(messages, receipts, explicit)
+            except Exception as e:
+                logger.error(f"Failed to flush chat buffer ({len(messages)} messages, {len(receipts)} receipts): {str(e)}")
+                # Keep the batch for the next attempt rather than dropping it
+                self._messages = messages + self._messages
+                self._receipts |= receipts
+                self._explicit |= explicit
+                return
+
+        await self._announce(messages, persisted)
+
+    def persist(self, messages: List[Dict[str, Any]], receipts: Set[Tuple[int, Any]],
+                explicit: Set[Tuple[int, Any]] = frozenset()) -> Dict[str, int]:
+        """Bulk insert messages and receipts; returns provisional id -> real id"""
+        persisted = {}
+        with transaction.atomic():
+            # A conversation deleted since the sender connected would fail the whole INSERT
+            live = set(Conversation.objects.filter(
+                id__in={message['conversation_id'] for message in messages}
+            ).values_list('id', flat=True)) if messages else set()
+            messages = [message for message in messages if message['conversation_id'] in live]
+
+            if messages:
+                created = ConversationMessage.objects.bulk_create([
+                    ConversationMessage(
+                        conversation_id=message['conversation_id'],
+                        sender_id=message['sender_id'],
+                        content=message['content'],
+                    )
+                    for message in messages
+                ])
+                persisted = {message['provisional_id']: row.id for message, row in zip(messages, created)}
+                Conversation.objects.filter(id__in=live).update(last_message_at=timezone.now())
+                self._remember(self._resolved, persisted)
+
+                history = ConversationHistoryService()
+                serialized = [
+                    history.serialize(row, message['sender_name'])
+                    for message, row in zip(messages, created)
+                ]
+                transaction.on_commit(lambda: history.append(serialized))
+
+            if receipts:
+                self._persist_receipts(receipts, explicit)
+
+        return persisted
+
+    def _persist_receipts(self, receipts, explicit):
+        resolved = {}
+        for key in receipts:
+            user_id, message_id = key
+            message_id = self._resolved.get(message_id, message_id)
+            if self._is_provisional(message_id):
+                logger.warning(f"Dropping read receipt for unknown provisional message {message_id}")
+                continue
+            resolved[(user_id, message_id)] = key in explicit
+
+        # Unknown or deleted messages are skipped; they would fail the whole INSERT
+        conversations = dict(ConversationMessage.objects.filter(
+            id__in={message_id for _, message_id in resolved}
+        ).values_list('id', 'conversation_id'))
+        resolved = {key: is_explicit for key, is_explicit in resolved.items() if key[1] in conversations}
+
+        # One watermark move per reader and conversation, to the newest message read
+        watermarks = {}
+        for user_id, message_id in resolved:
+            pair = (user_id, conversations[message_id])
+            watermarks[pair] = max(watermarks.get(pair, 0), message_id)
+        ConversationReadService.advance_many(watermarks)
+
+        MessageReadReceipt.objects.bulk_create([
+            MessageReadReceipt(user_id=user_id, message_id=message_id)
+            for (user_id, message_id), is_explicit in resolved.items()
+            if is_explicit
+        ], ignore_conflicts=True)
+        self._remember(self._recent_receipts, dict.fromkeys(resolved, True))
+
+    @staticmethod
+    def _is_provisional(message_id) -> bool:
+        return isinstance(message_id, str) and message_id.startswith(PROVISIONAL_PREFIX)
+
+    @staticmethod
+    def _remember(recent: Dict, items: Dict):
+        recent.update(items)
+        if len(recent) > RECENT_LIMIT:
+            # Dicts keep insertion order; forget the oldest entries first
+            for key in list(recent)[:len(recent) - RECENT_LIMIT]:
+                del recent[key]
+
+    async def _announce(self, messages, persisted):
+        channel_layer = get_channel_layer()
+        if channel_layer is None or not persisted:
+            return
+
+        by_conversation = defaultdict(dict)
+        for message in messages:
+            if message['provisional_id'] in persisted:
+                by_conversation[message['conversation_id']][message['provisional_id']] = persisted[message['provisional_id']]
+
+        for conversation_id, ids in by_conversation.items():
+            await channel_layer.group_send(f'chat_{conversation_id}', {
+                'type': 'messages_persisted',
+                'ids': ids,
+            })
+
+
+_buffer = None
+
+
+def get_chat_buffer() -> ChatWriteBuffer:
+    """The process-wide chat buffer"""
+    global _buffer
+    if _buffer is None:
+        _buffer = ChatWriteBuffer()
+    return _buffer
@@ -0,0 +1,166 @@
+import logging
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from ..models import ContactPoint
+
+logger = logging.getLogger(__name__)
+
+# Which contact point a channel delivers to
+CHANNEL_CONTACT_TYPES = {
+    'email': 'email',
+    'sms': 'phone',
+    'whatsapp': 'whatsapp',
+    'push': 'fcm_token',
+}
+
+
+def normalize_phone(phone: Optional[str], default_country_code: Optional[str] = None) -> str:
+    """
+    Normalize a phone number to E.164 (+<country code><number>).
+
+    Numbers without an international prefix are assumed to be local to
+    COMMUNICATION_SETTINGS['DEFAULT_COUNTRY_CODE']. Returns '' for anything
+    that cannot be a valid E.164 number.
+    """
+    if not phone:
+        return ''
+    country_code = default_country_code or settings.COMMUNICATION_SETTINGS.get('DEFAULT_COUNTRY_CODE', '')
+    return _normalize_phone(phone, country_code)
+
+
+@lru_cache(maxsize=4096)
+def _normalize_phone(phone: str, country_code: str) -> str:
+    # Cached per country code, so a changed setting is never served stale results
+    phone = phone.strip()
+    digits = ''.join(c for c in phone if c.isdigit())
+    if not digits:
+        return ''
+
+    if phone.startswith('+'):
+        pass
+    elif digits.startswith('00'):
+        digits = digits[2:]
+    elif digits.startswith('0') and country_code:
+        digits = country_code + digits.lstrip('0')
+
+    # E.164 allows at most 15 digits; anything under 8 is not a full number
+    if not 8 <= len(digits) <= 15:
+        return ''
+    return f"+{digits}"
+
+
+def normalize_address(contact_type: str, value: Optional[str]) -> str:
+    """Normalize an address of any contact type for storage and lookups"""
+    if contact_type in ('phone', 'whatsapp'):
+        return normalize_phone(value)
+    value = (value or '').strip()
+    return value.lower() if contact_type == 'email' else value
+
+
+class ContactPointService:
+    """Resolves ready-to-send addresses for users without touching their profiles"""
+
+    @staticmethod
+    def get_addresses(users: Iterable, channel_type: str) -> Dict[int, List[str]]:
+        """
+        Map user id to the addresses for a channel with a single query.
+        Primary and verified addresses come first. Users without contact
+        points fall back to the address on the user record.
+        """
+        users = list(users)
+        contact_type = CHANNEL_CONTACT_TYPES.get(channel_type)
+        if not contact_type or not users:
+            return {}
+
+        addresses = {}
+        contact_points = ContactPoint.objects.filter(
+            user_id__in=[user.pk for user in users],
+            contact_type=contact_type
+        ).order_by('user_id', '-is_primary', '-is_verified', 'failure_count').values_list('user_id', 'value')
+
+        for user_id, value in contact_points:
+            addresses.setdefault(user_id, []).append(value)
+
+        # Users created before the backfill or without a synced address
+        for user in users:
+            if user.pk not in addresses:
+                fallback = ContactPointService._user_record_address(user, contact_type)
+                if fallback:
+                    addresses[user.pk] = [fallback]
+
+        return addresses
+
+    @staticmethod
+    def _user_record_address(user, contact_type: str) -> str:
+        if contact_type == 'email':
+            return normalize_address('email', user.email)
+        if contact_type in ('phone', 'whatsapp'):
+            return normalize_phone(getattr(user, 'phone_number', None))
+        return ''
+
+    @staticmethod
+    def get_primary_addresses(users: Iterable, channel_type: str) -> Dict[int, str]:
+        """Map user id to the single best address for a channel"""
+        return {
+            user_id: values[0]
+            for user_id, values in ContactPointService.get_addresses(users, channel_type).items()
+        }
+
+    @staticmethod
+    def get_values(user_id: int, contact_type: str) -> List[str]:
+        """All addresses of one type for a user (e.g. every FCM device token)"""
+        return list(ContactPoint.objects.filter(
+            user_id=user_id,
+            contact_type=contact_type
+        ).values_list('value', flat=True))
+
+    @staticmethod
+    def sync_user(user):
+        """Keep email and phone contact points in step with the user record"""
+        desired = {'email': normalize_address('email', user.email)}
+        phone = normalize_phone(getattr(user, 'phone_number', None))
+        desired['phone'] = phone
+        desired['whatsapp'] = phone
+
+        for contact_type, value in desired.items():
+            # Demote addresses the user no longer has on their record
+            ContactPoint.objects.filter(
+                user=user, contact_type=contact_type, is_primary=True
+            ).exclude(value=value).update(is_primary=False)
+
+            if value:
+                ContactPoint.objects.update_or_create(
+                    user=user,
+                    contact_type=contact_type,
+                    value=value,
+                    defaults={'is_primary': True}
+                )
+
+    @staticmethod
+    def register_device_token(user, token: str) -> ContactPoint:
+        """Store an FCM device token for push delivery"""
+        contact_point, _ = ContactPoint.objects.update_or_create(
+            user=user,
+            contact_type='fcm_token',
+            value=token.strip(),
+            defaults={'is_verified': True, 'failure_count': 0}
+        )
+        return contact_point
+
+    @staticmethod
+    def record_failure(contact_type: str, value: str, reason: str):
+        """Track a delivery failure against every contact point with this address"""
+        value = normalize_address(contact_type, value)
+        if not value:
+            return 0
+
+        return ContactPoint.objects.filter(contact_type=contact_type, value=value).update(
+            failure_count=F('failure_count') + 1,
+            last_failure_at=timezone.now(),
+            last_failure_reason=reason[:255]
+        )
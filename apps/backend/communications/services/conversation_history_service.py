@@ -0,0 +1,145 @@
+import json
+import base64
+import binascii
+import logging
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import Q
+from django_redis import get_redis_connection
+from redis.exceptions import WatchError
+
+from ..models import Conversation, ConversationMessage
+
+logger = logging.getLogger(__name__)
+
+TAIL_KEY = 'communications:chat:tail:{}'
+# Bumped on every append; a rebuild only publishes if nothing was appended meanwhile
+TAIL_GENERATION_KEY = 'communications:chat:tail:{}:gen'
+
+
+def sender_display_name(user) -> str:
+    """The name shown for a message's sender, however the message arrived"""
+    return user.get_full_name() or user.email
+
+
+class ConversationHistoryService:
+    """
+    Conversation history: a cached hot tail plus keyset pages for the rest.
+
+    The newest CHAT_HOT_TAIL_SIZE messages of each conversation are kept
+    serialized in a capped Redis list, appended to as messages are
+    persisted, so connects and first page loads are served without the
+    database. Older history is read with a keyset cursor on
+    (created_at, id), newest first.
+    """
+
+    def __init__(self):
+        config = settings.COMMUNICATION_SETTINGS
+        self.tail_size = config.get('CHAT_HOT_TAIL_SIZE', 50)
+        self.tail_ttl = config.get('CHAT_HOT_TAIL_TTL_SECONDS', 60 * 60 * 24)
+
+    # Serialization
+    @staticmethod
+    def serialize(message: ConversationMessage, sender_name: Optional[str] = None) -> Dict[str, Any]:
+        return {
+            'id': message.id,
+            'conversation': message.conversation_id,
+            'sender': message.sender_id,
+            'sender_name': sender_name if sender_name is not None else sender_display_name(message.sender),
+            'content': message.content,
+            'created_at': message.created_at.isoformat(),
+        }
+
+    # Cursors
+    @staticmethod
+    def encode_cursor(message: Dict[str, Any]) -> str:
+        raw = f"{message['created_at']}|{message['id']}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+        """Raises ValueError for malformed cursors"""
+        try:
+            created_at, message_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+            return datetime.fromisoformat(created_at), int(message_id)
+        except (TypeError, UnicodeDecodeError, binascii.Error) as e:
+            raise ValueError(f'Invalid cursor: {cursor}') from e
+
+    # Hot tail
+    def get_tail(self, conversation_id: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        Newest messages, oldest first. Returns None if the conversation does
+        not exist.
+        """
+        conn = get_redis_connection('default')
+        key = TAIL_KEY.format(conversation_id)
+        cached = conn.lrange(key, 0, -1)
+        if cached:
+            return [json.loads(item) for item in cached]
+        return self._rebuild_tail(conn, conversation_id)
+
+    def _rebuild_tail(self, conn, conversation_id: int) -> Optional[List[Dict[str, Any]]]:
+        key = TAIL_KEY.format(conversation_id)
+        generation_key = TAIL_GENERATION_KEY.format(conversation_id)
+
+        with conn.pipeline() as pipe:
+            pipe.watch(generation_key)
+            messages = self._load_page(conversation_id, None, self.tail_size)
+            if not messages and not Conversation.objects.filter(id=conversation_id).exists():
+                return None
+            if messages:
+                try:
+                    pipe.multi()
+                    pipe.delete(key)
+                    pipe.rpush(key, *[json.dumps(message) for message in messages])
+                    pipe.expire(key, self.tail_ttl)
+                    pipe.execute()
+                except WatchError:
+                    # A message was appended while loading; the next read rebuilds
+                    logger.debug(f"Skipped caching tail for conversation {conversation_id}: appended during rebuild")
+        return messages
+
+    def append(self, messages: List[Dict[str, Any]]):
+        """Append persisted messages to their conversations' cached tails"""
+        conn = get_redis_connection('default')
+        pipe = conn.pipeline(transaction=False)
+        for message in messages:
+            key = TAIL_KEY.format(message['conversation'])
+            pipe.incr(TAIL_GENERATION_KEY.format(message['conversation']))
+            pipe.expire(TAIL_GENERATION_KEY.format(message['conversation']), self.tail_ttl)
+            # Only extend tails that are already cached; missing ones are rebuilt on read
+            pipe.rpushx(key, json.dumps(message))
+            pipe.ltrim(key, -self.tail_size, -1)
+        pipe.execute()
+
+    # Older history
+    def get_page(self, conversation_id: int, before: Optional[str] = None,
+                 limit: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        A page of history, oldest first, with the cursor for the page before
+        it. Without `before` this is the hot tail, and None means the
+        conversation does not exist.
+        """
+        limit = min(limit or self.tail_size, self.tail_size * 4)
+        if before is None:
+            messages = self.get_tail(conversation_id)
+            if messages is None:
+                return None
+        else:
+            messages = self._load_page(conversation_id, self.decode_cursor(before), limit)
+
+        has_more = len(messages) >= (self.tail_size if before is None else limit)
+        return {
+            'messages': messages,
+            'next_cursor': self.encode_cursor(messages[0]) if messages and has_more else None,
+        }
+
+    def _load_page(self, conversation_id: int, before: Optional[Tuple[datetime, int]], limit: int) -> List[Dict[str, Any]]:
+        queryset = ConversationMessage.objects.filter(conversation_id=conversation_id).select_related('sender')
+        if before is not None:
+            created_at, message_id = before
+            queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=message_id))
+        rows = list(queryset.order_by('-created_at', '-id')[:limit])
+        return [self.serialize(message) for message in reversed(rows)]
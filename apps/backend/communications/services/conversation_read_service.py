@@ -0,0 +1,91 @@
+import logging
+from typing import Dict
+
+from django.db.models import BigIntegerField, Case, Count, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+from ..models import ConversationMessage, ConversationParticipant
+
+logger = logging.getLogger(__name__)
+
+# Watermarks advanced per UPDATE statement
+ADVANCE_BATCH_SIZE = 500
+
+
+class ConversationReadService:
+    """
+    Read state for conversations, kept as a watermark per participant.
+
+    ConversationParticipant.last_read_message_id marks everything in the
+    conversation up to that id as read. A message is read when its id is at
+    or below the watermark, unread counts are one indexed range count, and
+    the watermark only ever moves forward.
+    """
+
+    @staticmethod
+    def watermark(user, conversation_id: int) -> int:
+        return ConversationParticipant.objects.filter(
+            user=user, conversation_id=conversation_id
+        ).values_list('last_read_message_id', flat=True).first() or 0
+
+    @staticmethod
+    def advance(user_id: int, conversation_id: int, message_id: int) -> bool:
+        """Move the watermark up to message_id; returns False if it was already past it"""
+        return bool(ConversationParticipant.objects.filter(
+            user_id=user_id,
+            conversation_id=conversation_id,
+            last_read_message_id__lt=message_id,
+        ).update(last_read_message_id=message_id))
+
+    @staticmethod
+    def advance_many(watermarks: Dict[tuple, int]) -> int:
+        """
+        Advance several (user_id, conversation_id) watermarks with one UPDATE
+        per batch; returns the number of watermarks that moved.
+        """
+        items = list(watermarks.items())
+        advanced = 0
+        for start in range(0, len(items), ADVANCE_BATCH_SIZE):
+            batch = items[start:start + ADVANCE_BATCH_SIZE]
+            rows = Q()
+            new_watermarks = []
+            for (user_id, conversation_id), message_id in batch:
+                rows |= Q(user_id=user_id, conversation_id=conversation_id, last_read_message_id__lt=message_id)
+                new_watermarks.append(When(user_id=user_id, conversation_id=conversation_id, then=Value(message_id)))
+            advanced += ConversationParticipant.objects.filter(rows).update(
+                last_read_message_id=Case(*new_watermarks, output_field=BigIntegerField())
+            )
+        return advanced
+
+    @staticmethod
+    def mark_all_read(user, conversation_id: int) -> bool:
+        """Mark the whole conversation read in one UPDATE"""
+        newest = ConversationMessage.objects.filter(
+            conversation_id=conversation_id
+        ).order_by('-id').values('id')[:1]
+        return bool(ConversationParticipant.objects.filter(
+            user=user, conversation_id=conversation_id
+        ).update(last_read_message_id=Coalesce(Subquery(newest), 0, output_field=BigIntegerField())))
+
+    @staticmethod
+    def unread_count(user, conversation_id: int) -> int:
+        watermark = ConversationParticipant.objects.filter(
+            user=user, conversation_id=conversation_id
+        ).values('last_read_message_id')[:1]
+        return ConversationMessage.objects.filter(
+            conversation_id=conversation_id,
+            id__gt=Coalesce(Subquery(watermark), 0, output_field=BigIntegerField()),
+        ).exclude(sender=user).count()
+
+    @staticmethod
+    def with_unread_counts(conversations, user):
+        """Annotate a Conversation queryset with `unread_count` for the user"""
+        unread = ConversationMessage.objects.filter(
+            conversation=OuterRef('pk'),
+            id__gt=Coalesce(Subquery(
+                ConversationParticipant.objects.filter(
+                    user=user, conversation=OuterRef(OuterRef('pk'))
+                ).values('last_read_message_id')[:1]
+            ), 0, output_field=BigIntegerField()),
+        ).exclude(sender=user).order_by().values('conversation').annotate(count=Count('id')).values('count')
+        return conversations.annotate(unread_count=Coalesce(Subquery(unread, output_field=IntegerField()), 0))
@@ -1,10 +1,23 @@
+import logging
 from django.conf import settings
+from core.backpressure import record_provider_result
 from ..models import Message
 from .channels.email_service import EmailChannelService
 from .channels.sms_service import SMSChannelService
 from .channels.whatsapp_service import WhatsAppChannelService
 from .channels.push_service import PushNotificationService
 from .channels.in_app_service import InAppMessageService
+from .suppression_service import SuppressionService
+from .contact_point_service import ContactPointService, CHANNEL_CONTACT_TYPES
+
+logger = logging.getLogger(__name__)
+
+# Twilio error codes that mean the number will never accept our messages
+HARD_FAILURE_CODES = {
+    21211: 'invalid',       # Invalid 'To' phone number
+    21614: 'invalid',       # 'To' number is not a valid mobile number
+    21610: 'unsubscribe',   # Recipient replied STOP
+}
 
 class DeliveryService:
     """Main delivery service that routes messages to appropriate channels"""
@@ -16,6 +29,7 @@ class DeliveryService:
             'whatsapp': WhatsAppChannelService(),
             'push': PushNotificationService(),
             'in_app': InAppMessageService(),
+            'announcement': InAppMessageService(),
         }
     
     def send_message(self, message: Message) -> dict:
@@ -38,6 +52,7 @@ class DeliveryService:
             return result
             
         except Exception as e:
+            self._record_provider_outcome(channel_type, success=False)
             return {
                 'status': 'failed',
                 'error': str(e)
@@ -45,8 +60,43 @@ class DeliveryService:
     
     def _log_delivery_attempt(self, message: Message, result: dict):
         """Log delivery attempt for analytics"""
-        # You can implement detailed logging here
-        pass
+        channel_type = message.channel.channel_type
+        self._record_provider_outcome(channel_type, success=result.get('status') != 'failed')
+        
+        if result.get('status') != 'failed':
+            return
+        
+        contact_type = CHANNEL_CONTACT_TYPES.get(channel_type)
+        address = message.to_address or result.get('to')
+        if contact_type and address:
+            try:
+                ContactPointService.record_failure(contact_type, address, result.get('error', ''))
+            except Exception as e:
+                logger.error(f"Could not record contact point failure for message {message.id}: {str(e)}")
+        
+        if result.get('error_code') in HARD_FAILURE_CODES:
+            self._suppress_address(message, result)
+    
+    def _suppress_address(self, message: Message, result: dict):
+        """Add a permanently failing address to the suppression list"""
+        contact_type = 'whatsapp' if message.channel.channel_type == 'whatsapp' else 'phone'
+        try:
+            SuppressionService().record(
+                contact_type,
+                message.to_address or result.get('to', ''),
+                HARD_FAILURE_CODES[result['error_code']],
+                source='twilio',
+                details={'error_code': result['error_code'], 'message_id': message.id}
+            )
+        except Exception as e:
+            logger.error(f"Could not suppress address for message {message.id}: {str(e)}")
+    
+    def _record_provider_outcome(self, channel_type: str, success: bool):
+        """Feed provider error rates to the bulk-task backpressure controller"""
+        try:
+            record_provider_result(channel_type, success)
+        except Exception as e:
+            logger.debug(f"Could not record provider result for {channel_type}: {str(e)}")
     
     def get_channel_status(self, channel_type: str) -> dict:
         """Get status of a specific channel"""
@@ -0,0 +1,219 @@
+import json
+import logging
+from collections import Counter
+from datetime import timedelta
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from ..models import NotificationDigestEntry
+from .contact_point_service import ContactPointService
+from .notification_service import NotificationService
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+DIGEST_CHANNELS = ('in_app', 'email', 'push')
+DEFAULT_WINDOW_SECONDS = 600
+
+# Lines listed in a combined message; the rest are summarized as a count
+DIGEST_MAX_LINES = 10
+# How long a flusher owns the entries it claimed; if it dies mid-send they
+# become due again after this
+DIGEST_CLAIM_LEASE = timedelta(minutes=5)
+
+
+class NotificationDigestService:
+    """
+    Coalesces low-priority notifications into one digest per user and channel.
+
+    The first notification held for a user on a channel opens a window of
+    DIGEST_WINDOWS[channel] seconds. Everything arriving before it closes
+    shares its deliver_after and goes out as a single combined message when
+    flush_due runs. Urgent notifications, and categories listed in
+    DIGEST_BYPASS_CATEGORIES, are sent at once.
+    """
+
+    def __init__(self):
+        config = settings.COMMUNICATION_SETTINGS
+        self.windows = config.get('DIGEST_WINDOWS', {})
+        self.bypass_categories = set(config.get('DIGEST_BYPASS_CATEGORIES', ()))
+        self.max_attempts = config.get('DIGEST_MAX_ATTEMPTS', 3)
+        self._push_service = None
+
+    def window(self, channel_type: str) -> timedelta:
+        return timedelta(seconds=self.windows.get(channel_type, DEFAULT_WINDOW_SECONDS))
+
+    def is_urgent(self, category: str, urgent: bool = False) -> bool:
+        return urgent or category in self.bypass_categories
+
+    # Intake
+    def notify(self, user_ids: Iterable[int], channel_type: str, title: str, message: str,
+               category: str = 'info', data: Optional[Dict[str, Any]] = None, urgent: bool = False) -> int:
+        """
+        Send a notification to users now, or hold it for their digest.
+        Returns how many notifications were held.
+        """
+        if channel_type not in DIGEST_CHANNELS:
+            raise ValueError(f"Unsupported digest channel: {channel_type}")
+        user_ids = list(dict.fromkeys(user_ids))
+        if not user_ids:
+            return 0
+
+        if self.is_urgent(category, urgent) or not self.window(channel_type):
+            self._send_now(user_ids, channel_type, title, message, category, data or {})
+            return 0
+
+        # Join each user's open window, or open one
+        now = timezone.now()
+        open_windows = dict(
+            NotificationDigestEntry.objects.filter(user_id__in=user_ids, channel_type=channel_type)
+            .order_by().values('user_id').annotate(closes=Min('deliver_after')).values_list('user_id', 'closes')
+        )
+        closes = now + self.window(channel_type)
+        NotificationDigestEntry.objects.bulk_create([
+            NotificationDigestEntry(
+                user_id=user_id, channel_type=channel_type, category=category,
+                title=title, message=message, data=data or {},
+                deliver_after=open_windows.get(user_id, closes),
+            )
+            for user_id in user_ids
+        ])
+        return len(user_ids)
+
+    def _send_now(self, user_ids: List[int], channel_type: str, title: str, message: str,
+                  category: str, data: Dict[str, Any]):
+        if channel_type == 'in_app':
+            try:
+                NotificationService().create(user_ids, title, message, category, data)
+            except Exception as e:
+                logger.error(f"Failed to send in-app notification to {len(user_ids)} users: {str(e)}")
+            return
+        for user_id in user_ids:
+            try:
+                self._send(user_id, channel_type, title, message, category, data)
+            except Exception as e:
+                logger.error(f"Failed to send {channel_type} notification to user {user_id}: {str(e)}")
+
+    # Flushing
+    def flush_due(self, now=None) -> int:
+        """Send every digest whose window has closed; returns how many were sent"""
+        now = now or timezone.now()
+        due = (
+            NotificationDigestEntry.objects.filter(deliver_after__lte=now)
+            .order_by().values_list('user_id', 'channel_type').distinct()
+        )
+        return sum(self._flush_digest(user_id, channel_type, now) for user_id, channel_type in list(due))
+
+    def _flush_digest(self, user_id: int, channel_type: str, now) -> int:
+        # Providers can be slow: claim in one short transaction, send with no
+        # locks held, then record the outcome in another
+        entries = self._claim(user_id, channel_type, now)
+        if not entries:
+            return 0
+
+        title, message, category, data = self.combine(entries)
+        try:
+            delivered = self._send(user_id, channel_type, title, message, category, data)
+        except Exception as e:
+            logger.error(f"Failed to send {channel_type} digest to user {user_id}: {str(e)}")
+            delivered = False
+
+        ids = [entry.id for entry in entries]
+        if delivered:
+            NotificationDigestEntry.objects.filter(id__in=ids).delete()
+            return 1
+
+        attempts = max(entry.attempts for entry in entries) + 1
+        if attempts >= self.max_attempts:
+            logger.error(f"Dropping {channel_type} digest for user {user_id} after {attempts} attempts")
+            NotificationDigestEntry.objects.filter(id__in=ids).delete()
+        else:
+            NotificationDigestEntry.objects.filter(id__in=ids).update(
+                attempts=attempts, deliver_after=now + self.window(channel_type)
+            )
+        return 0
+
+    def _claim(self, user_id: int, channel_type: str, now) -> List[NotificationDigestEntry]:
+        """
+        Take a user's due entries on a channel for this flusher, by moving
+        them out of the due set for the claim lease
+        """
+        with transaction.atomic():
+            # Concurrent flushers skip digests another worker is already claiming
+            entries = list(
+                NotificationDigestEntry.objects.select_for_update(skip_locked=True)
+                .filter(user_id=user_id, channel_type=channel_type, deliver_after__lte=now)
+                .order_by('created_at', 'id')
+            )
+            if entries:
+                NotificationDigestEntry.objects.filter(id__in=[entry.id for entry in entries]).update(
+                    deliver_after=now + DIGEST_CLAIM_LEASE
+                )
+        return entries
+
+    @staticmethod
+    def combine(entries: List[NotificationDigestEntry]) -> Tuple[str, str, str, Dict[str, Any]]:
+        """The (title, message, category, data) sent for a digest's entries"""
+        if len(entries) == 1:
+            entry = entries[0]
+            return entry.title, entry.message, entry.category, entry.data
+
+        lines = [f"- {entry.title}" for entry in entries[-DIGEST_MAX_LINES:]]
+        if len(entries) > DIGEST_MAX_LINES:
+            lines.insert(0, f"...and {len(entries) - DIGEST_MAX_LINES} earlier")
+        return (
+            f"{len(entries)} new notifications",
+            '\n'.join(lines),
+            'digest',
+            {
+                'count': len(entries),
+                'categories': dict(Counter(entry.category for entry in entries)),
+                'items': [
+                    {'title': entry.title, 'category': entry.category, 'data': entry.data}
+                    for entry in entries[-DIGEST_MAX_LINES:]
+                ],
+            },
+        )
+
+    # Delivery
+    def _send(self, user_id: int, channel_type: str, title: str, message: str,
+              category: str, data: Dict[str, Any]) -> bool:
+        """
+        Deliver one notification. Returns False for failures worth retrying;
+        users without an address for the channel are skipped.
+        """
+        if channel_type == 'in_app':
+            NotificationService().create([user_id], title, message, category, data)
+            return True
+
+        if channel_type == 'email':
+            user = User.objects.filter(id=user_id).first()
+            address = ContactPointService.get_primary_addresses([user], 'email').get(user_id) if user else None
+            if not address:
+                logger.info(f"No email address for user {user_id}; skipping notification")
+                return True
+            return send_mail(title, message, settings.DEFAULT_FROM_EMAIL, [address]) > 0
+
+        if channel_type == 'push':
+            result = self.push_service.send_to_user(user_id, title, message, {
+                key: value if isinstance(value, str) else json.dumps(value)
+                for key, value in {**data, 'category': category}.items()
+            })
+            return result['status'] == 'sent' or result.get('no_devices', False)
+
+        raise ValueError(f"Unsupported digest channel: {channel_type}")
+
+    @property
+    def push_service(self):
+        # Firebase is initialized on construction; only pay for it when pushing
+        if self._push_service is None:
+            from .channels.push_service import PushNotificationService
+            self._push_service = PushNotificationService()
+        return self._push_service
@@ -0,0 +1,180 @@
+import os
+import csv
+import gzip
+import json
+import logging
+from typing import Dict, Any, Iterator, Optional, TextIO
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from ..models import Message, MessageCampaign
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_COLUMNS = [
+    'id', 'campaign_id', 'channel', 'from_user', 'to_user', 'status', 'subject',
+    'sent_at', 'delivered_at', 'read_at', 'open_count', 'click_count', 'created_at',
+]
+
+CAMPAIGN_COLUMNS = ['id', 'name', 'template', 'schedule_type', 'status', 'scheduled_for', 'created_at']
+
+EXPORT_FORMATS = ('csv', 'jsonl', 'parquet')
+
+PARQUET_BATCH_SIZE = 10000
+
+
+class MessageExporter:
+    """
+    Streams messages to gzip CSV/JSONL or Parquet in constant memory.
+
+    Rows are read with a server-side iterator, joined to channel, users and
+    the shared message body in the same query, and written as they arrive. An optional
+    watermark file records the last exported message id, so the next run
+    exports only newer messages.
+    """
+
+    def __init__(self, chunk_size: int = 2000):
+        self.chunk_size = chunk_size
+
+    # Sources
+    def message_queryset(self, since=None, after_id: Optional[int] = None):
+        queryset = Message.objects.select_related(
+            'channel', 'from_user', 'to_user', 'body'
+        ).only(
+            'id', 'campaign_id', 'status', 'subject', 'content', 'variables_used', 'body',
+            'sent_at', 'delivered_at', 'read_at', 'open_count', 'click_count', 'created_at',
+            'channel__channel_type', 'from_user__email', 'to_user__email',
+            'body__subject', 'body__content',
+        ).order_by('id')
+
+        if since is not None:
+            queryset = queryset.filter(created_at__gte=since)
+        if after_id is not None:
+            queryset = queryset.filter(id__gt=after_id)
+        return queryset
+
+    def message_rows(self, queryset) -> Iterator[Dict[str, Any]]:
+        for msg in queryset.iterator(chunk_size=self.chunk_size):
+            yield {
+                'id': msg.id,
+                'campaign_id': msg.campaign_id or '',
+                'channel': msg.channel.channel_type,
+                'from_user': msg.from_user.email,
+                'to_user': msg.to_user.email if msg.to_user_id else '',
+                'status': msg.status,
+                'subject': msg.rendered_subject,
+                'sent_at': msg.sent_at,
+                'delivered_at': msg.delivered_at,
+                'read_at': msg.read_at,
+                'open_count': msg.open_count,
+                'click_count': msg.click_count,
+                'created_at': msg.created_at,
+            }
+
+    def campaign_rows(self, since=None) -> Iterator[Dict[str, Any]]:
+        campaigns = MessageCampaign.objects.order_by('id')
+        if since is not None:
+            campaigns = campaigns.filter(created_at__gte=since)
+        for row in campaigns.values(
+            'id', 'name', 'template__name', 'schedule_type', 'status', 'scheduled_for', 'created_at'
+        ).iterator(chunk_size=self.chunk_size):
+            row['template'] = row.pop('template__name')
+            yield row
+
+    # Writers
+    def write(self, rows: Iterator[Dict[str, Any]], columns, fmt: str, path: Optional[str] = None,
+              stream: Optional[TextIO] = None) -> Dict[str, Any]:
+        """Write rows to `path` (compressed) or to an open text stream"""
+        if fmt == 'parquet':
+            if not path:
+                raise ValueError('Parquet export needs an output file')
+            return self._write_parquet(rows, columns, path)
+
+        if path:
+            self._ensure_dir(path)
+            with gzip.open(path, 'wt', encoding='utf-8', newline='') as output:
+                return self._write_text(rows, columns, fmt, output)
+        return self._write_text(rows, columns, fmt, stream)
+
+    def _write_text(self, rows, columns, fmt, output) -> Dict[str, Any]:
+        count, last_id = 0, None
+        if fmt == 'csv':
+            writer = csv.DictWriter(output, fieldnames=columns, extrasaction='ignore')
+            writer.writeheader()
+            for row in rows:
+                writer.writerow(row)
+                count, last_id = count + 1, row['id']
+        else:
+            for row in rows:
+                output.write(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+                count, last_id = count + 1, row['id']
+        return {'rows': count, 'last_id': last_id}
+
+    def _write_parquet(self, rows, columns, path) -> Dict[str, Any]:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError('Parquet export requires pyarrow (pip install pyarrow)')
+
+        self._ensure_dir(path)
+        schema = pa.schema([(column, self._parquet_type(pa, column)) for column in columns])
+        writer = pq.ParquetWriter(path, schema, compression='snappy')
+        count, last_id = 0, None
+        batch = []
+
+        def flush():
+            writer.write_table(pa.Table.from_pylist(
+                [{column: self._parquet_value(row.get(column)) for column in columns} for row in batch],
+                schema=schema
+            ))
+            batch.clear()
+
+        try:
+            for row in rows:
+                batch.append(row)
+                count, last_id = count + 1, row['id']
+                if len(batch) >= PARQUET_BATCH_SIZE:
+                    flush()
+            if batch:
+                flush()
+        finally:
+            writer.close()
+
+        return {'rows': count, 'last_id': last_id}
+
+    @staticmethod
+    def _parquet_type(pa, column):
+        if column in ('id', 'campaign_id', 'open_count', 'click_count'):
+            return pa.int64()
+        if column.endswith('_at') or column == 'scheduled_for':
+            return pa.timestamp('us', tz='UTC')
+        return pa.string()
+
+    @staticmethod
+    def _parquet_value(value):
+        # Empty strings stand in for missing foreign keys in the text formats
+        return None if value == '' else value
+
+    @staticmethod
+    def _ensure_dir(path):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    # Watermarks
+    @staticmethod
+    def read_watermark(path: str) -> Optional[int]:
+        try:
+            with open(path, encoding='utf-8') as watermark_file:
+                return json.load(watermark_file).get('last_id')
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def write_watermark(path: str, last_id: int):
+        """Atomically record the last exported message id"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as watermark_file:
+            json.dump({'last_id': last_id, 'exported_at': timezone.now().isoformat()}, watermark_file)
+        os.replace(tmp_path, path)
@@ -0,0 +1,55 @@
+"""
+Membership of the church groups that messages can be addressed to.
+
+Message.to_group and the 'group_id' audience filter refer to the groups
+app's Group model (departments, ministries, cells), not to auth.Group,
+which holds permission roles. The two are separate tables whose ids
+overlap, so memberships must be resolved through the groups model itself,
+along COMMUNICATION_SETTINGS['GROUP_MEMBERS_LOOKUP'].
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+
+from ..models import Message
+
+
+def group_model():
+    return Message._meta.get_field('to_group').related_model
+
+
+def group_member_lookup():
+    """
+    The configured lookup path from a Group to its users, such as 'members'
+    or 'memberships__user'. Raises ImproperlyConfigured unless the path
+    exists and ends at the user model.
+    """
+    lookup = settings.COMMUNICATION_SETTINGS.get('GROUP_MEMBERS_LOOKUP')
+    if not lookup:
+        raise ImproperlyConfigured("COMMUNICATION_SETTINGS['GROUP_MEMBERS_LOOKUP'] is not set")
+
+    model = group_model()
+    try:
+        for name in lookup.split('__'):
+            model = model._meta.get_field(name).related_model
+    except (FieldDoesNotExist, AttributeError):
+        model = None
+    if model is not get_user_model():
+        raise ImproperlyConfigured(
+            f"GROUP_MEMBERS_LOOKUP '{lookup}' does not lead from {group_model()._meta.label} to the user model"
+        )
+    return lookup
+
+
+def user_group_ids(user):
+    """Ids of the groups the user belongs to"""
+    if not getattr(user, 'pk', None):
+        return []
+    lookup = group_member_lookup()
+    return list(group_model().objects.filter(**{lookup: user}).values_list('pk', flat=True).distinct())
+
+
+def group_user_ids(group_id):
+    """Ids of the users in a group, as a queryset to use as a subquery"""
+    lookup = group_member_lookup()
+    return group_model().objects.filter(pk=group_id, **{f"{lookup}__isnull": False}).values_list(lookup, flat=True)
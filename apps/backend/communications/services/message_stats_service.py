@@ -0,0 +1,290 @@
+import logging
+from collections import Counter, defaultdict
+from datetime import datetime, time, timedelta
+from typing import Dict, Iterable, Tuple
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from core.result_cache import bump_version
+from ..models import Message, MessageCampaign, MessageDailyStats
+
+logger = logging.getLogger(__name__)
+
+# Statuses with their own rollup counter; queued is total minus the rest
+STATUS_COUNTERS = ('sent', 'delivered', 'read', 'failed')
+
+# Per-status counters on MessageCampaign
+CAMPAIGN_STATUS_FIELDS = {
+    'queued': 'queued_count',
+    'sent': 'sent_count',
+    'delivered': 'delivered_count',
+    'read': 'read_count',
+    'failed': 'failed_count',
+}
+
+# Columns needed to place a message in its rollup row
+KEY_FIELDS = ('created_at', 'channel_id', 'campaign_id', 'to_branch_id', 'to_user__branch_id')
+
+# Advisory lock namespace for rollup days; the second key is the day's ordinal
+STATS_LOCK_NAMESPACE = 4201
+
+
+class MessageStatsService:
+    """
+    Maintains MessageDailyStats and the MessageCampaign counters.
+
+    Every code path that creates messages or changes their status reports
+    it here, and the matching rollup row and campaign are adjusted with
+    F() updates. reconcile() and repair_campaign_counters() recompute from
+    Message with a single GROUP BY, fixing any drift, for example from a
+    crash between a status change and its stats update.
+    """
+
+    # Keys
+    @staticmethod
+    def key_for_row(row: Dict) -> Tuple:
+        """Rollup key from a values() row containing KEY_FIELDS"""
+        return (
+            timezone.localdate(row['created_at']),
+            row['channel_id'],
+            row['to_branch_id'] or row['to_user__branch_id'],
+            row['campaign_id'],
+        )
+
+    @staticmethod
+    def key_for_message(message: Message) -> Tuple:
+        branch_id = message.to_branch_id
+        if branch_id is None and message.to_user_id:
+            branch_id = getattr(message.to_user, 'branch_id', None)
+        return (timezone.localdate(message.created_at), message.channel_id, branch_id, message.campaign_id)
+
+    # Incremental updates
+    def record_created(self, messages: Iterable[Message], branch_ids: Dict[int, int] = None):
+        """
+        Count newly created messages. `branch_ids` maps user id to branch id
+        so fan-out can pass what it already knows instead of loading users.
+        """
+        deltas = defaultdict(Counter)
+        campaign_deltas = defaultdict(Counter)
+        for message in messages:
+            branch_id = message.to_branch_id
+            if branch_id is None and branch_ids is not None:
+                branch_id = branch_ids.get(message.to_user_id)
+            key = (timezone.localdate(message.created_at), message.channel_id, branch_id, message.campaign_id)
+            deltas[key]['total'] += 1
+            if message.status in STATUS_COUNTERS:
+                deltas[key][message.status] += 1
+            if message.campaign_id:
+                campaign_deltas[message.campaign_id]['total_messages'] += 1
+                self._add_campaign_transition(campaign_deltas[message.campaign_id], None, message.status)
+        self.apply(deltas)
+        self.apply_campaign(campaign_deltas)
+
+    def record_transition(self, message: Message, old_status: str, new_status: str):
+        """Move one message between status counters"""
+        if old_status == new_status:
+            return
+        deltas = defaultdict(Counter)
+        self._add_transition(deltas, self.key_for_message(message), old_status, new_status)
+        self.apply(deltas)
+        if message.campaign_id:
+            campaign_deltas = defaultdict(Counter)
+            self._add_campaign_transition(campaign_deltas[message.campaign_id], old_status, new_status)
+            self.apply_campaign(campaign_deltas)
+
+    def record_row_transitions(self, rows: Iterable[Dict], new_status: str):
+        """Bulk variant of record_transition for values() rows with a 'status' column"""
+        deltas = defaultdict(Counter)
+        campaign_deltas = defaultdict(Counter)
+        for row in rows:
+            self._add_transition(deltas, self.key_for_row(row), row['status'], new_status)
+            if row['campaign_id']:
+                self._add_campaign_transition(campaign_deltas[row['campaign_id']], row['status'], new_status)
+        self.apply(deltas)
+        self.apply_campaign(campaign_deltas)
+
+    def record_engagement(self, rows: Iterable[Dict], counter: str, hits: Dict[int, int]):
+        """
+        Record buffered opens or clicks. `rows` are values() rows with 'id',
+        the message's previous count in `counter`_count, and KEY_FIELDS;
+        `hits` maps message id to the number of new hits.
+        """
+        message_field = 'open_count' if counter == 'opened' else 'click_count'
+        campaign_field = 'total_opens' if counter == 'opened' else 'total_clicks'
+
+        deltas = defaultdict(Counter)
+        campaign_deltas = defaultdict(Counter)
+        for row in rows:
+            # The rollup counts messages engaged with at least once
+            if row[message_field] == 0:
+                deltas[self.key_for_row(row)][counter] += 1
+            if row['campaign_id']:
+                campaign_deltas[row['campaign_id']][campaign_field] += hits.get(row['id'], 0)
+        self.apply(deltas)
+        self.apply_campaign(campaign_deltas)
+
+    @staticmethod
+    def _add_transition(deltas, key, old_status, new_status):
+        if old_status in STATUS_COUNTERS:
+            deltas[key][old_status] -= 1
+        if new_status in STATUS_COUNTERS:
+            deltas[key][new_status] += 1
+
+    @staticmethod
+    def _add_campaign_transition(counters, old_status, new_status):
+        if old_status in CAMPAIGN_STATUS_FIELDS:
+            counters[CAMPAIGN_STATUS_FIELDS[old_status]] -= 1
+        if new_status in CAMPAIGN_STATUS_FIELDS:
+            counters[CAMPAIGN_STATUS_FIELDS[new_status]] += 1
+
+    def apply_campaign(self, deltas: Dict[int, Counter]):
+        for campaign_id, counters in deltas.items():
+            counters = {field: delta for field, delta in counters.items() if delta}
+            if counters:
+                MessageCampaign.objects.filter(pk=campaign_id).update(
+                    **{field: F(field) + delta for field, delta in counters.items()}
+                )
+
+    @staticmethod
+    def _lock_days(days, shared: bool):
+        """
+        Lock rollup days until the transaction ends. Deltas take them shared
+        and reconcile() exclusively, so no delta lands between its count and
+        its rewrite of those days. Days are locked in order to avoid deadlocks.
+        """
+        if connection.vendor != 'postgresql':
+            return
+        function = 'pg_advisory_xact_lock_shared' if shared else 'pg_advisory_xact_lock'
+        with connection.cursor() as cursor:
+            for day in sorted(set(days)):
+                cursor.execute(f"SELECT {function}(%s, %s)", [STATS_LOCK_NAMESPACE, day.toordinal()])
+
+    def apply(self, deltas: Dict[Tuple, Counter]):
+        deltas = {key: counters for key, counters in deltas.items() if any(counters.values())}
+        if not deltas:
+            return
+        # Held until the caller's transaction ends, together with the message change
+        with transaction.atomic():
+            self._lock_days([day for day, _, _, _ in deltas], shared=True)
+            self._apply(deltas)
+
+    def _apply(self, deltas: Dict[Tuple, Counter]):
+        for (day, channel_id, branch_id, campaign_id), counters in deltas.items():
+            counters = {field: delta for field, delta in counters.items() if delta}
+            if not counters:
+                continue
+
+            lookup = {'date': day, 'channel_id': channel_id, 'branch_id': branch_id, 'campaign_id': campaign_id}
+            try:
+                with transaction.atomic():
+                    stats, _ = MessageDailyStats.objects.get_or_create(**lookup)
+            except IntegrityError:
+                # Another worker created the row first
+                stats = MessageDailyStats.objects.get(**lookup)
+
+            MessageDailyStats.objects.filter(pk=stats.pk).update(
+                **{field: F(field) + delta for field, delta in counters.items()}
+            )
+
+    # Reconciliation
+    def reconcile(self, days: int = 3) -> int:
+        """
+        Recompute the rollup for the last `days` days from Message. The count
+        and the rewrite run in one transaction holding those days' locks.
+        """
+        today = timezone.localdate()
+        start_date = today - timedelta(days=days)
+        start = timezone.make_aware(datetime.combine(start_date, time.min))
+
+        with transaction.atomic():
+            self._lock_days([start_date + timedelta(days=offset) for offset in range(days + 1)], shared=False)
+            stats = self._count_days(start)
+            MessageDailyStats.objects.filter(date__gte=start_date).delete()
+            MessageDailyStats.objects.bulk_create(stats, batch_size=1000)
+        bump_version('communications')
+
+        logger.info(f"Reconciled message stats since {start_date}: {len(stats)} rows")
+        return len(stats)
+
+    @staticmethod
+    def _count_days(start):
+        """Rollup rows for messages created since `start`, with one GROUP BY"""
+        rows = Message.objects.filter(created_at__gte=start).annotate(
+            day=TruncDate('created_at'),
+            stats_branch=Coalesce('to_branch', 'to_user__branch'),
+        ).order_by().values('day', 'channel_id', 'stats_branch', 'campaign_id').annotate(
+            total_count=Count('id'),
+            sent_count=Count('id', filter=Q(status='sent')),
+            delivered_count=Count('id', filter=Q(status='delivered')),
+            read_count=Count('id', filter=Q(status='read')),
+            failed_count=Count('id', filter=Q(status='failed')),
+            opened_count=Count('id', filter=Q(open_count__gt=0)),
+            clicked_count=Count('id', filter=Q(click_count__gt=0)),
+        )
+
+        return [
+            MessageDailyStats(
+                date=row['day'],
+                channel_id=row['channel_id'],
+                branch_id=row['stats_branch'],
+                campaign_id=row['campaign_id'],
+                total=row['total_count'],
+                sent=row['sent_count'],
+                delivered=row['delivered_count'],
+                read=row['read_count'],
+                failed=row['failed_count'],
+                opened=row['opened_count'],
+                clicked=row['clicked_count'],
+            )
+            for row in rows
+        ]
+
+    def repair_campaign_counters(self, campaign_ids: Iterable[int] = None, days: int = 30) -> int:
+        """
+        Recompute campaign counters from Message with one GROUP BY. Defaults
+        to campaigns created in the last `days` days; older campaigns may
+        have had messages archived and keep their final counters.
+        """
+        campaigns = MessageCampaign.objects.all()
+        if campaign_ids is not None:
+            campaigns = campaigns.filter(id__in=list(campaign_ids))
+        else:
+            campaigns = campaigns.filter(created_at__gte=timezone.now() - timedelta(days=days))
+
+        totals = {
+            row['campaign_id']: row
+            for row in Message.objects.filter(campaign__in=campaigns).order_by().values('campaign_id').annotate(
+                total=Count('id'),
+                queued=Count('id', filter=Q(status='queued')),
+                sent=Count('id', filter=Q(status='sent')),
+                delivered=Count('id', filter=Q(status='delivered')),
+                read=Count('id', filter=Q(status='read')),
+                failed=Count('id', filter=Q(status='failed')),
+                opens=Sum('open_count'),
+                clicks=Sum('click_count'),
+            )
+        }
+
+        updated = []
+        for campaign in campaigns.only('id'):
+            row = totals.get(campaign.id, {})
+            campaign.total_messages = row.get('total', 0)
+            campaign.queued_count = row.get('queued', 0)
+            campaign.sent_count = row.get('sent', 0)
+            campaign.delivered_count = row.get('delivered', 0)
+            campaign.read_count = row.get('read', 0)
+            campaign.failed_count = row.get('failed', 0)
+            campaign.total_opens = row.get('opens') or 0
+            campaign.total_clicks = row.get('clicks') or 0
+            updated.append(campaign)
+
+        MessageCampaign.objects.bulk_update(updated, [
+            'total_messages', 'queued_count', 'sent_count', 'delivered_count',
+            'read_count', 'failed_count', 'total_opens', 'total_clicks',
+        ], batch_size=500)
+
+        logger.info(f"Repaired counters for {len(updated)} campaigns")
+        return len(updated)
@@ -0,0 +1,306 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import Counter, defaultdict
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from channels_redis.core import RedisChannelLayer
+from django.conf import settings
+from django.db.models import Count
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+from ..models import Notification
+
+logger = logging.getLogger(__name__)
+
+UNREAD_KEY = 'communications:notifications:unread:{}'
+# Hash of recount token -> changes made while that recount was running
+RECOUNT_KEY = 'communications:notifications:unread:{}:recount'
+RECOUNT_TIMEOUT_SECONDS = 30
+
+# Adjust counters that are already cached. Missing ones are recounted on
+# read; while a recount runs, its changes go to the recount's entry instead.
+# KEYS are the counters followed by their recount hashes.
+ADJUST_EXISTING = """
+local count = #ARGV
+for i = 1, count do
+    local key = KEYS[i]
+    if redis.call('EXISTS', key) == 1 then
+        if redis.call('INCRBY', key, ARGV[i]) < 0 then
+            redis.call('SET', key, 0, 'KEEPTTL')
+        end
+    else
+        local recounts = KEYS[count + i]
+        for _, token in ipairs(redis.call('HKEYS', recounts)) do
+            redis.call('HINCRBY', recounts, token, ARGV[i])
+        end
+    end
+end
+"""
+
+# Cache recounted values plus the changes made while counting. A counter
+# cached meanwhile wins; a recount whose entry expired is not cached.
+# KEYS are the counters followed by their recount hashes; ARGV is the
+# token, the TTL, then the counts. Returns the resulting counts.
+STORE_RECOUNTED = """
+local count = #KEYS / 2
+local token, ttl = ARGV[1], ARGV[2]
+local counts = {}
+for i = 1, count do
+    local key, recounts = KEYS[i], KEYS[count + i]
+    local value = tonumber(ARGV[i + 2])
+    local delta = redis.call('HGET', recounts, token)
+    local cached = redis.call('GET', key)
+    if cached then
+        value = tonumber(cached)
+    elseif delta then
+        value = math.max(value + tonumber(delta), 0)
+        redis.call('SET', key, value, 'EX', ttl)
+    end
+    redis.call('HDEL', recounts, token)
+    counts[i] = value
+end
+return counts
+"""
+
+# Push a batch of group events into their channels' queues. KEYS are
+# channel keys (repeated for several events to one channel), ARGV holds each
+# key's serialized message, then each key's capacity, then the time and the
+# message expiry. Mirrors RedisChannelLayer.group_send for many groups at once.
+PUSH_TO_CHANNELS = """
+local count = #KEYS
+local now = tonumber(ARGV[2 * count + 1])
+local expiry = tonumber(ARGV[2 * count + 2])
+local over_capacity = 0
+for i = 1, count do
+    redis.call('ZREMRANGEBYSCORE', KEYS[i], 0, now - expiry)
+    if redis.call('ZCOUNT', KEYS[i], '-inf', '+inf') < tonumber(ARGV[count + i]) then
+        -- Consumers pop the lowest score first; keep the batch's order
+        redis.call('ZADD', KEYS[i], now + i / 1000000, ARGV[i])
+        redis.call('EXPIRE', KEYS[i], expiry)
+    else
+        over_capacity = over_capacity + 1
+    end
+end
+return over_capacity
+"""
+
+BULK_CREATE_BATCH_SIZE = 1000
+
+
+def notification_group(user_id: int) -> str:
+    return f"user_{user_id}"
+
+
+def serialize_notification(notification: Notification) -> Dict[str, Any]:
+    return {
+        'id': notification.id,
+        'title': notification.title,
+        'message': notification.message,
+        'type': notification.notification_type,
+        'data': notification.data,
+        'created_at': notification.created_at.isoformat(),
+        'is_read': notification.is_read,
+    }
+
+
+def group_send_many(sends: List[Tuple[str, Dict[str, Any]]], chunk_size: Optional[int] = None):
+    """
+    Send many group events in one event-loop hop. On the Redis channel
+    layer each chunk costs two round trips per Redis host: one pipeline
+    reading every group's channels, and one script pushing every message.
+    Other layers get one group_send per event, issued concurrently.
+    """
+    channel_layer = get_channel_layer()
+    if channel_layer is None or not sends:
+        return
+    chunk_size = chunk_size or settings.COMMUNICATION_SETTINGS.get('NOTIFICATION_SEND_CHUNK_SIZE', 500)
+
+    async def send_all():
+        for start in range(0, len(sends), chunk_size):
+            chunk = sends[start:start + chunk_size]
+            if isinstance(channel_layer, RedisChannelLayer):
+                await _push_chunk(channel_layer, chunk)
+                continue
+            results = await asyncio.gather(
+                *[channel_layer.group_send(group, event) for group, event in chunk],
+                return_exceptions=True
+            )
+            failures = [result for result in results if isinstance(result, Exception)]
+            if failures:
+                logger.warning(f"{len(failures)} real-time notifications failed: {failures[0]}")
+
+    async_to_sync(send_all)()
+
+
+async def _push_chunk(channel_layer: RedisChannelLayer, sends: List[Tuple[str, Dict[str, Any]]]):
+    now = time.time()
+
+    # Channels of every group, one pipeline per host holding group keys
+    groups_by_host = defaultdict(list)
+    for group in {group for group, _ in sends}:
+        groups_by_host[channel_layer.consistent_hash(group)].append(group)
+    group_channels = {}
+    for host, groups in groups_by_host.items():
+        pipe = channel_layer.connection(host).pipeline(transaction=False)
+        for group in groups:
+            group_key = channel_layer._group_key(group)
+            pipe.zremrangebyscore(group_key, min=0, max=int(now) - channel_layer.group_expiry)
+            pipe.zrange(group_key, 0, -1)
+        results = await pipe.execute()
+        for group, channels in zip(groups, results[1::2]):
+            group_channels[group] = [channel.decode('utf8') for channel in channels]
+
+    # Every message, one script call per host holding channel keys
+    keys, messages, capacities = defaultdict(list), defaultdict(list), defaultdict(list)
+    for group, event in sends:
+        if not group_channels[group]:
+            continue
+        keys_by_host, key_messages, key_capacities = channel_layer._map_channel_keys_to_connection(
+            group_channels[group], event
+        )
+        for host, channel_keys in keys_by_host.items():
+            keys[host].extend(channel_keys)
+            messages[host].extend(key_messages[key] for key in channel_keys)
+            capacities[host].extend(key_capacities[key] for key in channel_keys)
+
+    for host, channel_keys in keys.items():
+        over_capacity = await channel_layer.connection(host).eval(
+            PUSH_TO_CHANNELS, len(channel_keys),
+            *channel_keys, *messages[host], *capacities[host], now, channel_layer.expiry
+        )
+        if over_capacity:
+            logger.info(f"{over_capacity} of {len(channel_keys)} real-time notifications dropped: channels over capacity")
+
+
+class NotificationService:
+    """
+    In-app notifications with unread counts cached in Redis.
+
+    Each user's unread count lives in its own key with a TTL. It is
+    adjusted on create and mark-read only while cached, and recounted from
+    the database on the next read after it expires, so drift cannot
+    outlive the TTL. Changes made while a recount runs are added to it. Redis and channel-layer failures are logged and never
+    fail a write: reads fall back to counting in the database, and the
+    real-time push is best effort.
+    """
+
+    def __init__(self):
+        self.counter_ttl = settings.COMMUNICATION_SETTINGS.get('NOTIFICATION_UNREAD_TTL_SECONDS', 60 * 60 * 24)
+
+    # Unread counters
+    def unread_count(self, user_id: int) -> int:
+        return self.unread_counts([user_id])[user_id]
+
+    def unread_counts(self, user_ids: Iterable[int]) -> Dict[int, int]:
+        user_ids = list(user_ids)
+        try:
+            conn = get_redis_connection('default')
+            cached = conn.mget([UNREAD_KEY.format(user_id) for user_id in user_ids]) if user_ids else []
+        except Exception as e:
+            logger.error(f"Error reading unread counters: {str(e)}")
+            return self._count_unread(user_ids)
+        counts = {user_id: int(value) for user_id, value in zip(user_ids, cached) if value is not None}
+
+        missing = [user_id for user_id in user_ids if user_id not in counts]
+        if missing:
+            counts.update(self._recount(conn, missing))
+        return counts
+
+    def _recount(self, conn, user_ids: List[int]) -> Dict[int, int]:
+        """
+        Count in the database and cache the result. Changes made between the
+        count and the cache write are kept in a recount entry registered
+        before counting, and added to the count when it is cached.
+        """
+        token = uuid.uuid4().hex
+        keys = [UNREAD_KEY.format(user_id) for user_id in user_ids]
+        recount_keys = [RECOUNT_KEY.format(user_id) for user_id in user_ids]
+        try:
+            pipe = conn.pipeline(transaction=False)
+            for recount_key in recount_keys:
+                pipe.hset(recount_key, token, 0)
+                pipe.expire(recount_key, RECOUNT_TIMEOUT_SECONDS)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Error registering unread recount: {str(e)}")
+            return self._count_unread(user_ids)
+
+        counts = self._count_unread(user_ids)
+        try:
+            stored = conn.register_script(STORE_RECOUNTED)(
+                keys=keys + recount_keys,
+                args=[token, self.counter_ttl, *(counts[user_id] for user_id in user_ids)],
+            )
+        except Exception as e:
+            logger.error(f"Error caching unread counters: {str(e)}")
+            return counts
+        return {user_id: int(value) for user_id, value in zip(user_ids, stored)}
+
+    @staticmethod
+    def _count_unread(user_ids: List[int]) -> Dict[int, int]:
+        recounted = dict(
+            Notification.objects.filter(user_id__in=user_ids, is_read=False)
+            .order_by().values('user_id').annotate(unread=Count('id')).values_list('user_id', 'unread')
+        )
+        return {user_id: recounted.get(user_id, 0) for user_id in user_ids}
+
+    def adjust_unread(self, deltas: Dict[int, int]):
+        deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        try:
+            conn = get_redis_connection('default')
+            conn.register_script(ADJUST_EXISTING)(
+                keys=[UNREAD_KEY.format(user_id) for user_id in deltas] + [RECOUNT_KEY.format(user_id) for user_id in deltas],
+                args=list(deltas.values()),
+            )
+        except Exception as e:
+            # Cached counters are off until they expire and are recounted
+            logger.error(f"Error adjusting unread counters for {len(deltas)} users: {str(e)}")
+
+    # Notifications
+    def create(self, user_ids: Iterable[int], title: str, message: str,
+               notification_type: str = 'info', data: Optional[Dict[str, Any]] = None) -> List[Notification]:
+        """Store one notification per user and push them in a batch"""
+        notifications = Notification.objects.bulk_create([
+            Notification(user_id=user_id, title=title, message=message,
+                         notification_type=notification_type, data=data or {})
+            for user_id in user_ids
+        ], batch_size=BULK_CREATE_BATCH_SIZE)
+
+        self.adjust_unread(Counter(notification.user_id for notification in notifications))
+        try:
+            group_send_many([
+                (notification_group(notification.user_id), {
+                    'type': 'send_notification',
+                    'notification': serialize_notification(notification),
+                })
+                for notification in notifications
+            ])
+        except Exception as e:
+            # Non-critical: stored notifications are fetched on the next load
+            logger.warning(f"Real-time push failed for {len(notifications)} notifications: {str(e)}")
+        return notifications
+
+    def mark_read(self, notification_id: int, user_id: int) -> bool:
+        updated = Notification.objects.filter(
+            id=notification_id, user_id=user_id, is_read=False
+        ).update(is_read=True, read_at=timezone.now())
+        if updated:
+            self.adjust_unread({user_id: -1})
+        return bool(updated)
+
+    def mark_all_read(self, user_id: int) -> int:
+        updated = Notification.objects.filter(user_id=user_id, is_read=False).update(
+            is_read=True, read_at=timezone.now()
+        )
+        try:
+            get_redis_connection('default').set(UNREAD_KEY.format(user_id), 0, ex=self.counter_ttl)
+        except Exception as e:
+            logger.error(f"Error resetting unread counter for user {user_id}: {str(e)}")
+        return updated
@@ -4,6 +4,7 @@ from typing import Dict, List, Any
 import logging
 
 from ..models import UserCommunicationPreference, CommunicationChannel
+from .analytics_queries import AnalyticsQueries
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
@@ -141,7 +142,7 @@ class PreferenceService:
         """Get analytics on user opt-in rates"""
         try:
             total_users = User.objects.filter(is_active=True).count()
-            channels = CommunicationChannel.objects.filter(is_active=True)
+            channels = list(AnalyticsQueries.channel_opt_ins())
             
             analytics = {
                 'total_active_users': total_users,
@@ -151,11 +152,7 @@ class PreferenceService:
             
             total_opt_ins = 0
             for channel in channels:
-                opt_in_count = UserCommunicationPreference.objects.filter(
-                    channel=channel,
-                    is_enabled=True
-                ).count()
-                
+                opt_in_count = channel.opted_in
                 opt_in_rate = (opt_in_count / total_users * 100) if total_users > 0 else 0
                 
                 analytics['channel_opt_ins'][channel.channel_type] = {
@@ -167,8 +164,8 @@ class PreferenceService:
                 total_opt_ins += opt_in_count
             
             # Global metrics
-            if channels.count() > 0:
-                avg_opt_in_rate = total_opt_ins / (channels.count() * total_users) * 100 if total_users > 0 else 0
+            if channels:
+                avg_opt_in_rate = total_opt_ins / (len(channels) * total_users) * 100 if total_users > 0 else 0
                 analytics['global_metrics'] = {
                     'average_opt_in_rate': round(avg_opt_in_rate, 2),
                     'total_opt_ins_across_channels': total_opt_ins
@@ -0,0 +1,99 @@
+import time
+import asyncio
+import logging
+from typing import Dict, Any, Iterable, Optional
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+PRESENCE_KEY = 'communications:presence'
+
+
+class PresenceService:
+    """
+    Online presence kept in one Redis sorted set.
+
+    Each connected user's score is the time of their last heartbeat; a user
+    is online while that is younger than PRESENCE_TTL_SECONDS. Presence for
+    any number of users is read with a single ZMSCORE, so the UI never has
+    to ask each connection.
+    """
+
+    def __init__(self):
+        self.ttl = settings.COMMUNICATION_SETTINGS.get('PRESENCE_TTL_SECONDS', 60)
+
+    def heartbeat(self, user_id: int):
+        now = time.time()
+        conn = get_redis_connection('default')
+        pipe = conn.pipeline(transaction=False)
+        pipe.zadd(PRESENCE_KEY, {user_id: now})
+        # Entries well past the TTL are only kept around for last_seen
+        pipe.zremrangebyscore(PRESENCE_KEY, 0, now - self.ttl * 60)
+        pipe.execute()
+
+    def get_presence(self, user_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        user_ids = list(user_ids)
+        if not user_ids:
+            return {}
+        scores = get_redis_connection('default').zmscore(PRESENCE_KEY, user_ids)
+        cutoff = time.time() - self.ttl
+        return {
+            user_id: {
+                'online': score is not None and score >= cutoff,
+                'last_seen': score,
+            }
+            for user_id, score in zip(user_ids, scores)
+        }
+
+
+class TypingCoalescer:
+    """
+    Rate-limits one user's typing indicator in one conversation.
+
+    At most one event is sent per interval. Events arriving in between only
+    update the pending state, and a trailing send delivers the latest one,
+    so "stopped typing" is never lost. Repeated "not typing" events are
+    dropped entirely.
+    """
+
+    def __init__(self, send, interval: Optional[float] = None):
+        self._send = send
+        self.interval = interval or settings.COMMUNICATION_SETTINGS.get('CHAT_TYPING_INTERVAL_SECONDS', 2)
+        self._last_sent_at = None
+        self._last_sent_state = False
+        self._pending = None
+        self._task = None
+
+    async def update(self, is_typing: bool):
+        self._pending = bool(is_typing)
+        if self._task is not None and not self._task.done():
+            return
+
+        loop = asyncio.get_running_loop()
+        wait = 0 if self._last_sent_at is None else self._last_sent_at + self.interval - loop.time()
+        if wait <= 0:
+            await self._flush()
+        else:
+            self._task = loop.create_task(self._flush_later(wait))
+
+    async def _flush_later(self, wait: float):
+        await asyncio.sleep(wait)
+        await self._flush()
+
+    async def _flush(self):
+        state, self._pending = self._pending, None
+        if state is None or (not state and not self._last_sent_state):
+            return
+        self._last_sent_at = asyncio.get_running_loop().time()
+        self._last_sent_state = state
+        await self._send(state)
+
+    async def close(self):
+        """Cancel any trailing send and clear a visible indicator"""
+        if self._task is not None:
+            self._task.cancel()
+        if self._last_sent_state:
+            self._last_sent_state = False
+            await self._send(False)
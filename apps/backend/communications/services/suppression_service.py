@@ -0,0 +1,233 @@
+import hashlib
+import math
+import threading
+import time
+import logging
+from typing import Dict, Any, Iterable, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError
+
+from ..models import SuppressionEntry
+from .contact_point_service import normalize_address
+
+logger = logging.getLogger(__name__)
+
+# Which contact point a channel sends to; channels not listed are never suppressed
+CHANNEL_CONTACT_TYPES = {
+    'email': 'email',
+    'sms': 'phone',
+    'whatsapp': 'whatsapp',
+}
+
+SUPPRESSION_VERSION_KEY = 'communications:suppression:version'
+
+
+class BloomFilter:
+    """Compact probabilistic set: no false negatives, tunable false-positive rate"""
+
+    def __init__(self, size_bits: int, num_hashes: int):
+        self.size_bits = max(int(size_bits), 8)
+        self.num_hashes = max(int(num_hashes), 1)
+        self.bits = bytearray((self.size_bits + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, capacity: int, error_rate: float = 0.001) -> 'BloomFilter':
+        """Size a filter for an expected number of items and false-positive rate"""
+        capacity = max(capacity, 1)
+        size_bits = math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        num_hashes = round(size_bits / capacity * math.log(2))
+        return cls(size_bits, num_hashes)
+
+    def _positions(self, item: str):
+        # Double hashing: derive k positions from two independent 64-bit hashes
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big') | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.size_bits
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class SuppressionService:
+    """
+    Suppression list checks for outbound sends.
+
+    Every worker process keeps an in-memory Bloom filter of suppressed contact
+    points, rebuilt every SUPPRESSION_REFRESH_SECONDS or as soon as another
+    process records a new entry. Only Bloom-filter hits are confirmed against
+    the database, so clean recipients cost no queries at all.
+    """
+
+    _filter: Optional[BloomFilter] = None
+    _loaded_at = 0.0
+    _loaded_version = None
+    _lock = threading.Lock()
+
+    def __init__(self):
+        config = getattr(settings, 'COMMUNICATION_SETTINGS', {})
+        self.refresh_seconds = config.get('SUPPRESSION_REFRESH_SECONDS', 300)
+        self.error_rate = config.get('SUPPRESSION_BLOOM_ERROR_RATE', 0.001)
+
+    @staticmethod
+    def normalize(contact_type: str, value: str) -> str:
+        """Normalize an address so lookups match regardless of formatting"""
+        return normalize_address(contact_type, value)
+
+    @staticmethod
+    def _key(contact_type: str, value: str) -> str:
+        return f"{contact_type}:{value}"
+
+    @classmethod
+    def _current_version(cls):
+        try:
+            return cache.get(SUPPRESSION_VERSION_KEY)
+        except Exception:
+            return cls._loaded_version
+
+    def _get_filter(self) -> BloomFilter:
+        """Return the process-local filter, rebuilding it when stale"""
+        cls = type(self)
+        version = cls._current_version()
+        is_stale = (
+            cls._filter is None or
+            time.monotonic() - cls._loaded_at > self.refresh_seconds or
+            version != cls._loaded_version
+        )
+        if is_stale:
+            with cls._lock:
+                if cls._filter is None or cls._loaded_version != version or \
+                        time.monotonic() - cls._loaded_at > self.refresh_seconds:
+                    self._rebuild(version)
+        return cls._filter
+
+    def _rebuild(self, version):
+        cls = type(self)
+        entries = SuppressionEntry.objects.values_list('contact_type', 'value')
+        # Headroom so entries recorded between refreshes keep the error rate low
+        bloom = BloomFilter.for_capacity(int(entries.count() * 1.2) + 1000, self.error_rate)
+        for contact_type, value in entries.iterator(chunk_size=5000):
+            bloom.add(self._key(contact_type, value))
+
+        cls._filter = bloom
+        cls._loaded_at = time.monotonic()
+        cls._loaded_version = version
+        logger.info(f"Suppression Bloom filter rebuilt ({bloom.size_bits} bits, {bloom.num_hashes} hashes)")
+
+    def is_suppressed(self, contact_type: str, value: str) -> bool:
+        """Check a single contact point"""
+        value = self.normalize(contact_type, value)
+        if not value or self._key(contact_type, value) not in self._get_filter():
+            return False
+        return SuppressionEntry.objects.filter(contact_type=contact_type, value=value).exists()
+
+    def filter_recipients(self, users: Iterable, channel_type: str, address_getter=None) -> List:
+        """
+        Drop users whose address for this channel is suppressed.
+
+        Confirms all Bloom-filter hits of the batch with a single query.
+        `address_getter(user)` returns the raw address; defaults to the
+        user's email or phone number depending on the channel.
+        """
+        users = list(users)
+        contact_type = CHANNEL_CONTACT_TYPES.get(channel_type)
+        if not contact_type or not users:
+            return users
+
+        address_getter = address_getter or self._default_address_getter(contact_type)
+        bloom = self._get_filter()
+
+        addresses = {}
+        candidates = set()
+        for user in users:
+            address = self.normalize(contact_type, address_getter(user))
+            addresses[user.pk] = address
+            if address and self._key(contact_type, address) in bloom:
+                candidates.add(address)
+
+        if not candidates:
+            return users
+
+        suppressed = set(SuppressionEntry.objects.filter(
+            contact_type=contact_type,
+            value__in=candidates
+        ).values_list('value', flat=True))
+
+        if suppressed:
+            logger.info(f"Dropped {len(suppressed)} suppressed {contact_type} recipients at fan-out")
+
+        return [user for user in users if addresses[user.pk] not in suppressed]
+
+    @staticmethod
+    def _default_address_getter(contact_type: str):
+        if contact_type == 'email':
+            return lambda user: user.email
+        return lambda user: getattr(user, 'phone_number', '') or ''
+
+    def record(self, contact_type: str, value: str, reason: str, source: str = '', details: Dict[str, Any] = None):
+        """Add a contact point to the suppression list (idempotent)"""
+        value = self.normalize(contact_type, value)
+        if not value:
+            return None
+
+        try:
+            entry, created = SuppressionEntry.objects.get_or_create(
+                contact_type=contact_type,
+                value=value,
+                defaults={'reason': reason, 'source': source, 'details': details or {}}
+            )
+        except IntegrityError:
+            entry, created = SuppressionEntry.objects.get(contact_type=contact_type, value=value), False
+
+        if created:
+            cls = type(self)
+            if cls._filter is not None:
+                cls._filter.add(self._key(contact_type, value))
+            # Tell other workers to rebuild their filters
+            try:
+                cache.add(SUPPRESSION_VERSION_KEY, 0, None)
+                cache.incr(SUPPRESSION_VERSION_KEY)
+            except Exception as e:
+                logger.warning(f"Could not bump suppression version: {str(e)}")
+            logger.info(f"Suppressed {contact_type} {value} ({reason} via {source or 'unknown'})")
+
+        return entry
+
+    def record_provider_events(self, events: List[Dict[str, Any]], source: str = 'sendgrid') -> int:
+        """
+        Record bounce/unsubscribe events from a provider event webhook.
+        Accepts SendGrid-style event dicts ({'event': 'bounce', 'email': ...}).
+        """
+        event_reasons = {
+            'bounce': 'hard_bounce',
+            'dropped': 'invalid',
+            'spamreport': 'complaint',
+            'unsubscribe': 'unsubscribe',
+            'group_unsubscribe': 'unsubscribe',
+        }
+
+        recorded = 0
+        for event in events:
+            reason = event_reasons.get(event.get('event'))
+            # Soft bounces are transient and must not suppress the address
+            if not reason or (event.get('event') == 'bounce' and event.get('type') == 'blocked'):
+                continue
+
+            if event.get('email'):
+                contact_type, address = 'email', event['email']
+            elif event.get('phone'):
+                contact_type, address = event.get('contact_type', 'phone'), event['phone']
+            else:
+                continue
+
+            if self.record(contact_type, address, reason, source=source, details={'event': event.get('event')}):
+                recorded += 1
+
+        return recorded
@@ -0,0 +1,200 @@
+import re
+import time
+import logging
+from datetime import datetime, timezone as dt_timezone
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+from uuid import uuid4
+
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from django.db.models import Case, When, Value, F, IntegerField, DateTimeField, CharField
+from django.urls import reverse
+from django_redis import get_redis_connection
+
+from ..models import Message
+from .message_stats_service import MessageStatsService, KEY_FIELDS
+
+logger = logging.getLogger(__name__)
+
+OPEN_COUNTS_KEY = 'communications:tracking:opens'
+CLICK_COUNTS_KEY = 'communications:tracking:clicks'
+FIRST_OPEN_KEY = 'communications:tracking:first_open'
+
+TRACKING_SALT = 'communications.tracking'
+FLUSH_BATCH_SIZE = 500
+# Keys that failed to flush are kept this long so the next run can retry them
+FLUSHING_KEY_TTL = 60 * 60 * 24
+# Only one flush runs at a time; the lock outlives any realistic flush
+FLUSH_LOCK_KEY = 'communications:tracking:flush_lock'
+FLUSH_LOCK_TIMEOUT = 60 * 10
+
+LINK_PATTERN = re.compile(r'href=(["\'])(https?://[^"\']+)\1', re.IGNORECASE)
+
+
+class TrackingService:
+    """
+    Open and click tracking for outbound messages.
+
+    Tracking tokens are signed with the project secret, so the public
+    endpoints validate them without touching the database. Hits only
+    increment Redis hashes; flush_counters() periodically folds the
+    aggregated deltas into Message in a few bulk UPDATEs.
+    """
+
+    # Tokens
+    @staticmethod
+    def make_open_token(message_id: int) -> str:
+        return signing.Signer(salt=TRACKING_SALT).sign(str(message_id))
+
+    @staticmethod
+    def read_open_token(token: str) -> Optional[int]:
+        try:
+            return int(signing.Signer(salt=TRACKING_SALT).unsign(token))
+        except (signing.BadSignature, ValueError):
+            return None
+
+    @staticmethod
+    def make_click_token(message_id: int, url: str) -> str:
+        return signing.dumps([message_id, url], salt=TRACKING_SALT, compress=True)
+
+    @staticmethod
+    def read_click_token(token: str) -> Optional[Tuple[int, str]]:
+        try:
+            message_id, url = signing.loads(token, salt=TRACKING_SALT)
+        except (signing.BadSignature, ValueError, TypeError):
+            return None
+        # Only ever redirect to web links, even with a valid signature
+        if urlparse(url).scheme not in ('http', 'https'):
+            return None
+        return int(message_id), url
+
+    # Instrumentation
+    @staticmethod
+    def instrument_html(message_id: int, html: str) -> str:
+        """Rewrite links to the click redirect and append the open pixel"""
+        base_url = settings.COMMUNICATION_SETTINGS.get('TRACKING_BASE_URL', '').rstrip('/')
+        if not base_url or not html:
+            return html
+
+        def rewrite(match):
+            token = TrackingService.make_click_token(message_id, match.group(2))
+            url = base_url + reverse('communications:track-click', args=[token])
+            return f'href={match.group(1)}{url}{match.group(1)}'
+
+        html = LINK_PATTERN.sub(rewrite, html)
+        pixel_url = base_url + reverse('communications:track-open', args=[TrackingService.make_open_token(message_id)])
+        return f'{html}<img src="{pixel_url}" width="1" height="1" alt="" style="display:none" />'
+
+    # Buffered counters
+    @staticmethod
+    def record_open(message_id: int):
+        conn = get_redis_connection('default')
+        pipe = conn.pipeline(transaction=False)
+        pipe.hincrby(OPEN_COUNTS_KEY, message_id, 1)
+        pipe.hsetnx(FIRST_OPEN_KEY, message_id, int(time.time()))
+        pipe.execute()
+
+    @staticmethod
+    def record_click(message_id: int):
+        get_redis_connection('default').hincrby(CLICK_COUNTS_KEY, message_id, 1)
+
+    def flush_counters(self) -> Dict[str, int]:
+        """
+        Apply buffered open/click deltas to Message in bulk. Returns an empty
+        summary if another flush is still running: overlapping runs would
+        both apply the same snapshots and double-count.
+        """
+        conn = get_redis_connection('default')
+        lock = conn.lock(FLUSH_LOCK_KEY, timeout=FLUSH_LOCK_TIMEOUT)
+        if not lock.acquire(blocking=False):
+            logger.info("Tracking counter flush already running; skipping")
+            return {}
+
+        summary = {}
+        try:
+            for key, apply in (
+                (OPEN_COUNTS_KEY, lambda data: self._apply_deltas('open_count', data)),
+                (CLICK_COUNTS_KEY, lambda data: self._apply_deltas('click_count', data)),
+                (FIRST_OPEN_KEY, self._apply_first_opens),
+            ):
+                summary[key.rsplit(':', 1)[1]] = self._drain(conn, key, apply)
+        finally:
+            lock.release()
+
+        return summary
+
+    def _drain(self, conn, key: str, apply) -> int:
+        """
+        Atomically take the current hash out of the write path and apply it.
+        Left-over snapshots from a failed run are retried first. Each batch's
+        fields are removed from its snapshot once applied, so a retry only
+        applies what did not commit.
+        """
+        snapshots = [k.decode() if isinstance(k, bytes) else k for k in conn.scan_iter(f"{key}:flushing:*")]
+
+        flushing_key = f"{key}:flushing:{uuid4().hex}"
+        if conn.exists(key):
+            conn.rename(key, flushing_key)
+            conn.expire(flushing_key, FLUSHING_KEY_TTL)
+            snapshots.append(flushing_key)
+
+        applied = 0
+        for snapshot in snapshots:
+            data = {int(field): int(value) for field, value in conn.hgetall(snapshot).items()}
+            try:
+                for batch in self._batches(data):
+                    apply({message_id: data[message_id] for message_id in batch})
+                    conn.hdel(snapshot, *batch)
+                    applied += len(batch)
+                conn.delete(snapshot)
+            except Exception as e:
+                logger.error(f"Failed to flush tracking snapshot {snapshot}: {str(e)}")
+
+        return applied
+
+    @staticmethod
+    def _batches(data: Dict[int, int]):
+        ids = list(data)
+        for start in range(0, len(ids), FLUSH_BATCH_SIZE):
+            yield ids[start:start + FLUSH_BATCH_SIZE]
+
+    def _apply_deltas(self, field: str, deltas: Dict[int, int]):
+        stats_counter = 'opened' if field == 'open_count' else 'clicked'
+        for batch in self._batches(deltas):
+            delta = Case(
+                *[When(id=message_id, then=Value(deltas[message_id])) for message_id in batch],
+                default=Value(0),
+                output_field=IntegerField()
+            )
+            with transaction.atomic():
+                # Previous counts tell the rollup which messages were engaged with for the first time
+                rows = list(Message.objects.select_for_update(of=('self',)).filter(
+                    id__in=batch
+                ).values('id', field, *KEY_FIELDS))
+                Message.objects.filter(id__in=batch).update(**{field: F(field) + delta})
+                MessageStatsService().record_engagement(rows, stats_counter, deltas)
+
+    def _apply_first_opens(self, first_opens: Dict[int, int]):
+        """Set read_at from the first open, only for messages not read yet"""
+        for batch in self._batches(first_opens):
+            read_at = Case(
+                *[
+                    When(id=message_id, then=Value(datetime.fromtimestamp(first_opens[message_id], tz=dt_timezone.utc)))
+                    for message_id in batch
+                ],
+                output_field=DateTimeField()
+            )
+            with transaction.atomic():
+                unread = Message.objects.select_for_update(of=('self',)).filter(id__in=batch, read_at__isnull=True)
+                becoming_read = list(unread.filter(status__in=['sent', 'delivered']).values('status', *KEY_FIELDS))
+                unread.update(
+                    read_at=read_at,
+                    status=Case(
+                        When(status__in=['sent', 'delivered'], then=Value('read')),
+                        default=F('status'),
+                        output_field=CharField()
+                    )
+                )
+                MessageStatsService().record_row_transitions(becoming_read, 'read')
@@ -0,0 +1,33 @@
+import logging
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.contrib.auth import get_user_model
+from core.result_cache import bump_version
+from .models import CommunicationChannel, MessageTemplate, MessageCampaign, UserCommunicationPreference
+from .services.contact_point_service import ContactPointService
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+CONTACT_FIELDS = {'email', 'phone_number'}
+
+@receiver(post_save, sender=User)
+def sync_contact_points(sender, instance, created, update_fields=None, **kwargs):
+    """Keep the user's email and phone contact points in step with their record"""
+    # Saves such as last_login updates never touch contact details
+    if update_fields is not None and not CONTACT_FIELDS.intersection(update_fields):
+        return
+    
+    try:
+        ContactPointService.sync_user(instance)
+    except Exception as e:
+        logger.error(f"Error syncing contact points for user {instance.id}: {str(e)}")
+
+@receiver([post_save, post_delete], sender=CommunicationChannel)
+@receiver([post_save, post_delete], sender=MessageTemplate)
+@receiver([post_save, post_delete], sender=MessageCampaign)
+@receiver([post_save, post_delete], sender=UserCommunicationPreference)
+def invalidate_communication_analytics(sender, instance, **kwargs):
+    """Cached analytics and API responses list these; drop them on change"""
+    bump_version('communications')
@@ -1,11 +1,19 @@
 import logging
+from datetime import timedelta
 from celery import shared_task
 from django.utils import timezone
 from django.db import transaction
-from .models import Message, MessageCampaign
+from core.backpressure import BackpressureController
+from .models import Message, MessageBody, MessageCampaign, MessageTemplate
 from .services.delivery_service import DeliveryService
 from .services.audience_service import AudienceService
-from .services.template_service import TemplateService
+from .services.suppression_service import SuppressionService
+from .services.contact_point_service import ContactPointService
+from .services.tracking_service import TrackingService
+from .services.broadcast_service import BroadcastService
+from .services.archive_service import MessageArchiver
+from .services.message_stats_service import MessageStatsService
+from .services.digest_service import NotificationDigestService
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +33,7 @@ def send_single_message(self, message_id):
             result = delivery_service.send_message(message)
             
             # Update message status
+            previous_status = message.status
             message.status = result['status']
             if result['status'] == 'sent':
                 message.sent_at = timezone.now()
@@ -37,6 +46,7 @@ def send_single_message(self, message_id):
                     logger.error(f"Failed to send message {message_id} after retries")
             
             message.save()
+            MessageStatsService().record_transition(message, previous_status, message.status)
             
         return f"Message {message_id} processed with status: {result['status']}"
         
@@ -57,46 +67,76 @@ def process_campaign(campaign_id):
         campaign.status = 'processing'
         campaign.save()
         
-        # Get audience based on filters
-        audience = AudienceService.segment_users(campaign.audience_filter)
+        channel_type = campaign.template.channel.channel_type
         
-        # Create messages for each user
+        # Branch/group in-app announcements are stored once and fanned out on read
+        if BroadcastService.can_fan_out_on_read(channel_type, campaign.audience_filter, campaign.template):
+            message = BroadcastService.create_broadcast(
+                campaign.template, campaign.created_by, campaign.audience_filter, campaign=campaign
+            )
+            if campaign.schedule_type == 'immediate':
+                send_single_message.delay(message.id)
+            elif campaign.schedule_type == 'scheduled' and campaign.scheduled_for:
+                send_single_message.apply_async((message.id,), eta=campaign.scheduled_for)
+            
+            campaign.status = 'sent'
+            campaign.save()
+            return f"Campaign {campaign_id} processed: 1 broadcast message created"
+        
+        # Get audience based on filters; the message variables use each recipient's branch
+        audience = AudienceService.segment_users(campaign.audience_filter).select_related('branch')
+        
+        # Create messages chunk by chunk, pacing the fan-out to current load
+        controller = BackpressureController('process_campaign', channel_type=channel_type)
+        suppression_service = SuppressionService()
+        body = MessageBody.for_text(campaign.template.subject, campaign.template.content)
+        stats_service = MessageStatsService()
         messages_created = 0
-        for user in audience:
-            try:
-                # Render template for this user
-                context = {
-                    'name': user.get_full_name() or user.email.split('@')[0],
-                    'email': user.email,
-                    'branch': getattr(user.profile.branch, 'name', 'THOGMi') if hasattr(user, 'profile') else 'THOGMi'
-                }
-                
-                rendered = TemplateService.render_template(campaign.template, context)
-                
-                # Create message
-                message = Message.objects.create(
-                    campaign=campaign,
-                    template=campaign.template,
-                    channel=campaign.template.channel,
-                    from_user=campaign.created_by,
-                    to_user=user,
-                    subject=rendered['subject'],
-                    content=rendered['content'],
-                    variables_used=rendered['variables_used'],
-                    status='queued'
-                )
-                
-                # Schedule message for sending
+        for chunk, pace in controller.iter_queryset(audience):
+            # Resolve every address of the chunk in one query, then drop
+            # bounced/unsubscribed recipients before any Message row exists
+            addresses = ContactPointService.get_primary_addresses(chunk, channel_type)
+            recipients = suppression_service.filter_recipients(
+                chunk, channel_type, address_getter=lambda user: addresses.get(user.pk, '')
+            )
+            # Per-recipient variables only; the shared body is rendered on read
+            messages = []
+            for user in recipients:
+                try:
+                    context = {
+                        'name': user.get_full_name() or user.email.split('@')[0],
+                        'email': user.email,
+                        'branch': getattr(user.branch, 'name', 'THOGMi')
+                    }
+                    messages.append(Message(
+                        campaign=campaign,
+                        template=campaign.template,
+                        channel=campaign.template.channel,
+                        body=body,
+                        from_user=campaign.created_by,
+                        to_user=user,
+                        to_address=addresses.get(user.pk, ''),
+                        variables_used=context,
+                        status='queued'
+                    ))
+                except Exception as e:
+                    logger.error(f"Failed to create message for user {user.id} in campaign {campaign_id}: {str(e)}")
+            
+            messages = Message.objects.bulk_create(messages)
+            stats_service.record_created(messages, branch_ids={user.pk: user.branch_id for user in recipients})
+            
+            # Schedule messages for sending, staggered to the allowed concurrency
+            for index, message in enumerate(messages):
+                countdown = pace.countdown_for(index)
                 if campaign.schedule_type == 'immediate':
-                    send_single_message.delay(message.id)
+                    send_single_message.apply_async((message.id,), countdown=countdown)
                 elif campaign.schedule_type == 'scheduled' and campaign.scheduled_for:
-                    send_single_message.apply_async((message.id,), eta=campaign.scheduled_for)
-                
-                messages_created += 1
-                
-            except Exception as e:
-                logger.error(f"Failed to create message for user {user.id} in campaign {campaign_id}: {str(e)}")
-                continue
+                    send_single_message.apply_async(
+                        (message.id,),
+                        eta=campaign.scheduled_for + timedelta(seconds=countdown)
+                    )
+            
+            messages_created += len(messages)
         
         # Update campaign status
         campaign.status = 'sent'
@@ -139,25 +179,60 @@ def process_scheduled_messages():
         logger.error(f"Error processing scheduled messages: {str(e)}")
         raise
 
+@shared_task
+def flush_tracking_counters():
+    """Fold buffered open/click counters from Redis into Message rows"""
+    try:
+        summary = TrackingService().flush_counters()
+        logger.info(f"Flushed tracking counters: {summary}")
+        return summary
+    except Exception as e:
+        logger.error(f"Error flushing tracking counters: {str(e)}")
+        raise
+
+@shared_task
+def reconcile_message_stats(days=3):
+    """Recompute recent daily message stats from the messages table"""
+    try:
+        rows = MessageStatsService().reconcile(days)
+        return f"Reconciled {rows} daily stats rows"
+    except Exception as e:
+        logger.error(f"Error reconciling message stats: {str(e)}")
+        raise
+
+@shared_task
+def repair_campaign_counters(campaign_ids=None, days=30):
+    """Recompute campaign message counters from the messages table"""
+    try:
+        campaigns = MessageStatsService().repair_campaign_counters(campaign_ids, days)
+        return f"Repaired counters for {campaigns} campaigns"
+    except Exception as e:
+        logger.error(f"Error repairing campaign counters: {str(e)}")
+        raise
+
+@shared_task
+def flush_notification_digests():
+    """Send the notification digests whose windows have closed"""
+    try:
+        sent = NotificationDigestService().flush_due()
+        return f"Sent {sent} notification digests"
+    except Exception as e:
+        logger.error(f"Error flushing notification digests: {str(e)}")
+        raise
+
 @shared_task
 def cleanup_old_messages(days_old=365):
-    """Archive old messages for performance"""
-    from datetime import timedelta
+    """Archive expired messages to compressed files and remove them from the live table"""
     try:
         cutoff_date = timezone.now() - timedelta(days=days_old)
         
-        # Archive old messages (you might want to move to different storage)
-        old_messages = Message.objects.filter(
-            sent_at__lte=cutoff_date,
-            status__in=['sent', 'delivered', 'read', 'failed']
-        )
+        result = MessageArchiver().run(cutoff_date, write_files=True)
         
-        count = old_messages.count()
-        # Here you would implement your archiving logic
-        # For now, we'll just log
-        logger.info(f"Found {count} messages older than {days_old} days for archiving")
-        
-        return f"Found {count} messages for archiving"
+        return (
+            f"Archived {result['messages_archived']} messages and deleted "
+            f"{result['campaigns_deleted']} campaigns"
+            f"{'' if result['completed'] else ' (will continue next run)'}"
+        )
         
     except Exception as e:
         logger.error(f"Error cleaning up old messages: {str(e)}")
@@ -172,39 +247,48 @@ def send_bulk_announcement(template_id, audience_filters, sender_id):
     try:
         sender = User.objects.get(id=sender_id)
         template = MessageTemplate.objects.get(id=template_id)
+        channel_type = template.channel.channel_type
+        
+        if BroadcastService.can_fan_out_on_read(channel_type, audience_filters, template):
+            message = BroadcastService.create_broadcast(template, sender, audience_filters)
+            send_single_message.delay(message.id)
+            return f"Bulk announcement stored as broadcast message {message.id}"
         
         audience = AudienceService.segment_users(audience_filters)
         
+        controller = BackpressureController('send_bulk_announcement', channel_type=channel_type)
+        suppression_service = SuppressionService()
+        body = MessageBody.for_text(template.subject, template.content)
+        stats_service = MessageStatsService()
         sent_count = 0
-        for user in audience:
-            try:
-                # Create context for template rendering
-                context = {
-                    'name': user.get_full_name() or user.email.split('@')[0],
-                    'email': user.email,
-                }
-                
-                rendered = TemplateService.render_template(template, context)
-                
-                # Create and send message
-                message = Message.objects.create(
+        for chunk, pace in controller.iter_queryset(audience):
+            addresses = ContactPointService.get_primary_addresses(chunk, channel_type)
+            recipients = suppression_service.filter_recipients(
+                chunk, channel_type, address_getter=lambda user: addresses.get(user.pk, '')
+            )
+            messages = [
+                Message(
                     template=template,
                     channel=template.channel,
+                    body=body,
                     from_user=sender,
                     to_user=user,
-                    subject=rendered['subject'],
-                    content=rendered['content'],
-                    variables_used=rendered['variables_used'],
+                    to_address=addresses.get(user.pk, ''),
+                    variables_used={
+                        'name': user.get_full_name() or user.email.split('@')[0],
+                        'email': user.email,
+                    },
                     status='queued',
                     message_type='announcement'
                 )
-                
-                send_single_message.delay(message.id)
-                sent_count += 1
-                
-            except Exception as e:
-                logger.error(f"Failed to send announcement to user {user.id}: {str(e)}")
-                continue
+                for user in recipients
+            ]
+            messages = Message.objects.bulk_create(messages)
+            stats_service.record_created(messages, branch_ids={user.pk: user.branch_id for user in recipients})
+            
+            for index, message in enumerate(messages):
+                send_single_message.apply_async((message.id,), countdown=pace.countdown_for(index))
+            sent_count += len(messages)
         
         return f"Bulk announcement sent to {sent_count} users"
         
@@ -1,9 +1,14 @@
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.contrib.auth import get_user_model
+from django.test import override_settings
 from django.urls import reverse
+from rest_framework.test import APIRequestFactory
+
+from core.throttling import GCRARateThrottle, parse_rate
 
 from communications.models import CommunicationChannel, MessageTemplate
+from communications.api.views import MessageCampaignViewSet, CommunicationAPIView
 
 User = get_user_model()
 
@@ -70,3 +75,56 @@ class CommunicationAPITests(APITestCase):
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertFalse(response.data['preferences']['email']['is_enabled'])
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'response-cache-tests'}})
+class ResponseCacheTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='cache@thogmi.org', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.channel = CommunicationChannel.objects.create(name='Email', channel_type='email')
+        MessageTemplate.objects.create(
+            name='Welcome', template_type='welcome', content='Hello',
+            channel=self.channel, created_by=self.user
+        )
+        self.url = reverse('template-list')
+    
+    def test_unchanged_list_revalidates_with_304(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first['X-Cache'], 'MISS')
+        
+        second = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        
+        self.assertEqual(second.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(second['ETag'], first['ETag'])
+    
+    def test_writes_invalidate_cached_list(self):
+        first = self.client.get(self.url)
+        MessageTemplate.objects.create(
+            name='Follow up', template_type='welcome', content='Hi again',
+            channel=self.channel, created_by=self.user
+        )
+        
+        second = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(second.data['results']), 2)
+        self.assertNotEqual(second['ETag'], first['ETag'])
+
+
+class RateLimitPolicyTests(APITestCase):
+    def test_rates_parse_to_limit_and_period(self):
+        self.assertEqual(parse_rate('100/hour'), (100, 3600))
+        self.assertEqual(parse_rate('5/day'), (5, 86400))
+    
+    def test_policies_are_resolved_per_action(self):
+        throttle = GCRARateThrottle()
+        
+        self.assertEqual(throttle.get_scope(MessageCampaignViewSet(action='send')), 'bulk-send')
+        self.assertEqual(throttle.get_scope(MessageCampaignViewSet(action='create')), 'create-campaign')
+        self.assertIsNone(throttle.get_scope(MessageCampaignViewSet(action='list')))
+        self.assertEqual(throttle.get_scope(CommunicationAPIView()), 'send-message')
+    
+    def test_unlimited_actions_skip_redis(self):
+        request = APIRequestFactory().get('/')
+        self.assertTrue(GCRARateThrottle().allow_request(request, MessageCampaignViewSet(action='list')))
@@ -1,12 +1,56 @@
-from django.test import TestCase
+import os
+import gzip
+import asyncio
+import json
+import tempfile
+from io import StringIO
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
 from django.utils import timezone
+from django_redis import get_redis_connection
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
 
-from communications.models import CommunicationChannel, MessageTemplate, UserCommunicationPreference
+from communications.models import (
+    CommunicationChannel, MessageTemplate, UserCommunicationPreference, SuppressionEntry,
+    Message, MessageBody, MessageDailyStats, MessageCampaign,
+    Conversation, ConversationMessage, ConversationParticipant, MessageReadReceipt, Notification,
+    NotificationDigestEntry
+)
 from communications.services.template_service import TemplateService
 from communications.services.audience_service import AudienceService
 from communications.services.preference_service import PreferenceService
 from communications.services.enhanced_delivery_service import EnhancedDeliveryService
+from communications.services.suppression_service import BloomFilter, SuppressionService
+from communications.services.contact_point_service import ContactPointService, normalize_phone
+from communications.services.tracking_service import (
+    TrackingService, OPEN_COUNTS_KEY, CLICK_COUNTS_KEY, FIRST_OPEN_KEY, FLUSH_LOCK_KEY
+)
+from communications.services.broadcast_service import BroadcastService
+from communications.services.group_membership import group_model, user_group_ids
+from communications.services.archive_service import MessageArchiver
+from communications.services.export_service import MessageExporter, MESSAGE_COLUMNS
+from communications.services.message_stats_service import MessageStatsService
+from communications.services.analytics_service import AnalyticsService
+from communications.services.chat_buffer import ChatWriteBuffer
+from communications.services.conversation_read_service import ConversationReadService
+from communications.services.conversation_history_service import ConversationHistoryService, sender_display_name
+from communications.services.presence_service import TypingCoalescer
+from communications.services.notification_service import (
+    NotificationService, serialize_notification, group_send_many, notification_group, UNREAD_KEY
+)
+from communications.services.digest_service import NotificationDigestService, DIGEST_MAX_LINES
+from communications.tasks import process_campaign
+from core.backpressure import BackpressureController
+from core.result_cache import bump_version, get_or_compute, make_key
+from django.core.cache import cache
 
 User = get_user_model()
 
@@ -124,3 +168,840 @@ class AudienceServiceTests(TestCase):
         users = service.segment_by_behavior({'attendance_frequency': 'regular'})
         # This would depend on your user profile structure
         self.assertIsNotNone(users)
+
+class SuppressionServiceTests(TestCase):
+    def setUp(self):
+        self.active = User.objects.create_user(email='active@thogmi.org', password='testpass123')
+        self.bounced = User.objects.create_user(email='Bounced@thogmi.org', password='testpass123')
+        SuppressionService._filter = None
+    
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter.for_capacity(1000, 0.01)
+        items = [f"email:user{i}@thogmi.org" for i in range(1000)]
+        for item in items:
+            bloom.add(item)
+        
+        self.assertTrue(all(item in bloom for item in items))
+    
+    def test_filter_recipients_drops_suppressed_addresses(self):
+        service = SuppressionService()
+        service.record('email', 'bounced@thogmi.org', 'hard_bounce', source='sendgrid')
+        
+        recipients = service.filter_recipients([self.active, self.bounced], 'email')
+        
+        self.assertEqual(recipients, [self.active])
+        self.assertTrue(service.is_suppressed('email', ' BOUNCED@thogmi.org'))
+    
+    def test_soft_bounces_are_not_suppressed(self):
+        service = SuppressionService()
+        recorded = service.record_provider_events([
+            {'event': 'bounce', 'type': 'blocked', 'email': 'active@thogmi.org'},
+            {'event': 'spamreport', 'email': 'bounced@thogmi.org'},
+        ])
+        
+        self.assertEqual(recorded, 1)
+        self.assertFalse(SuppressionEntry.objects.filter(value='active@thogmi.org').exists())
+
+class ContactPointServiceTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='Member@thogmi.org',
+            password='testpass123',
+            phone_number='+233 24 123 4567'
+        )
+    
+    def test_normalize_phone_to_e164(self):
+        self.assertEqual(normalize_phone('+233 (24) 123-4567'), '+233241234567')
+        self.assertEqual(normalize_phone('00233241234567'), '+233241234567')
+        self.assertEqual(normalize_phone('0241234567', '233'), '+233241234567')
+        self.assertEqual(normalize_phone('12345'), '')
+    
+    def test_normalize_phone_follows_country_code_setting(self):
+        self.assertEqual(normalize_phone('0241234567', '233'), '+233241234567')
+        for country_code, expected in [('233', '+233241234567'), ('234', '+234241234567')]:
+            config = {**settings.COMMUNICATION_SETTINGS, 'DEFAULT_COUNTRY_CODE': country_code}
+            with override_settings(COMMUNICATION_SETTINGS=config):
+                self.assertEqual(normalize_phone('0241234567'), expected)
+    
+    def test_user_save_creates_contact_points(self):
+        addresses = ContactPointService.get_primary_addresses([self.user], 'sms')
+        
+        self.assertEqual(addresses[self.user.id], '+233241234567')
+        self.assertEqual(self.user.contact_points.filter(contact_type='email').get().value, 'member@thogmi.org')
+    
+    def test_get_addresses_uses_single_query(self):
+        other = User.objects.create_user(email='other@thogmi.org', password='testpass123')
+        
+        with self.assertNumQueries(1):
+            addresses = ContactPointService.get_primary_addresses([self.user, other], 'email')
+        
+        self.assertEqual(addresses[other.id], 'other@thogmi.org')
+
+class TrackingServiceTests(TestCase):
+    def setUp(self):
+        self.redis = get_redis_connection('default')
+        self.redis.delete(OPEN_COUNTS_KEY, CLICK_COUNTS_KEY, FIRST_OPEN_KEY, FLUSH_LOCK_KEY)
+    
+    def _sent_message(self):
+        user = User.objects.create_user(email='reader@thogmi.org', password='testpass123')
+        channel = CommunicationChannel.objects.create(name='Email', channel_type='email', is_active=True)
+        template = MessageTemplate.objects.create(
+            name='Newsletter', template_type='event', subject='News', content='This week',
+            channel=channel, created_by=user
+        )
+        return Message.objects.create(
+            template=template, channel=channel, from_user=user, to_user=user, content='This week', status='sent'
+        )
+    
+    def test_flush_applies_counts_and_first_open_once(self):
+        message = self._sent_message()
+        TrackingService.record_open(message.id)
+        TrackingService.record_open(message.id)
+        TrackingService.record_click(message.id)
+        
+        TrackingService().flush_counters()
+        TrackingService().flush_counters()
+        
+        message.refresh_from_db()
+        self.assertEqual((message.open_count, message.click_count), (2, 1))
+        self.assertIsNotNone(message.read_at)
+        self.assertEqual(message.status, 'read')
+    
+    def test_overlapping_flush_is_skipped(self):
+        message = self._sent_message()
+        TrackingService.record_open(message.id)
+        
+        lock = self.redis.lock(FLUSH_LOCK_KEY, timeout=60)
+        lock.acquire()
+        try:
+            self.assertEqual(TrackingService().flush_counters(), {})
+        finally:
+            lock.release()
+        message.refresh_from_db()
+        self.assertEqual(message.open_count, 0)
+        
+        TrackingService().flush_counters()
+        message.refresh_from_db()
+        self.assertEqual(message.open_count, 1)
+    
+    def test_tokens_round_trip_without_database(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(TrackingService.read_open_token(TrackingService.make_open_token(42)), 42)
+            click_token = TrackingService.make_click_token(42, 'https://thogmi.org/events')
+            self.assertEqual(TrackingService.read_click_token(click_token), (42, 'https://thogmi.org/events'))
+    
+    def test_tampered_tokens_are_rejected(self):
+        token = TrackingService.make_open_token(42)
+        
+        self.assertIsNone(TrackingService.read_open_token(token.replace('42', '43', 1)))
+        self.assertIsNone(TrackingService.read_click_token('not-a-token'))
+        self.assertIsNone(TrackingService.read_click_token(
+            TrackingService.make_click_token(42, 'javascript:alert(1)')
+        ))
+
+class MessageBodyTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='sender@thogmi.org', password='testpass123')
+        self.channel = CommunicationChannel.objects.create(name='Test Email', channel_type='email')
+        self.template = MessageTemplate.objects.create(
+            name='Announcement',
+            template_type='announcement',
+            subject='Hello {{ name }}',
+            content='Dear {{ name }}, service starts at 9am.',
+            channel=self.channel,
+            created_by=self.user
+        )
+    
+    def test_body_is_stored_once_per_unique_text(self):
+        first = MessageBody.for_text(self.template.subject, self.template.content)
+        second = MessageBody.for_text(self.template.subject, self.template.content)
+        
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(MessageBody.objects.count(), 1)
+    
+    def test_rehydrated_text_matches_template_rendering(self):
+        context = {'name': 'John'}
+        message = Message.objects.create(
+            template=self.template,
+            channel=self.channel,
+            body=MessageBody.for_text(self.template.subject, self.template.content),
+            from_user=self.user,
+            to_user=self.user,
+            variables_used=context
+        )
+        expected = TemplateService.render_template(self.template, context)
+        
+        message = Message.objects.select_related('body').get(pk=message.pk)
+        self.assertEqual(message.content, '')
+        self.assertEqual(message.rendered_subject, expected['subject'])
+        self.assertEqual(message.rendered_content, expected['content'])
+
+class BroadcastServiceTests(TestCase):
+    def setUp(self):
+        self.sender = User.objects.create_user(email='pastor@thogmi.org', password='testpass123')
+        self.member = User.objects.create_user(email='member@thogmi.org', password='testpass123')
+        self.outsider = User.objects.create_user(email='outsider@thogmi.org', password='testpass123')
+        # The church group that to_group points to, not an auth.Group role
+        self.choir = group_model().objects.create(name='Choir')
+        self.choir.members.add(self.member)
+        
+        channel = CommunicationChannel.objects.create(name='In-App', channel_type='in_app')
+        self.template = MessageTemplate.objects.create(
+            name='Rehearsal',
+            template_type='announcement',
+            subject='Rehearsal moved',
+            content='Rehearsal is at 6pm on Friday.',
+            channel=channel,
+            created_by=self.sender
+        )
+    
+    def test_only_branch_and_group_audiences_fan_out_on_read(self):
+        self.assertTrue(BroadcastService.can_fan_out_on_read('in_app', {'group_id': 1}, self.template))
+        self.assertFalse(BroadcastService.can_fan_out_on_read('email', {'group_id': 1}, self.template))
+        self.assertFalse(BroadcastService.can_fan_out_on_read('in_app', {'group_id': 1, 'roles': ['Ushers']}, self.template))
+        self.assertFalse(BroadcastService.can_fan_out_on_read('in_app', {}, self.template))
+    
+    def test_shared_templates_fan_out_and_render_for_every_reader(self):
+        self.template.content = 'Rehearsal is at 6pm on Friday{% if event.name %} for {{ event.name }}{% endif %}.'
+        self.assertTrue(BroadcastService.can_fan_out_on_read('in_app', {'group_id': self.choir.id}, self.template))
+        
+        message = BroadcastService.create_broadcast(self.template, self.sender, {'group_id': self.choir.id})
+        self.assertEqual(message.rendered_content, 'Rehearsal is at 6pm on Friday.')
+    
+    def test_personalized_templates_are_sent_per_recipient(self):
+        for content in ['Hi {{ name }}, rehearsal is at 6pm.', '{% if email %}Reply to confirm.{% endif %}']:
+            self.template.content = content
+            self.assertFalse(BroadcastService.can_fan_out_on_read('in_app', {'group_id': self.choir.id}, self.template))
+        
+        self.template.content = 'Rehearsal is at 6pm.'
+        self.template.subject = 'For {{ name|upper }}'
+        self.assertFalse(BroadcastService.can_fan_out_on_read('in_app', {'group_id': self.choir.id}, self.template))
+    
+    def test_broadcast_is_one_row_merged_into_member_inbox(self):
+        message = BroadcastService.create_broadcast(self.template, self.sender, {'group_id': self.choir.id})
+        
+        self.assertEqual(Message.objects.count(), 1)
+        self.assertIn(message, BroadcastService.inbox_queryset(self.member))
+        self.assertNotIn(message, BroadcastService.inbox_queryset(self.outsider))
+    
+    def test_auth_group_with_same_id_does_not_receive_broadcast(self):
+        """Roles (auth.Group) never match church group broadcasts, even when ids collide"""
+        role, _ = Group.objects.get_or_create(id=self.choir.id, defaults={'name': 'Ushers'})
+        self.outsider.groups.add(role)
+        
+        message = BroadcastService.create_broadcast(self.template, self.sender, {'group_id': self.choir.id})
+        
+        self.assertEqual(user_group_ids(self.outsider), [])
+        self.assertNotIn(message, BroadcastService.inbox_queryset(self.outsider))
+        self.assertEqual(user_group_ids(self.member), [self.choir.id])
+    
+    def test_group_audience_is_resolved_in_one_query(self):
+        with self.assertNumQueries(1):
+            users = list(AudienceService.segment_users({'group_id': self.choir.id}))
+        self.assertEqual(users, [self.member])
+    
+    def test_misconfigured_group_lookup_fails_loudly(self):
+        for lookup in ['', 'name', 'no_such_relation']:
+            config = {**settings.COMMUNICATION_SETTINGS, 'GROUP_MEMBERS_LOOKUP': lookup}
+            with self.subTest(lookup=lookup), override_settings(COMMUNICATION_SETTINGS=config):
+                with self.assertRaises(ImproperlyConfigured):
+                    user_group_ids(self.member)
+    
+    def test_read_state_is_kept_per_user(self):
+        message = BroadcastService.create_broadcast(self.template, self.sender, {'group_id': self.choir.id})
+        
+        self.assertTrue(BroadcastService.mark_read(message, self.member))
+        self.assertFalse(BroadcastService.mark_read(message, self.member))
+        
+        inbox_message = BroadcastService.inbox_queryset(self.member).get(pk=message.pk)
+        self.assertIsNotNone(inbox_message.user_read_at)
+        message.refresh_from_db()
+        self.assertIsNone(message.read_at)
+
+class MessageArchiverTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='sender@thogmi.org', password='testpass123')
+        channel = CommunicationChannel.objects.create(name='Test Email', channel_type='email')
+        template = MessageTemplate.objects.create(
+            name='Newsletter', template_type='event', subject='News', content='Weekly news',
+            channel=channel, created_by=self.user
+        )
+        for status in ['sent', 'delivered', 'queued']:
+            Message.objects.create(
+                template=template, channel=channel, from_user=self.user, to_user=self.user,
+                subject='News', content='Weekly news', status=status
+            )
+        Message.objects.update(created_at=timezone.now() - timedelta(days=400))
+        self.archive_dir = tempfile.mkdtemp()
+    
+    def test_expired_messages_are_archived_then_deleted(self):
+        result = MessageArchiver(archive_dir=self.archive_dir).run(timezone.now() - timedelta(days=365))
+        
+        self.assertTrue(result['completed'])
+        self.assertEqual(result['messages_archived'], 2)
+        # Queued messages are still in flight and must stay
+        self.assertEqual(list(Message.objects.values_list('status', flat=True)), ['queued'])
+        
+        with gzip.open(result['files'][0], 'rt', encoding='utf-8') as archive_file:
+            records = [json.loads(line) for line in archive_file]
+        self.assertEqual({record['status'] for record in records}, {'sent', 'delivered'})
+        self.assertEqual(records[0]['content'], 'Weekly news')
+    
+    def test_chunk_retried_after_failed_delete_is_not_archived_twice(self):
+        cutoff = timezone.now() - timedelta(days=365)
+        archiver = MessageArchiver(archive_dir=self.archive_dir)
+        sent = archiver.expired_messages(cutoff).order_by('pk').first()
+        # The first attempt wrote one message, then died before its delete committed
+        archiver._write_chunk([sent])
+        
+        result = archiver.run(cutoff)
+        
+        records = []
+        for path in result['files']:
+            with gzip.open(path, 'rt', encoding='utf-8') as archive_file:
+                records.extend(json.loads(line) for line in archive_file)
+        self.assertEqual(sorted(record['id'] for record in records), sorted({record['id'] for record in records}))
+        self.assertEqual(len(records), 2)
+        month_dir = os.path.dirname(result['files'][0])
+        self.assertEqual(os.listdir(month_dir), [os.path.basename(path) for path in result['files']])
+
+class MessageExporterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='sender@thogmi.org', password='testpass123')
+        self.channel = CommunicationChannel.objects.create(name='Test Email', channel_type='email')
+        self.template = MessageTemplate.objects.create(
+            name='Newsletter', template_type='event', subject='News', content='Weekly news',
+            channel=self.channel, created_by=self.user
+        )
+        self.export_dir = tempfile.mkdtemp()
+    
+    def _create_message(self):
+        return Message.objects.create(
+            template=self.template, channel=self.channel, from_user=self.user, to_user=self.user,
+            subject='News', content='Weekly news', status='sent'
+        )
+    
+    def _export(self, exporter, watermark):
+        path = os.path.join(self.export_dir, 'messages.jsonl.gz')
+        rows = exporter.message_rows(exporter.message_queryset(after_id=exporter.read_watermark(watermark)))
+        result = exporter.write(rows, MESSAGE_COLUMNS, 'jsonl', path=path)
+        if result['last_id'] is not None:
+            exporter.write_watermark(watermark, result['last_id'])
+        with gzip.open(path, 'rt', encoding='utf-8') as export_file:
+            return [json.loads(line) for line in export_file]
+    
+    def test_incremental_export_from_watermark(self):
+        exporter = MessageExporter(chunk_size=1)
+        watermark = os.path.join(self.export_dir, 'watermark.json')
+        first = self._create_message()
+        
+        self.assertEqual([row['id'] for row in self._export(exporter, watermark)], [first.id])
+        
+        second = self._create_message()
+        rows = self._export(exporter, watermark)
+        
+        self.assertEqual([row['id'] for row in rows], [second.id])
+        self.assertEqual(rows[0]['to_user'], 'sender@thogmi.org')
+        self.assertEqual(rows[0]['channel'], 'email')
+    
+    @override_settings(RESULT_CACHE={'ENABLED': False})
+    def test_stdout_export_keeps_campaigns_and_analytics_as_typed_records(self):
+        message = self._create_message()
+        MessageCampaign.objects.create(name='Easter', template=self.template, created_by=self.user)
+        output = StringIO()
+        
+        call_command('export_communication_data', format='jsonl', include_analytics=True, stdout=output, stderr=StringIO())
+        
+        records = [json.loads(line) for line in output.getvalue().splitlines() if line]
+        self.assertEqual([record['record_type'] for record in records], ['message', 'campaign', 'analytics'])
+        self.assertEqual(records[0]['id'], message.id)
+        
+        with self.assertRaises(CommandError):
+            call_command('export_communication_data', format='csv', stdout=StringIO(), stderr=StringIO())
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'backpressure-tests'}},
+    BACKPRESSURE={'MIN_CHUNK_SIZE': 2, 'MAX_CHUNK_SIZE': 2, 'MIN_CONCURRENCY': 1, 'MAX_CONCURRENCY': 1}
+)
+class BackpressureDispatchTests(TestCase):
+    def test_countdowns_continue_across_chunks(self):
+        """Later chunks are scheduled after earlier ones, not from zero again"""
+        controller = BackpressureController('test_fan_out')
+        
+        countdowns = [
+            pace.countdown_for(index)
+            for chunk, pace in controller.iter_sequence(range(4))
+            for index in range(len(chunk))
+        ]
+        
+        self.assertEqual(countdowns, [0, 1, 2, 3])
+
+@override_settings(RESULT_CACHE={'ENABLED': False})
+class MessageStatsServiceTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='sender@thogmi.org', password='testpass123')
+        self.channel = CommunicationChannel.objects.create(name='Test SMS', channel_type='sms', is_active=True)
+        self.template = MessageTemplate.objects.create(
+            name='Reminder', template_type='reminder', subject='', content='See you Sunday',
+            channel=self.channel, created_by=self.user
+        )
+        self.service = MessageStatsService()
+    
+    def _create_messages(self, count):
+        messages = Message.objects.bulk_create([
+            Message(template=self.template, channel=self.channel, from_user=self.user,
+                    to_user=self.user, content='See you Sunday')
+            for _ in range(count)
+        ])
+        self.service.record_created(messages)
+        return messages
+    
+    def test_incremental_updates_match_reconciliation(self):
+        messages = self._create_messages(3)
+        for message in messages[:2]:
+            Message.objects.filter(pk=message.pk).update(status='sent')
+            self.service.record_transition(message, 'queued', 'sent')
+        Message.objects.filter(pk=messages[2].pk).update(status='failed')
+        self.service.record_transition(messages[2], 'queued', 'failed')
+        
+        incremental = MessageDailyStats.objects.values('total', 'sent', 'failed').get()
+        self.service.reconcile(days=1)
+        reconciled = MessageDailyStats.objects.values('total', 'sent', 'failed').get()
+        
+        self.assertEqual(incremental, {'total': 3, 'sent': 2, 'failed': 1})
+        self.assertEqual(incremental, reconciled)
+    
+    def test_engagement_trends_read_rollup_in_one_query(self):
+        self._create_messages(2)
+        
+        with self.assertNumQueries(1):
+            trends = AnalyticsService().get_engagement_trends(days=90)
+        
+        self.assertEqual(len(trends['daily_metrics']), 91)
+        self.assertEqual(trends['daily_metrics'][-1]['total_messages'], 2)
+
+
+class CampaignCounterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='sender@thogmi.org', password='testpass123')
+        self.channel = CommunicationChannel.objects.create(name='Test SMS', channel_type='sms', is_active=True)
+        self.template = MessageTemplate.objects.create(
+            name='Reminder', template_type='reminder', subject='', content='See you Sunday',
+            channel=self.channel, created_by=self.user
+        )
+        self.campaign = MessageCampaign.objects.create(
+            name='Sunday reminder', template=self.template, created_by=self.user
+        )
+        self.service = MessageStatsService()
+    
+    def test_counters_follow_status_changes_and_match_repair(self):
+        messages = Message.objects.bulk_create([
+            Message(campaign=self.campaign, template=self.template, channel=self.channel,
+                    from_user=self.user, to_user=self.user, content='See you Sunday')
+            for _ in range(3)
+        ])
+        self.service.record_created(messages)
+        Message.objects.filter(pk=messages[0].pk).update(status='delivered')
+        self.service.record_transition(messages[0], 'queued', 'delivered')
+        
+        fields = ['total_messages', 'queued_count', 'delivered_count', 'total_opens']
+        self.campaign.refresh_from_db()
+        incremental = {field: getattr(self.campaign, field) for field in fields}
+        self.assertEqual(incremental, {'total_messages': 3, 'queued_count': 2, 'delivered_count': 1, 'total_opens': 0})
+        
+        MessageCampaign.objects.filter(pk=self.campaign.pk).update(total_messages=0, queued_count=0)
+        self.service.repair_campaign_counters([self.campaign.pk])
+        self.campaign.refresh_from_db()
+        self.assertEqual({field: getattr(self.campaign, field) for field in fields}, incremental)
+    
+    def test_campaign_performance_reads_campaign_row_only(self):
+        with self.assertNumQueries(1):
+            performance = AnalyticsService().get_campaign_performance(self.campaign.pk)
+        
+        self.assertEqual(performance['overview']['total_messages'], 0)
+
+
+class ProcessCampaignTests(TestCase):
+    def setUp(self):
+        self.sender = User.objects.create_user(email='sender@thogmi.org', password='testpass123')
+        self.recipient = User.objects.create_user(email='choir@thogmi.org', password='testpass123')
+        self.recipient.groups.add(Group.objects.create(name='Choir'))
+        channel = CommunicationChannel.objects.create(name='Test SMS', channel_type='sms', is_active=True)
+        template = MessageTemplate.objects.create(
+            name='Rehearsal', template_type='reminder', subject='', content='Rehearsal at {{ branch }}',
+            channel=channel, created_by=self.sender
+        )
+        self.campaign = MessageCampaign.objects.create(
+            name='Rehearsal', template=template, created_by=self.sender,
+            audience_filter={'roles': ['Choir']}, schedule_type='recurring'
+        )
+    
+    def test_segment_audience_gets_per_recipient_messages(self):
+        process_campaign(self.campaign.pk)
+        
+        messages = Message.objects.filter(campaign=self.campaign)
+        self.assertEqual([message.to_user_id for message in messages], [self.recipient.pk])
+        self.assertEqual(messages[0].variables_used['branch'], 'THOGMi')
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.status, 'sent')
+
+
+@override_settings(RESULT_CACHE={'ENABLED': False})
+class AnalyticsQueryCountTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='member@thogmi.org', password='testpass123')
+        for channel_type in ('email', 'sms', 'whatsapp', 'push'):
+            channel = CommunicationChannel.objects.create(
+                name=f'Test {channel_type}', channel_type=channel_type, is_active=True
+            )
+            UserCommunicationPreference.objects.create(user=self.user, channel=channel, is_enabled=channel_type != 'push')
+    
+    def test_channel_performance_is_one_query(self):
+        with self.assertNumQueries(1):
+            performance = AnalyticsService().get_channel_performance(days=30)
+        
+        self.assertEqual(len(performance['channels']), 4)
+    
+    def test_audience_insights_query_count_is_fixed(self):
+        with self.assertNumQueries(2):
+            insights = AnalyticsService().get_audience_insights()
+        
+        self.assertEqual(insights['audience_size'], 1)
+        self.assertEqual(insights['channel_preferences']['sms']['count'], 1)
+        self.assertEqual(insights['channel_preferences']['push']['count'], 0)
+    
+    def test_opt_in_analytics_query_count_is_fixed(self):
+        with self.assertNumQueries(2):
+            analytics = PreferenceService().get_opt_in_analytics()
+        
+        self.assertEqual(analytics['global_metrics']['total_opt_ins_across_channels'], 3)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'result-cache-tests'}})
+class ResultCacheTests(TestCase):
+    def setUp(self):
+        self.calls = 0
+    
+    def _compute(self):
+        self.calls += 1
+        return {'calls': self.calls}
+    
+    def test_repeated_reads_compute_once(self):
+        first = get_or_compute('tests', 1, 'report', [], self._compute)
+        second = get_or_compute('tests', 1, 'report', [], self._compute)
+        
+        self.assertEqual(first, second)
+        self.assertEqual(self.calls, 1)
+    
+    def test_branch_bump_invalidates_branch_and_all_branch_results(self):
+        get_or_compute('tests', 1, 'report', [], self._compute)
+        get_or_compute('tests', 2, 'report', [], self._compute)
+        get_or_compute('tests', None, 'report', [], self._compute)
+        
+        bump_version('tests', 1)
+        
+        self.assertEqual(get_or_compute('tests', 1, 'report', [], self._compute), {'calls': 4})
+        self.assertEqual(get_or_compute('tests', 2, 'report', [], self._compute), {'calls': 2})
+        self.assertEqual(get_or_compute('tests', None, 'report', [], self._compute), {'calls': 5})
+    
+    def test_slow_compute_keeps_the_next_workers_lock(self):
+        lock_key = f"{make_key('tests', 1, 'report', [])}:lock"
+        
+        def slow_compute():
+            # The lock expired mid-compute and another worker took it
+            cache.set(lock_key, 7, 30)
+            return self._compute()
+        
+        get_or_compute('tests', 1, 'report', [], slow_compute)
+        
+        self.assertEqual(cache.get(lock_key), 7)
+        cache.delete(lock_key)
+    
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': 'redis://127.0.0.1:1/0',
+        'OPTIONS': {'SOCKET_CONNECT_TIMEOUT': 0.1},
+    }})
+    def test_cache_outage_does_not_fail_writes(self):
+        """Invalidation runs after the row is written and must not raise out of save()"""
+        bump_version('tests', 1)
+        channel = CommunicationChannel.objects.create(name='Email', channel_type='email')
+        
+        self.assertTrue(CommunicationChannel.objects.filter(pk=channel.pk).exists())
+
+
+class ChatWriteBufferTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='member@thogmi.org', password='testpass123')
+        self.conversation = Conversation.objects.create(subject='Choir')
+        ConversationParticipant.objects.create(user=self.user, conversation=self.conversation)
+        self.buffer = ChatWriteBuffer()
+    
+    def test_flush_bulk_inserts_messages_and_resolves_provisional_receipts(self):
+        first = self.buffer.add_message(self.conversation.id, self.user.id, 'Rehearsal at 6')
+        self.buffer.add_message(self.conversation.id, self.user.id, 'Bring your folders')
+        self.buffer.add_receipt(self.user.id, first['provisional_id'], explicit=True)
+        
+        persisted = self.buffer.persist(*self.buffer.take_pending())
+        
+        self.assertEqual(ConversationMessage.objects.filter(conversation=self.conversation).count(), 2)
+        self.assertTrue(MessageReadReceipt.objects.filter(
+            user=self.user, message_id=persisted[first['provisional_id']]
+        ).exists())
+    
+    def test_duplicate_receipts_are_dropped(self):
+        message = ConversationMessage.objects.create(conversation=self.conversation, sender=self.user, content='Hi')
+        
+        self.assertTrue(self.buffer.add_receipt(self.user.id, message.id))
+        self.assertFalse(self.buffer.add_receipt(self.user.id, str(message.id)))
+        self.buffer.persist(*self.buffer.take_pending())
+        self.assertFalse(self.buffer.add_receipt(self.user.id, message.id))
+        
+        self.assertFalse(MessageReadReceipt.objects.filter(message=message).exists())
+    
+    def test_receipts_advance_the_read_watermark(self):
+        message = ConversationMessage.objects.create(conversation=self.conversation, sender=self.user, content='Hi')
+        
+        self.buffer.add_receipt(self.user.id, message.id)
+        self.buffer.persist(*self.buffer.take_pending())
+        
+        self.assertEqual(ConversationReadService.watermark(self.user, self.conversation.id), message.id)
+
+
+class ConversationReadServiceTests(TestCase):
+    def setUp(self):
+        self.reader = User.objects.create_user(email='reader@thogmi.org', password='testpass123')
+        self.sender = User.objects.create_user(email='sender@thogmi.org', password='testpass123')
+        self.conversation = Conversation.objects.create(subject='Ushers')
+        for user in (self.reader, self.sender):
+            ConversationParticipant.objects.create(user=user, conversation=self.conversation)
+        self.messages = [
+            ConversationMessage.objects.create(conversation=self.conversation, sender=self.sender, content=f'Note {i}')
+            for i in range(3)
+        ]
+    
+    def test_unread_count_follows_watermark(self):
+        self.assertEqual(ConversationReadService.unread_count(self.reader, self.conversation.id), 3)
+        
+        ConversationReadService.advance(self.reader.id, self.conversation.id, self.messages[1].id)
+        self.assertEqual(ConversationReadService.unread_count(self.reader, self.conversation.id), 1)
+        
+        # The watermark never moves backwards
+        self.assertFalse(ConversationReadService.advance(self.reader.id, self.conversation.id, self.messages[0].id))
+    
+    def test_advance_many_is_one_update(self):
+        ConversationReadService.advance(self.sender.id, self.conversation.id, self.messages[2].id)
+        watermarks = {
+            (self.reader.id, self.conversation.id): self.messages[1].id,
+            # Already past this message, so left alone
+            (self.sender.id, self.conversation.id): self.messages[0].id,
+        }
+        
+        with self.assertNumQueries(1):
+            advanced = ConversationReadService.advance_many(watermarks)
+        
+        self.assertEqual(advanced, 1)
+        self.assertEqual(ConversationReadService.watermark(self.reader, self.conversation.id), self.messages[1].id)
+        self.assertEqual(ConversationReadService.watermark(self.sender, self.conversation.id), self.messages[2].id)
+    
+    def test_mark_all_read_is_one_update(self):
+        with self.assertNumQueries(1):
+            ConversationReadService.mark_all_read(self.reader, self.conversation.id)
+        
+        self.assertEqual(ConversationReadService.unread_count(self.reader, self.conversation.id), 0)
+        conversation = ConversationReadService.with_unread_counts(
+            Conversation.objects.filter(pk=self.conversation.pk), self.sender
+        ).get()
+        self.assertEqual(conversation.unread_count, 0)
+
+
+@override_settings(COMMUNICATION_SETTINGS={'CHAT_HOT_TAIL_SIZE': 2})
+class ConversationHistoryServiceTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='member@thogmi.org', password='testpass123')
+        self.conversation = Conversation.objects.create(subject='Youth')
+        self.messages = [
+            ConversationMessage.objects.create(conversation=self.conversation, sender=self.user, content=f'Note {i}')
+            for i in range(5)
+        ]
+        self.service = ConversationHistoryService()
+    
+    def test_cursor_pages_walk_back_from_newest(self):
+        newest = self.service._load_page(self.conversation.id, None, 2)
+        self.assertEqual([m['id'] for m in newest], [m.id for m in self.messages[3:]])
+        
+        page = self.service.get_page(self.conversation.id, before=self.service.encode_cursor(newest[0]), limit=2)
+        self.assertEqual([m['id'] for m in page['messages']], [m.id for m in self.messages[1:3]])
+        
+        last = self.service.get_page(self.conversation.id, before=page['next_cursor'], limit=2)
+        self.assertEqual([m['id'] for m in last['messages']], [self.messages[0].id])
+        self.assertIsNone(last['next_cursor'])
+    
+    def test_malformed_cursor_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.service.get_page(self.conversation.id, before='not-a-cursor')
+    
+    def test_unnamed_senders_fall_back_to_email(self):
+        serialized = self.service.serialize(self.messages[0])
+        self.assertEqual(serialized['sender_name'], 'member@thogmi.org')
+        self.assertEqual(serialized['sender_name'], sender_display_name(self.user))
+
+
+class TypingCoalescerTests(TestCase):
+    def test_bursts_collapse_to_leading_and_trailing_events(self):
+        sent = []
+        
+        async def send(is_typing):
+            sent.append(is_typing)
+        
+        async def scenario():
+            coalescer = TypingCoalescer(send, interval=0.05)
+            for _ in range(20):
+                await coalescer.update(True)
+            await coalescer.update(False)
+            await asyncio.sleep(0.1)
+            # Repeated "not typing" is never re-sent
+            await coalescer.update(False)
+            await asyncio.sleep(0.1)
+        
+        asyncio.run(scenario())
+        
+        self.assertEqual(sent, [True, False])
+
+
+class NotificationServiceTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='notify@example.com', password='test123')
+        self.notification = Notification.objects.create(
+            user=self.user, title='Service moved', message='Sunday service starts at 10',
+            notification_type='announcement', data={'event_id': 7}
+        )
+    
+    def test_serialized_notification_matches_push_payload(self):
+        payload = serialize_notification(self.notification)
+        self.assertEqual(payload['id'], self.notification.id)
+        self.assertEqual(payload['type'], 'announcement')
+        self.assertEqual(payload['data'], {'event_id': 7})
+        self.assertFalse(payload['is_read'])
+    
+    def test_mark_read_only_counts_unread_notifications(self):
+        Notification.objects.filter(id=self.notification.id).update(is_read=True)
+        other = User.objects.create_user(email='other-notify@example.com', password='test123')
+        
+        # Already read, or someone else's: nothing changes and the counter is untouched
+        self.assertFalse(NotificationService().mark_read(self.notification.id, self.user.id))
+        self.assertFalse(NotificationService().mark_read(self.notification.id, other.id))
+    
+    def test_batched_push_reaches_each_group_in_order(self):
+        channel_layer = get_channel_layer()
+        
+        async def scenario():
+            channel = await channel_layer.new_channel()
+            await channel_layer.group_add(notification_group(self.user.id), channel)
+            sends = [(notification_group(self.user.id), {'type': 'send_notification', 'position': i}) for i in range(3)]
+            # A group nobody listens to is skipped
+            sends.append((notification_group(0), {'type': 'send_notification', 'position': 3}))
+            await sync_to_async(group_send_many)(sends, chunk_size=2)
+            received = [(await channel_layer.receive(channel))['position'] for _ in range(3)]
+            await channel_layer.group_discard(notification_group(self.user.id), channel)
+            return received
+        
+        self.assertEqual(asyncio.run(scenario()), [0, 1, 2])
+    
+    def test_unread_counter_follows_create_and_mark_read(self):
+        service = NotificationService()
+        get_redis_connection('default').delete(UNREAD_KEY.format(self.user.id))
+        self.assertEqual(service.unread_count(self.user.id), 1)
+        
+        created, = service.create([self.user.id], 'Choir practice', 'Moved to Friday')
+        self.assertEqual(service.unread_count(self.user.id), 2)
+        
+        service.mark_read(created.id, self.user.id)
+        self.assertEqual(service.unread_count(self.user.id), 1)
+    
+    def test_expired_counter_is_recounted(self):
+        service = NotificationService()
+        service.unread_count(self.user.id)
+        # Written without the service, as drift would be
+        Notification.objects.filter(id=self.notification.id).update(is_read=True)
+        
+        get_redis_connection('default').delete(UNREAD_KEY.format(self.user.id))
+        
+        self.assertEqual(service.unread_count(self.user.id), 0)
+    
+    def test_changes_during_a_recount_are_not_lost(self):
+        service = NotificationService()
+        get_redis_connection('default').delete(UNREAD_KEY.format(self.user.id))
+        count_unread = service._count_unread
+        
+        def count_then_create(user_ids):
+            counts = count_unread(user_ids)
+            service.create([self.user.id], 'Choir practice', 'Moved to Friday')
+            return counts
+        
+        service._count_unread = count_then_create
+        self.assertEqual(service.unread_count(self.user.id), 2)
+        self.assertEqual(int(get_redis_connection('default').get(UNREAD_KEY.format(self.user.id))), 2)
+    
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': 'redis://127.0.0.1:1/0',
+        'OPTIONS': {'SOCKET_CONNECT_TIMEOUT': 0.1},
+    }})
+    def test_redis_outage_does_not_fail_notifications(self):
+        service = NotificationService()
+        
+        created, = service.create([self.user.id], 'Choir practice', 'Moved to Friday')
+        
+        self.assertTrue(Notification.objects.filter(id=created.id).exists())
+        self.assertEqual(service.unread_count(self.user.id), 2)
+
+
+@override_settings(COMMUNICATION_SETTINGS={
+    'DIGEST_WINDOWS': {'email': 1800},
+    'DIGEST_BYPASS_CATEGORIES': ['welfare_escalation'],
+})
+class NotificationDigestServiceTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='digest@example.com', password='test123')
+        self.service = NotificationDigestService()
+    
+    def test_notifications_in_one_window_share_a_delivery_time(self):
+        self.service.notify([self.user.id], 'email', 'Step approved', 'Budget step approved', category='workflow')
+        self.service.notify([self.user.id], 'email', 'New announcement', 'Choir practice moved', category='announcement')
+        
+        entries = NotificationDigestEntry.objects.filter(user=self.user)
+        self.assertEqual(entries.count(), 2)
+        self.assertEqual(len({entry.deliver_after for entry in entries}), 1)
+        
+        # Nothing is due until the window closes
+        self.assertEqual(self.service.flush_due(), 0)
+        self.assertEqual(entries.count(), 2)
+    
+    def test_bypass_categories_are_urgent(self):
+        self.assertTrue(self.service.is_urgent('welfare_escalation'))
+        self.assertTrue(self.service.is_urgent('workflow', urgent=True))
+        self.assertFalse(self.service.is_urgent('workflow'))
+    
+    def test_combined_message_lists_the_newest_entries(self):
+        for i in range(DIGEST_MAX_LINES + 2):
+            self.service.notify([self.user.id], 'email', f'Update {i}', 'Details', category='workflow')
+        entries = list(NotificationDigestEntry.objects.filter(user=self.user).order_by('created_at', 'id'))
+        
+        title, message, category, data = self.service.combine(entries)
+        
+        self.assertEqual(title, f'{DIGEST_MAX_LINES + 2} new notifications')
+        self.assertEqual(category, 'digest')
+        self.assertIn('...and 2 earlier', message)
+        self.assertIn(f'- Update {DIGEST_MAX_LINES + 1}', message)
+        self.assertEqual(data['categories'], {'workflow': DIGEST_MAX_LINES + 2})
+    
+    def test_claimed_entries_are_not_due_for_other_flushers(self):
+        self.service.notify([self.user.id], 'email', 'Step approved', 'Budget step approved', category='workflow')
+        now = timezone.now() + self.service.window('email')
+        
+        claimed = self.service._claim(self.user.id, 'email', now)
+        
+        self.assertEqual(len(claimed), 1)
+        self.assertEqual(self.service._claim(self.user.id, 'email', now), [])
+        self.assertEqual(self.service.flush_due(now), 0)
@@ -1,7 +1,10 @@
 from django.urls import path, include
+from . import views
 
 app_name = 'communications'
 
 urlpatterns = [
     path('api/', include('communications.api.urls')),
+    path('t/o/<str:token>.gif', views.track_open, name='track-open'),
+    path('t/c/<str:token>/', views.track_click, name='track-click'),
 ]
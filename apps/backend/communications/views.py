@@ -0,0 +1,40 @@
+import base64
+import logging
+from django.http import HttpResponse, HttpResponseRedirect, Http404
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_GET
+from .services.tracking_service import TrackingService
+
+logger = logging.getLogger(__name__)
+
+# 1x1 transparent GIF
+PIXEL_GIF = base64.b64decode('R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7')
+
+@never_cache
+@require_GET
+def track_open(request, token):
+    """Open-tracking pixel: always serves the image, counts only valid tokens"""
+    message_id = TrackingService.read_open_token(token)
+    if message_id is not None:
+        try:
+            TrackingService.record_open(message_id)
+        except Exception as e:
+            logger.warning(f"Could not record open for message {message_id}: {str(e)}")
+
+    return HttpResponse(PIXEL_GIF, content_type='image/gif')
+
+@never_cache
+@require_GET
+def track_click(request, token):
+    """Signed short-link redirect that counts the click"""
+    payload = TrackingService.read_click_token(token)
+    if payload is None:
+        raise Http404('Invalid link')
+
+    message_id, url = payload
+    try:
+        TrackingService.record_click(message_id)
+    except Exception as e:
+        logger.warning(f"Could not record click for message {message_id}: {str(e)}")
+
+    return HttpResponseRedirect(url)
@@ -0,0 +1,305 @@
+"""
+Adaptive backpressure for bulk background work.
+
+Bulk tasks (campaign fan-out, bulk announcements, engagement recalculation,
+guest SMS reminders) ask a BackpressureController how much work to take on
+next. The controller looks at three signals:
+
+- interactive request latency, recorded by RequestLatencyMiddleware
+- database round-trip latency, sampled with a trivial query
+- provider error rates, recorded by the delivery services
+
+and scales the chunk size and send concurrency up or down (AIMD). When
+interactive latency goes past the configured SLO the bulk task pauses until
+it recovers, so Sunday-morning check-ins keep priority over background work.
+"""
+import logging
+import math
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    'INTERACTIVE_LATENCY_SLO_MS': 800,
+    'DB_LATENCY_SLO_MS': 50,
+    'PROVIDER_ERROR_RATE_THRESHOLD': 0.25,
+    'MIN_CHUNK_SIZE': 10,
+    'MAX_CHUNK_SIZE': 500,
+    'MIN_CONCURRENCY': 1,
+    'MAX_CONCURRENCY': 16,
+    'BUCKET_SECONDS': 10,
+    'WINDOW_BUCKETS': 6,
+    'PAUSE_SECONDS': 5,
+    'MAX_PAUSE_SECONDS': 300,
+}
+
+# Upper bounds (ms) of the latency histogram bins; the last bin is open-ended
+LATENCY_BINS_MS = (50, 100, 200, 400, 800, 1600, 3200, None)
+
+
+def get_backpressure_settings():
+    """Merge project overrides from settings.BACKPRESSURE with the defaults"""
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'BACKPRESSURE', {})}
+
+
+def _current_bucket(bucket_seconds):
+    return int(time.time() // bucket_seconds)
+
+
+def _window_buckets(config):
+    current = _current_bucket(config['BUCKET_SECONDS'])
+    return [current - offset for offset in range(config['WINDOW_BUCKETS'])]
+
+
+def _incr(key, timeout):
+    """Increment a cache counter, creating it if it does not exist yet"""
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout):
+            cache.incr(key)
+
+
+def record_request_latency(duration_ms):
+    """Record an interactive request duration in the shared latency histogram"""
+    config = get_backpressure_settings()
+    bucket = _current_bucket(config['BUCKET_SECONDS'])
+    timeout = config['BUCKET_SECONDS'] * (config['WINDOW_BUCKETS'] + 1)
+
+    for index, upper_bound in enumerate(LATENCY_BINS_MS):
+        if upper_bound is None or duration_ms <= upper_bound:
+            _incr(f"bp:lat:{bucket}:{index}", timeout)
+            break
+
+
+def record_provider_result(channel_type, success):
+    """Record the outcome of a provider call for error-rate tracking"""
+    config = get_backpressure_settings()
+    bucket = _current_bucket(config['BUCKET_SECONDS'])
+    timeout = config['BUCKET_SECONDS'] * (config['WINDOW_BUCKETS'] + 1)
+    outcome = 'ok' if success else 'err'
+    _incr(f"bp:prov:{channel_type}:{bucket}:{outcome}", timeout)
+
+
+def get_interactive_latency_p95(config=None):
+    """Approximate p95 of interactive request latency over the sample window"""
+    config = config or get_backpressure_settings()
+    keys = [
+        f"bp:lat:{bucket}:{index}"
+        for bucket in _window_buckets(config)
+        for index in range(len(LATENCY_BINS_MS))
+    ]
+    counts = cache.get_many(keys)
+
+    histogram = [0] * len(LATENCY_BINS_MS)
+    for key, count in counts.items():
+        histogram[int(key.rsplit(':', 1)[1])] += count
+
+    total = sum(histogram)
+    if total == 0:
+        return 0.0
+
+    threshold = total * 0.95
+    running = 0
+    for index, count in enumerate(histogram):
+        running += count
+        if running >= threshold:
+            upper_bound = LATENCY_BINS_MS[index]
+            # The open-ended bin is reported as twice the last finite bound
+            return float(upper_bound if upper_bound is not None else LATENCY_BINS_MS[-2] * 2)
+    return 0.0
+
+
+def get_provider_error_rate(channel_type, config=None):
+    """Share of failed provider calls for a channel over the sample window"""
+    config = config or get_backpressure_settings()
+    keys = []
+    for bucket in _window_buckets(config):
+        keys.append(f"bp:prov:{channel_type}:{bucket}:ok")
+        keys.append(f"bp:prov:{channel_type}:{bucket}:err")
+    counts = cache.get_many(keys)
+
+    errors = sum(count for key, count in counts.items() if key.endswith(':err'))
+    total = sum(counts.values())
+    return errors / total if total else 0.0
+
+
+def sample_db_latency():
+    """Time a trivial round-trip to the database in milliseconds"""
+    start = time.monotonic()
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+    return (time.monotonic() - start) * 1000
+
+
+@dataclass
+class LoadSample:
+    db_latency_ms: float
+    interactive_p95_ms: float
+    provider_error_rate: float
+
+
+@dataclass
+class Pace:
+    """
+    How much work a bulk task should take on next.
+
+    chunk_size: number of records to process before checking load again
+    concurrency: number of sends released to the workers per second
+    start_offset: seconds from now until the chunk's first send slot, after
+        the slots reserved by earlier chunks of the same task
+    """
+    chunk_size: int
+    concurrency: int
+    start_offset: int = 0
+
+    def countdown_for(self, index):
+        """Stagger dispatch so at most `concurrency` sends start per second"""
+        return self.start_offset + index // max(self.concurrency, 1)
+
+
+class BackpressureController:
+    """
+    Scales chunk size and concurrency of a bulk task from live load samples.
+
+    Usage:
+        controller = BackpressureController('process_campaign', channel_type='sms')
+        for chunk, pace in controller.iter_queryset(audience):
+            ...
+    """
+
+    def __init__(self, task_name, channel_type=None, chunk_size=None, concurrency=None):
+        self.task_name = task_name
+        self.channel_type = channel_type
+        self.config = get_backpressure_settings()
+
+        self.chunk_size = self._clamp_chunk(chunk_size or self.config['MAX_CHUNK_SIZE'] // 5)
+        self.concurrency = self._clamp_concurrency(concurrency or self.config['MAX_CONCURRENCY'] // 2)
+        self._chunk_step = max(self.config['MIN_CHUNK_SIZE'], self.chunk_size // 4)
+        # Wall-clock time at which the next unreserved send slot opens
+        self._next_slot = None
+
+    def _clamp_chunk(self, value):
+        return max(self.config['MIN_CHUNK_SIZE'], min(int(value), self.config['MAX_CHUNK_SIZE']))
+
+    def _clamp_concurrency(self, value):
+        return max(self.config['MIN_CONCURRENCY'], min(int(value), self.config['MAX_CONCURRENCY']))
+
+    def sample(self) -> LoadSample:
+        """Collect the current load signals"""
+        try:
+            db_latency = sample_db_latency()
+        except Exception as e:
+            logger.warning(f"Backpressure DB latency sample failed for {self.task_name}: {str(e)}")
+            db_latency = float(self.config['DB_LATENCY_SLO_MS'])
+
+        try:
+            interactive_p95 = get_interactive_latency_p95(self.config)
+            error_rate = get_provider_error_rate(self.channel_type, self.config) if self.channel_type else 0.0
+        except Exception as e:
+            # A cache outage must not stop bulk work; fall back to neutral signals
+            logger.warning(f"Backpressure cache sample failed for {self.task_name}: {str(e)}")
+            interactive_p95, error_rate = 0.0, 0.0
+
+        return LoadSample(
+            db_latency_ms=db_latency,
+            interactive_p95_ms=interactive_p95,
+            provider_error_rate=error_rate,
+        )
+
+    def _pressure(self, sample: LoadSample) -> float:
+        """Highest ratio of any signal to its limit (1.0 means at the limit)"""
+        ratios = [
+            sample.db_latency_ms / self.config['DB_LATENCY_SLO_MS'],
+            sample.interactive_p95_ms / self.config['INTERACTIVE_LATENCY_SLO_MS'],
+        ]
+        if self.channel_type:
+            ratios.append(sample.provider_error_rate / self.config['PROVIDER_ERROR_RATE_THRESHOLD'])
+        return max(ratios)
+
+    def adjust(self, sample: LoadSample) -> Pace:
+        """Additive increase while healthy, multiplicative decrease under pressure"""
+        pressure = self._pressure(sample)
+
+        if pressure >= 1.0:
+            self.chunk_size = self._clamp_chunk(self.chunk_size // 2)
+            self.concurrency = self._clamp_concurrency(self.concurrency // 2)
+        elif pressure < 0.7:
+            self.chunk_size = self._clamp_chunk(self.chunk_size + self._chunk_step)
+            self.concurrency = self._clamp_concurrency(self.concurrency + 1)
+
+        return Pace(chunk_size=self.chunk_size, concurrency=self.concurrency)
+
+    def wait_for_capacity(self) -> Pace:
+        """
+        Block while interactive latency is over the SLO, then return the pace
+        for the next chunk. Gives up waiting after MAX_PAUSE_SECONDS and
+        continues at the minimum pace so a task can never stall forever.
+        """
+        waited = 0
+        sample = self.sample()
+
+        while sample.interactive_p95_ms > self.config['INTERACTIVE_LATENCY_SLO_MS']:
+            if waited >= self.config['MAX_PAUSE_SECONDS']:
+                logger.warning(
+                    f"{self.task_name} paused {waited}s for interactive latency; resuming at minimum pace"
+                )
+                self.chunk_size = self.config['MIN_CHUNK_SIZE']
+                self.concurrency = self.config['MIN_CONCURRENCY']
+                return Pace(chunk_size=self.chunk_size, concurrency=self.concurrency)
+
+            logger.info(
+                f"{self.task_name} pausing: interactive p95 {sample.interactive_p95_ms:.0f}ms "
+                f"over SLO {self.config['INTERACTIVE_LATENCY_SLO_MS']}ms"
+            )
+            time.sleep(self.config['PAUSE_SECONDS'])
+            waited += self.config['PAUSE_SECONDS']
+            sample = self.sample()
+
+        return self.adjust(sample)
+
+    def _reserve(self, pace, count):
+        """
+        Reserve send slots for a chunk after those of earlier chunks, so the
+        task as a whole, not each chunk, stays within `concurrency` per second
+        """
+        now = time.time()
+        pace.start_offset = max(0, math.ceil((self._next_slot or now) - now))
+        self._next_slot = now + pace.start_offset + math.ceil(count / max(pace.concurrency, 1))
+
+    def iter_queryset(self, queryset):
+        """
+        Yield (chunk, pace) pairs over a queryset using keyset pagination on
+        the primary key, sizing each chunk from the current load.
+        """
+        queryset = queryset.order_by('pk')
+        last_pk = None
+
+        while True:
+            pace = self.wait_for_capacity()
+            page = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            chunk = list(page[:pace.chunk_size])
+            if not chunk:
+                return
+
+            self._reserve(pace, len(chunk))
+            yield chunk, pace
+            last_pk = chunk[-1].pk
+
+    def iter_sequence(self, items):
+        """Yield (chunk, pace) pairs over an in-memory sequence"""
+        items = list(items)
+        position = 0
+
+        while position < len(items):
+            pace = self.wait_for_capacity()
+            chunk = items[position:position + pace.chunk_size]
+            self._reserve(pace, len(chunk))
+            yield chunk, pace
+            position += len(chunk)
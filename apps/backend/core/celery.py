@@ -28,6 +28,35 @@ app.conf.beat_schedule = {
         'task': 'communications.tasks.process_scheduled_messages',
         'schedule': crontab(minute='*/5'),  # Every 5 minutes
     },
+    'flush-tracking-counters': {
+        'task': 'communications.tasks.flush_tracking_counters',
+        'schedule': 60.0,  # Every minute
+    },
+    'flush-notification-digests': {
+        'task': 'communications.tasks.flush_notification_digests',
+        'schedule': 60.0,  # Every minute
+    },
+    'reconcile-message-stats': {
+        'task': 'communications.tasks.reconcile_message_stats',
+        'schedule': crontab(hour=1, minute=30),  # Nightly
+    },
+    'repair-campaign-counters': {
+        'task': 'communications.tasks.repair_campaign_counters',
+        'schedule': crontab(hour=1, minute=45),  # Nightly
+    },
+    'drain-engagement-queue': {
+        'task': 'members.tasks.drain_engagement_queue',
+        'schedule': 60.0,  # Every minute
+    },
+    'refresh-engagement-features': {
+        'task': 'members.tasks.refresh_engagement_features',
+        'schedule': crontab(minute=15),  # Hourly, members with new events only
+    },
+    'refresh-all-engagement-features': {
+        'task': 'members.tasks.refresh_engagement_features',
+        'schedule': crontab(hour=0, minute=45),  # Nightly, so rolling windows decay
+        'kwargs': {'full': True},
+    },
     'cleanup-old-messages': {
         'task': 'communications.tasks.cleanup_old_messages',
         'schedule': crontab(hour=2, minute=0),  # Daily at 2 AM
@@ -0,0 +1,132 @@
+"""
+HTTP response cache for read-heavy API endpoints.
+
+List and detail endpoints that the frontend polls (communication templates
+and campaigns, member and welfare lists, guest lists) are cached in the
+shared cache, keyed by:
+
+- the result_cache version of the view's namespace, so the same model
+  writes that invalidate cached analytics (see bump_version) also orphan
+  cached responses
+- the requesting user, or their role for views whose results do not
+  depend on who is asking
+- the view, action and normalized query string
+
+Every cached response carries an ETag. A request whose If-None-Match still
+matches gets a 304 from a single cache read, without touching the database
+or rendering a body.
+"""
+import hashlib
+import json
+import logging
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .result_cache import get_versions
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    'ENABLED': True,
+    'TTL_SECONDS': 300,
+}
+
+
+def get_response_cache_settings():
+    """Merge project overrides from settings.RESPONSE_CACHE with the defaults"""
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'RESPONSE_CACHE', {})}
+
+
+def make_etag(body):
+    return f'"{hashlib.sha1(body.encode()).hexdigest()}"'
+
+
+def etag_matches(request, etag):
+    """Whether the request's If-None-Match names this ETag (weak or strong)"""
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    candidates = [candidate.strip() for candidate in header.split(',')]
+    return '*' in candidates or etag in candidates or f'W/{etag}' in candidates
+
+
+class ResponseCacheMixin:
+    """
+    Cache a viewset's list and retrieve responses, with ETag revalidation.
+
+    Set `cache_namespace` to the result_cache namespace whose writes change
+    the view's output. `cache_scope` is 'user' (the default, for querysets
+    filtered by who is asking) or 'role' (for views that return the same
+    data to everyone in the same groups).
+    """
+    cache_namespace = None
+    cache_scope = 'user'
+    cache_ttl = None
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: super(ResponseCacheMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: super(ResponseCacheMixin, self).retrieve(request, *args, **kwargs))
+
+    def get_cache_scope(self, request):
+        user = request.user
+        if not user.is_authenticated:
+            return 'anonymous'
+        if self.cache_scope == 'role':
+            groups = ','.join(sorted(user.groups.values_list('name', flat=True)))
+            return f"role:{int(user.is_superuser)}:{int(user.is_staff)}:{groups}"
+        return f"user:{user.pk}"
+
+    def get_response_cache_key(self, request):
+        generation, version = get_versions(self.cache_namespace)
+        query = urlencode(sorted((key, value) for key, values in request.GET.lists() for value in values))
+        digest = hashlib.sha1(f"{request.path}?{query}".encode()).hexdigest()
+        return (
+            f"http:{self.cache_namespace}:{generation}:{version}:{self.get_cache_scope(request)}:"
+            f"{type(self).__name__}:{self.action}:{digest}"
+        )
+
+    def cached_response(self, request, compute):
+        config = get_response_cache_settings()
+        if not config['ENABLED'] or self.cache_namespace is None:
+            return compute()
+
+        key = self.get_response_cache_key(request)
+        entry = cache.get(key)
+        if entry is not None:
+            body, etag = entry
+            if etag_matches(request, etag):
+                return self._not_modified(etag)
+            return self._with_headers(Response(json.loads(body)), etag, 'HIT')
+
+        response = compute()
+        if response.status_code != status.HTTP_200_OK:
+            return response
+
+        body = json.dumps(response.data, cls=JSONEncoder)
+        etag = make_etag(body)
+        try:
+            cache.set(key, (body, etag), self.cache_ttl or config['TTL_SECONDS'])
+        except Exception as e:
+            logger.error(f"Error caching response for {request.path}: {str(e)}")
+
+        if etag_matches(request, etag):
+            return self._not_modified(etag)
+        return self._with_headers(response, etag, 'MISS')
+
+    def _not_modified(self, etag):
+        return self._with_headers(Response(status=status.HTTP_304_NOT_MODIFIED), etag, 'HIT')
+
+    @staticmethod
+    def _with_headers(response, etag, outcome):
+        response['ETag'] = etag
+        # Clients may keep the response but must revalidate it on every use
+        response['Cache-Control'] = 'private, no-cache'
+        response['X-Cache'] = outcome
+        return response
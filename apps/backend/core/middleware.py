@@ -0,0 +1,27 @@
+import time
+import logging
+
+from .backpressure import record_request_latency
+
+logger = logging.getLogger(__name__)
+
+class RequestLatencyMiddleware:
+    """Record interactive request latency for the bulk-task backpressure controller"""
+
+    EXCLUDED_PREFIXES = ('/static/', '/media/', '/admin/jsi18n/')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start_time = time.monotonic()
+        response = self.get_response(request)
+
+        if not request.path.startswith(self.EXCLUDED_PREFIXES):
+            try:
+                record_request_latency((time.monotonic() - start_time) * 1000)
+            except Exception as e:
+                # Latency sampling is best-effort and must never fail a request
+                logger.debug(f"Could not record request latency: {str(e)}")
+
+        return response
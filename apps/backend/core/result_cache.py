@@ -0,0 +1,195 @@
+"""
+Shared cache for expensive analytics results.
+
+Dashboard endpoints (CMAS growth metrics and funnels, communication
+analytics, the member engagement report) recompute the same aggregates for
+every admin who opens them. Results are cached in the shared cache with:
+
+- single-flight recomputation: on a miss one worker takes a short lock and
+  computes, the others wait for its result instead of running the same
+  queries at once
+- early probabilistic refresh (XFetch): as an entry nears expiry, readers
+  volunteer to recompute it with rising probability, weighted by how long
+  the computation took, so hot entries are refreshed before they expire
+- versioned invalidation: every key embeds a namespace generation and a
+  per-branch version. Writes to the underlying models bump the version
+  (see bump_version), which orphans the old entries without deleting keys.
+"""
+import hashlib
+import json
+import logging
+import math
+import random
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django_redis import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    'ENABLED': True,
+    'TTL_SECONDS': 300,
+    'LOCK_SECONDS': 30,
+    'WAIT_SECONDS': 10,
+    'POLL_SECONDS': 0.05,
+    'XFETCH_BETA': 1.0,
+}
+
+# Scope for results computed across all branches
+ALL_BRANCHES = 'all'
+
+# Delete a single-flight lock only while it still holds the caller's token
+RELEASE_LOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def get_result_cache_settings():
+    """Merge project overrides from settings.RESULT_CACHE with the defaults"""
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'RESULT_CACHE', {})}
+
+
+def _generation_key(namespace):
+    return f"rc:gen:{namespace}"
+
+
+def _version_key(namespace, branch_id):
+    return f"rc:ver:{namespace}:{branch_id if branch_id is not None else ALL_BRANCHES}"
+
+
+def _incr(key):
+    """Increment a version counter, creating it if it does not exist yet"""
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 2, None):
+            cache.incr(key)
+
+
+def get_versions(namespace, branch_id=None):
+    """Current (generation, branch version) for a namespace, in one round trip"""
+    generation_key = _generation_key(namespace)
+    version_key = _version_key(namespace, branch_id)
+    versions = cache.get_many([generation_key, version_key])
+    return versions.get(generation_key, 1), versions.get(version_key, 1)
+
+
+def bump_version(namespace, branch_id=None):
+    """
+    Invalidate cached results after a write. A branch write invalidates that
+    branch and the all-branches results that include it; a write without a
+    branch invalidates the whole namespace.
+
+    Called from post_save/post_delete receivers after the row is written, so
+    a cache outage is logged rather than failing the write; cached results
+    then expire with their TTL.
+    """
+    try:
+        if branch_id is None:
+            _incr(_generation_key(namespace))
+            return
+        _incr(_version_key(namespace, branch_id))
+        _incr(_version_key(namespace, None))
+    except Exception as e:
+        logger.error(f"Error bumping cache version for {namespace} (branch {branch_id}): {str(e)}")
+
+
+def make_key(namespace, branch_id, name, params):
+    generation, version = get_versions(namespace, branch_id)
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+    scope = branch_id if branch_id is not None else ALL_BRANCHES
+    return f"rc:{namespace}:{generation}:{scope}:{version}:{name}:{digest}"
+
+
+def _should_refresh_early(delta, expires_at, beta):
+    """XFetch: recompute before expiry with probability rising towards it"""
+    return time.time() - delta * beta * math.log(random.random() or 1e-12) >= expires_at
+
+
+def get_or_compute(namespace, branch_id, name, params, compute, ttl=None):
+    """
+    Return the cached result for (name, params) in the branch scope, or
+    compute it with single-flight protection.
+    """
+    config = get_result_cache_settings()
+    if not config['ENABLED']:
+        return compute()
+    ttl = ttl or config['TTL_SECONDS']
+    key = make_key(namespace, branch_id, name, params)
+    lock_key = f"{key}:lock"
+    # Integers are stored unpickled, so the release script can compare them
+    token = random.getrandbits(62)
+
+    entry = cache.get(key)
+    if entry is not None:
+        value, delta, expires_at = entry
+        if not _should_refresh_early(delta, expires_at, config['XFETCH_BETA']):
+            return value
+        # Only one reader refreshes; the rest keep serving the current value
+        if not cache.add(lock_key, token, config['LOCK_SECONDS']):
+            return value
+        return _compute_and_store(key, lock_key, token, compute, ttl)
+
+    if cache.add(lock_key, token, config['LOCK_SECONDS']):
+        return _compute_and_store(key, lock_key, token, compute, ttl)
+
+    # Someone else is computing this result; wait for it
+    deadline = time.monotonic() + config['WAIT_SECONDS']
+    while time.monotonic() < deadline:
+        time.sleep(config['POLL_SECONDS'])
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+
+    logger.warning(f"Timed out waiting for cached result {name}; computing it here")
+    return compute()
+
+
+def _compute_and_store(key, lock_key, token, compute, ttl):
+    try:
+        started = time.monotonic()
+        value = compute()
+        delta = time.monotonic() - started
+        cache.set(key, (value, delta, time.time() + ttl), ttl)
+        return value
+    finally:
+        _release_lock(lock_key, token)
+
+
+def _release_lock(lock_key, token):
+    """
+    Release a single-flight lock. A compute that outlived LOCK_SECONDS may
+    find the lock taken by another worker, which must keep it.
+    """
+    try:
+        conn = get_redis_connection('default')
+    except NotImplementedError:
+        # Not a Redis cache (local development and tests): nothing else shares it
+        if cache.get(lock_key) == token:
+            cache.delete(lock_key)
+        return
+    conn.eval(RELEASE_LOCK, 1, cache.make_key(lock_key), token)
+
+
+def cached_result(namespace, branch_id=None, ttl=None):
+    """
+    Cache a method's result. `branch_id` is called with the method's
+    arguments (including self) and returns the branch scope, or None for
+    results across all branches.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            scope = branch_id(self, *args, **kwargs) if branch_id else None
+            return get_or_compute(
+                namespace, scope, method.__qualname__, [args, kwargs],
+                lambda: method(self, *args, **kwargs), ttl
+            )
+        return wrapper
+    return decorator
@@ -53,6 +53,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestLatencyMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -146,6 +147,12 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
+    # Enforced by core.throttling.GCRARateThrottle on views that declare the scope
+    'DEFAULT_THROTTLE_RATES': {
+        'send-message': '100/hour',
+        'create-campaign': '10/hour',
+        'bulk-send': '5/day',
+    },
 }
 
 # JWT Settings
@@ -186,6 +193,17 @@ CORS_ALLOW_ALL_ORIGINS = DEBUG
 # Redis configuration
 REDIS_URL = config('REDIS_URL', default='redis://localhost:6379/0')
 
+# Cache configuration (shared across web and worker processes)
+CACHES = {
+    'default': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': REDIS_URL,
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+        },
+    }
+}
+
 # Celery configuration
 CELERY_BROKER_URL = REDIS_URL
 CELERY_RESULT_BACKEND = REDIS_URL
@@ -253,4 +271,51 @@ COMMUNICATION_SETTINGS = {
     'TWILIO_WHATSAPP_NUMBER': config('TWILIO_WHATSAPP_NUMBER', default=''),
     'MAX_RETRIES': 3,
     'RETRY_DELAY': 60,  # seconds
+    'DEFAULT_COUNTRY_CODE': config('DEFAULT_COUNTRY_CODE', default=''),  # e.g. '233', for local numbers
+    'PROVIDER_WEBHOOK_TOKEN': config('COMMUNICATION_WEBHOOK_TOKEN', default=''),
+    'SUPPRESSION_REFRESH_SECONDS': 300,
+    'SUPPRESSION_BLOOM_ERROR_RATE': 0.001,
+    'ARCHIVE_DIR': config('COMMUNICATION_ARCHIVE_DIR', default=os.path.join(BASE_DIR, 'archive', 'messages')),
+    'ARCHIVE_TIME_BUDGET_SECONDS': 600,
+    'TRACKING_BASE_URL': config('COMMUNICATION_TRACKING_BASE_URL', default=''),  # Public origin for pixels/links
+    'CHAT_FLUSH_INTERVAL_MS': 250,  # Write-behind interval for chat messages and receipts
+    'CHAT_MAX_BUFFERED': 20000,
+    'CHAT_HOT_TAIL_SIZE': 50,  # Newest messages per conversation kept in Redis
+    'CHAT_HOT_TAIL_TTL_SECONDS': 60 * 60 * 24,
+    'CHAT_TYPING_INTERVAL_SECONDS': 2,  # At most one typing broadcast per user per conversation
+    'PRESENCE_TTL_SECONDS': 60,  # Users without a heartbeat for this long are offline
+    'NOTIFICATION_SEND_CHUNK_SIZE': 500,  # Real-time notification pushes sent per pipelined batch
+    'NOTIFICATION_UNREAD_TTL_SECONDS': 60 * 60 * 24,  # Cached unread counts are recounted after this long
+    # Low-priority notifications are held per user and channel and sent as one digest
+    'DIGEST_WINDOWS': {'in_app': 5 * 60, 'push': 10 * 60, 'email': 30 * 60},
+    'DIGEST_BYPASS_CATEGORIES': ['welfare_escalation', 'security_alert'],
+    'DIGEST_MAX_ATTEMPTS': 3,
+    # Lookup from a groups.Group (broadcast and audience groups) to its users
+    'GROUP_MEMBERS_LOOKUP': 'members',
+}
+
+# Shared cache for analytics results (see core/result_cache.py)
+RESULT_CACHE = {
+    'ENABLED': config('RESULT_CACHE_ENABLED', default=True, cast=bool),
+    'TTL_SECONDS': config('RESULT_CACHE_TTL_SECONDS', default=300, cast=int),
+    'LOCK_SECONDS': 30,
+    'WAIT_SECONDS': 10,
+}
+
+# Cached API list/detail responses with ETags (see core/http_cache.py)
+RESPONSE_CACHE = {
+    'ENABLED': config('RESPONSE_CACHE_ENABLED', default=True, cast=bool),
+    'TTL_SECONDS': config('RESPONSE_CACHE_TTL_SECONDS', default=300, cast=int),
+}
+
+# Backpressure for bulk tasks (see core/backpressure.py)
+BACKPRESSURE = {
+    'INTERACTIVE_LATENCY_SLO_MS': config('BACKPRESSURE_LATENCY_SLO_MS', default=800, cast=int),
+    'DB_LATENCY_SLO_MS': config('BACKPRESSURE_DB_LATENCY_SLO_MS', default=50, cast=int),
+    'PROVIDER_ERROR_RATE_THRESHOLD': 0.25,
+    'MIN_CHUNK_SIZE': 10,
+    'MAX_CHUNK_SIZE': 500,
+    'MAX_CONCURRENCY': 16,
+    'PAUSE_SECONDS': 5,
+    'MAX_PAUSE_SECONDS': 300,
 }
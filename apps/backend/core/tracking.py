@@ -0,0 +1,132 @@
+"""
+Field-level change tracking for models.
+
+Models with FieldTrackerMixin remember the column values they were loaded
+(or last saved) with. That gives signal handlers a cheap
+`instance.tracker.has_changed('status')` check, and lets save() write only
+what changed:
+
+- a plain save() of a loaded instance becomes save(update_fields=[changed
+  columns + auto_now columns]), so unrelated columns (including large JSON
+  fields) are not rewritten and concurrent UPDATEs to other columns, such
+  as counters, are not clobbered with stale values
+- a save() with nothing changed is skipped entirely, without signals
+
+Explicit update_fields and inserts behave as before. Handlers that only
+care about some columns can return early with changed_any().
+"""
+import copy
+
+from django.db import models
+
+MUTABLE_TYPES = (dict, list, set)
+
+
+def _snapshot_value(value):
+    # JSON fields are edited in place; keep an independent copy to compare against
+    return copy.deepcopy(value) if isinstance(value, MUTABLE_TYPES) else value
+
+
+class FieldTracker:
+    """Saved values of one instance's concrete fields, by attname"""
+
+    def __init__(self, instance):
+        self.instance = instance
+        # Kept on the instance so copies and pickles carry their own snapshot
+        self.saved = instance.__dict__.setdefault('_tracked_values', {})
+
+    def _fields(self):
+        return [field for field in self.instance._meta.concrete_fields if not field.primary_key]
+
+    def set_saved(self, fields=None):
+        """Record the current values as saved (all loaded fields, or the given ones)"""
+        loaded = self.instance.__dict__
+        for field in self._fields():
+            if (fields is None or field.name in fields or field.attname in fields) and field.attname in loaded:
+                self.saved[field.attname] = _snapshot_value(loaded[field.attname])
+
+    def changed(self):
+        """{field name: saved value} for every field that differs from its saved value"""
+        if self.instance._state.adding:
+            return {field.name: None for field in self._fields()}
+
+        current = self.instance.__dict__
+        changes = {}
+        for field in self._fields():
+            if field.attname not in current:
+                continue  # Deferred and never touched
+            if field.attname not in self.saved or self.saved[field.attname] != current[field.attname]:
+                changes[field.name] = self.saved.get(field.attname)
+        return changes
+
+    def has_changed(self, field_name):
+        return field_name in self.changed()
+
+    def previous(self, field_name):
+        """The saved value of a field, or None for new instances"""
+        field = self.instance._meta.get_field(field_name)
+        return self.saved.get(field.attname)
+
+
+def changed_any(instance, fields):
+    """
+    Whether a save changed any of `fields`, for post_save handlers. New rows
+    and instances of untracked models count as changed.
+    """
+    if not isinstance(instance, FieldTrackerMixin):
+        return True
+    changed = instance.tracker.changed()
+    return any(field in changed for field in fields)
+
+
+class FieldTrackerMixin(models.Model):
+    """Track loaded field values and save only the columns that changed"""
+
+    class Meta:
+        abstract = True
+
+    @property
+    def tracker(self):
+        return FieldTracker(self)
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        if '_tracked_values' in state:
+            state['_tracked_values'] = dict(state['_tracked_values'])
+        return state
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.tracker.set_saved()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        self.tracker.set_saved(fields)
+
+    def save(self, *args, **kwargs):
+        if self._tracks_partial_save(args, kwargs):
+            changed = self.tracker.changed()
+            if not changed:
+                return
+            auto_now = [
+                field.name for field in self._meta.concrete_fields
+                if getattr(field, 'auto_now', False) and field.name not in changed
+            ]
+            kwargs['update_fields'] = [*changed, *auto_now]
+
+        super().save(*args, **kwargs)
+        # Handlers have seen the changes by now (post_save runs inside save)
+        self.tracker.set_saved(kwargs.get('update_fields'))
+
+    def _tracks_partial_save(self, args, kwargs):
+        return (
+            not args
+            and kwargs.get('update_fields') is None
+            and not kwargs.get('force_insert')
+            and not self._state.adding
+            and self.pk is not None
+            # Instances built by hand with a pk, or loaded with only the pk, save as before
+            and bool(self.tracker.saved)
+        )
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+class GuestsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'guests'
+    verbose_name = 'Guest Management'
+    
+    def ready(self):
+        # Registers the cache invalidation receivers; import errors must surface
+        import guests.signals  # noqa F401
@@ -1,10 +1,11 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 from core.models import BaseModel, Branch
+from core.tracking import FieldTrackerMixin
 
 User = get_user_model()
 
-class GuestProfile(BaseModel):
+class GuestProfile(FieldTrackerMixin, BaseModel):
     GUEST_STATUS = (
         ('new', 'New Guest'),
         ('contacted', 'Contacted'),
@@ -49,6 +50,9 @@ class GuestVisit(BaseModel):
     class Meta:
         db_table = 'guests_visits'
         ordering = ['-visit_date']
+        indexes = [
+            models.Index(fields=['updated_at'], name='guest_visit_updated_idx'),
+        ]
 
 class GuestCommunication(BaseModel):
     COMMUNICATION_TYPES = (
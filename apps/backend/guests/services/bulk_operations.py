@@ -2,6 +2,7 @@ import logging
 from celery import shared_task
 from django.db.models import Q
 from django.template import Template, Context
+from core.backpressure import BackpressureController
 from .communication_service import GuestCommunicationService
 from ..models import GuestProfile
 
@@ -97,12 +98,25 @@ def bulk_sms_reminder(guest_ids, message_template, sent_by_id):
         sent_by = User.objects.get(id=sent_by_id)
         service = BulkOperationsService()
         
-        results = service.send_bulk_communications(
-            guest_ids=guest_ids,
-            communication_type='sms',
-            template=message_template,
-            sent_by=sent_by
-        )
+        results = {
+            'total': len(guest_ids),
+            'successful': 0,
+            'failed': 0,
+            'errors': []
+        }
+        
+        # Send in load-sized chunks so reminders back off when the system is busy
+        controller = BackpressureController('bulk_sms_reminder', channel_type='sms')
+        for chunk, _ in controller.iter_sequence(guest_ids):
+            chunk_results = service.send_bulk_communications(
+                guest_ids=chunk,
+                communication_type='sms',
+                template=message_template,
+                sent_by=sent_by
+            )
+            results['successful'] += chunk_results['successful']
+            results['failed'] += chunk_results['failed']
+            results['errors'].extend(chunk_results['errors'])
         
         logger.info(f"Bulk SMS completed: {results['successful']} successful, {results['failed']} failed")
         return results
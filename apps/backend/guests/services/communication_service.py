@@ -1,8 +1,10 @@
 import logging
 from django.conf import settings
 from django.template import Template, Context
+from core.backpressure import record_provider_result
 from apps.integrations.services import EmailService, SMSService, WhatsAppService
 from apps.communications.services import InAppNotificationService
+from communications.services.contact_point_service import ContactPointService
 
 logger = logging.getLogger(__name__)
 
@@ -35,6 +37,9 @@ class GuestCommunicationService:
             elif communication_type == 'in_app' and guest.prefers_in_app:
                 communication = self._send_in_app(guest, rendered_content, context_data.get('subject', ''))
             
+            if communication is not None:
+                self._record_provider_outcome(communication_type, communication)
+            
             # Log communication in database
             if communication:
                 from ..models import GuestCommunication
@@ -54,6 +59,14 @@ class GuestCommunicationService:
             logger.error(f"Failed to send {communication_type} to guest {guest.id}: {str(e)}")
             return False
     
+    def _record_provider_outcome(self, communication_type, result):
+        """Feed provider error rates to the bulk-task backpressure controller"""
+        try:
+            success = bool(result.get('success')) if isinstance(result, dict) else bool(result)
+            record_provider_result(communication_type, success)
+        except Exception as e:
+            logger.debug(f"Could not record provider result for {communication_type}: {str(e)}")
+    
     def _send_email(self, guest, content, subject):
         return self.email_service.send_email(
             to_email=guest.user.email,
@@ -62,18 +75,24 @@ class GuestCommunicationService:
             context={'guest': guest}
         )
     
+    def _phone_address(self, guest, channel_type):
+        """The guest's normalized number for a channel, from their contact points"""
+        return ContactPointService.get_primary_addresses([guest.user], channel_type).get(guest.user.pk, '')
+    
     def _send_sms(self, guest, content):
-        if guest.user.phone_number:
+        to_phone = self._phone_address(guest, 'sms')
+        if to_phone:
             return self.sms_service.send_sms(
-                to_phone=guest.user.phone_number,
+                to_phone=to_phone,
                 message=content
             )
         return None
     
     def _send_whatsapp(self, guest, content):
-        if guest.user.phone_number:
+        to_phone = self._phone_address(guest, 'whatsapp')
+        if to_phone:
             return self.whatsapp_service.send_message(
-                to_phone=guest.user.phone_number,
+                to_phone=to_phone,
                 message=content
             )
         return None
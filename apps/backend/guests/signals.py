@@ -0,0 +1,27 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from core.result_cache import bump_version
+from core.tracking import changed_any
+from .models import GuestProfile, GuestVisit, GuestCommunication, FollowUpTask
+
+# Columns shown in the cached guest responses and stats; saves that touch
+# nothing else (such as timestamps) leave them valid
+GUEST_RESPONSE_FIELDS = [
+    'user', 'branch', 'source', 'first_visit_date', 'last_visit_date', 'total_visits', 'status',
+    'follow_up_agent', 'prefers_email', 'prefers_sms', 'prefers_whatsapp', 'prefers_in_app',
+    'interested_salvation', 'interested_baptism', 'interested_membership', 'interested_volunteering',
+]
+
+@receiver([post_save, post_delete], sender=GuestProfile)
+@receiver([post_save, post_delete], sender=GuestVisit)
+def invalidate_guest_responses(sender, instance, **kwargs):
+    """Drop cached guest API responses for the record's branch"""
+    if kwargs['signal'] is post_save and not changed_any(instance, GUEST_RESPONSE_FIELDS):
+        return
+    bump_version('guests', instance.branch_id)
+
+@receiver([post_save, post_delete], sender=GuestCommunication)
+@receiver([post_save, post_delete], sender=FollowUpTask)
+def invalidate_guest_activity(sender, instance, **kwargs):
+    branch_id = GuestProfile.objects.filter(pk=instance.guest_id).values_list('branch_id', flat=True).first()
+    bump_version('guests', branch_id)
@@ -5,6 +5,7 @@ from django.db import transaction
 from django.utils import timezone
 from django.db.models import Count, Q, F
 from datetime import timedelta
+from core.http_cache import ResponseCacheMixin
 from apps.authentication.models import User
 from apps.churches.models import Branch
 from .models import GuestProfile, GuestVisit, GuestCommunication, FollowUpTask
@@ -14,8 +15,9 @@ from .serializers import (
 )
 from .services.workflow_engine import process_new_guest_registration
 
-class GuestProfileViewSet(viewsets.ModelViewSet):
+class GuestProfileViewSet(ResponseCacheMixin, viewsets.ModelViewSet):
     serializer_class = GuestProfileSerializer
+    cache_namespace = 'guests'
     queryset = GuestProfile.objects.select_related('user', 'branch', 'follow_up_agent').all()
     
     def get_queryset(self):
@@ -219,16 +221,21 @@ class GuestProfileViewSet(viewsets.ModelViewSet):
         
         return Response(list(trends))
 
-class GuestVisitViewSet(viewsets.ModelViewSet):
+class GuestVisitViewSet(ResponseCacheMixin, viewsets.ModelViewSet):
     serializer_class = GuestVisitSerializer
+    cache_namespace = 'guests'
+    cache_scope = 'role'
     queryset = GuestVisit.objects.select_related('guest', 'branch', 'checked_in_by').all()
 
-class GuestCommunicationViewSet(viewsets.ModelViewSet):
+class GuestCommunicationViewSet(ResponseCacheMixin, viewsets.ModelViewSet):
     serializer_class = GuestCommunicationSerializer
+    cache_namespace = 'guests'
+    cache_scope = 'role'
     queryset = GuestCommunication.objects.select_related('guest', 'sent_by').all()
 
-class FollowUpTaskViewSet(viewsets.ModelViewSet):
+class FollowUpTaskViewSet(ResponseCacheMixin, viewsets.ModelViewSet):
     serializer_class = FollowUpTaskSerializer
+    cache_namespace = 'guests'
     queryset = FollowUpTask.objects.select_related('guest', 'assigned_to').all()
     
     def get_queryset(self):
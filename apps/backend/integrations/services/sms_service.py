@@ -15,11 +15,12 @@ class SMSService:
     
     def send_sms(self, to_phone: str, message: str, from_phone: str = None) -> dict:
         """
-        Send SMS using Twilio
+        Send SMS using Twilio. `to_phone` is an E.164 address resolved by
+        ContactPointService, which is '' for numbers that cannot be normalized.
         Returns: { 'success': bool, 'message_id': str, 'error': str }
         """
         try:
-            if not self._validate_phone_number(to_phone):
+            if not to_phone:
                 return {'success': False, 'error': 'Invalid phone number format'}
             
             from_phone = from_phone or self.phone_number
@@ -46,12 +47,6 @@ class SMSService:
             logger.error(f"Unexpected SMS error for {to_phone}: {str(e)}")
             return {'success': False, 'error': 'Failed to send SMS'}
     
-    def _validate_phone_number(self, phone: str) -> bool:
-        """Basic phone number validation"""
-        # Remove any non-digit characters except +
-        cleaned = ''.join(c for c in phone if c.isdigit() or c == '+')
-        return len(cleaned) >= 10 and len(cleaned) <= 15
-    
     def get_message_status(self, message_sid: str) -> dict:
         """Check delivery status of a sent message"""
         try:
@@ -14,15 +14,20 @@ class WhatsAppService:
     
     def send_message(self, to_phone: str, message: str, message_type: str = "text") -> dict:
         """
-        Send WhatsApp message using Facebook Graph API
+        Send WhatsApp message using Facebook Graph API. `to_phone` is an E.164
+        address resolved by ContactPointService, which is '' for numbers that
+        cannot be normalized.
         Returns: { 'success': bool, 'message_id': str, 'error': str }
         """
         try:
             if not self.access_token or not self.phone_number_id:
                 return {'success': False, 'error': 'WhatsApp service not configured'}
             
-            # Format phone number (remove + and any spaces)
-            formatted_phone = to_phone.replace('+', '').replace(' ', '')
+            if not to_phone:
+                return {'success': False, 'error': 'Invalid phone number format'}
+            
+            # The Graph API takes the number without the leading +
+            formatted_phone = to_phone.lstrip('+')
             
             headers = {
                 'Authorization': f'Bearer {self.access_token}',
@@ -74,9 +79,12 @@ class WhatsAppService:
             return {'success': False, 'error': 'Failed to send WhatsApp message'}
     
     def send_template_message(self, to_phone: str, template_name: str, parameters: list = None) -> dict:
-        """Send a predefined WhatsApp template message"""
+        """Send a predefined WhatsApp template message to an E.164 address"""
         try:
-            formatted_phone = to_phone.replace('+', '').replace(' ', '')
+            if not to_phone:
+                return {'success': False, 'error': 'Invalid phone number format'}
+            
+            formatted_phone = to_phone.lstrip('+')
             
             headers = {
                 'Authorization': f'Bearer {self.access_token}',
@@ -0,0 +1,335 @@
+"""
+Sharded, resumable runner for member maintenance commands.
+
+Commands such as sync_member_engagement and check_inactive_members describe
+their work as a MemberBatchJob: the members to visit and what to do with a
+page of them. The runner then:
+
+- splits the members into shards, one per branch or one per id range, and
+  runs the shards in a process pool
+- walks each shard with keyset pagination (pk > last pk, ordered by pk), so
+  every page costs the same and rows are neither skipped nor repeated while
+  members are added or removed mid-run
+- paces pages with the BackpressureController, so parallel maintenance
+  still yields to interactive traffic
+- checkpoints each shard's last pk in BatchJobState after every page, in
+  the same transaction as the page's writes, so an interrupted run resumes
+  where it stopped (`--resume`)
+- reports members processed and throughput per shard and for the run
+"""
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import date
+
+from django.db import connections, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from core.backpressure import BackpressureController
+from core.result_cache import bump_version
+from .models import BatchJobState, Member, MemberEngagement
+from .services import EngagementCalculator
+
+logger = logging.getLogger(__name__)
+
+SHARD_BY_CHOICES = ('branch', 'range')
+
+
+@dataclass
+class PageResult:
+    """Outcome of processing one page of members"""
+    processed: int = 0
+    failed: int = 0
+    lines: list = field(default_factory=list)
+
+
+class MemberBatchJob:
+    """
+    A unit of member maintenance work. Subclasses set `name`, and implement
+    get_queryset() and process_page(). `options` must be JSON serializable:
+    they are stored with the checkpoints and sent to the worker processes.
+    """
+    name = None
+
+    def __init__(self, options=None):
+        self.options = options or {}
+
+    def get_queryset(self):
+        raise NotImplementedError
+
+    def process_page(self, member_ids):
+        """Process a page of member pks and return a PageResult"""
+        raise NotImplementedError
+
+    def finish(self, totals):
+        """Called once in the parent process after every shard has finished"""
+
+
+class SyncEngagementJob(MemberBatchJob):
+    """Recalculate engagement scores for active members"""
+    name = 'sync_member_engagement'
+
+    def get_queryset(self):
+        members = Member.objects.filter(membership_status='active')
+        if self.options.get('members'):
+            members = members.filter(id__in=self.options['members'])
+        if self.options.get('branch'):
+            members = members.filter(branch_id=self.options['branch'])
+        return members
+
+    def process_page(self, member_ids):
+        scores = EngagementCalculator().calculate_engagement_scores_bulk(member_ids)
+        return PageResult(processed=len(scores), failed=len(member_ids) - len(scores))
+
+    def finish(self, totals):
+        # Scores are written with bulk_update, which sends no signals
+        if totals['processed']:
+            bump_version('members')
+
+
+class InactiveMembersJob(MemberBatchJob):
+    """Flag active members without attendance since `cutoff_date` as inactive"""
+    name = 'check_inactive_members'
+
+    def get_queryset(self):
+        return Member.objects.filter(
+            membership_status='active',
+            engagement__last_attendance_date__lt=date.fromisoformat(self.options['cutoff_date'])
+        )
+
+    def process_page(self, member_ids):
+        today = timezone.now().date()
+        dry_run = self.options.get('dry_run', False)
+        members = Member.objects.filter(pk__in=member_ids).select_related('engagement', 'user', 'relationship_manager')
+
+        result = PageResult()
+        flagged = []
+        for member in members:
+            try:
+                last_attendance = member.engagement.last_attendance_date
+                days_inactive = (today - last_attendance).days
+                if dry_run:
+                    result.lines.append(
+                        f"DRY RUN: Would flag member {member.member_id} "
+                        f"({member.user.get_full_name()}) as inactive. "
+                        f"Last attendance: {last_attendance} ({days_inactive} days ago)"
+                    )
+                else:
+                    flagged.append(member.pk)
+                    self._notify_relationship_manager(member, days_inactive)
+                    result.lines.append(
+                        f"Flagged member {member.member_id} as inactive ({days_inactive} days without attendance)"
+                    )
+                result.processed += 1
+            except Exception as e:
+                result.failed += 1
+                logger.error(f"Error processing inactive member {member.id}: {str(e)}")
+
+        if flagged:
+            MemberEngagement.objects.filter(member_id__in=flagged).update(engagement_tier='inactive')
+        return result
+
+    def finish(self, totals):
+        # Tiers are written with a queryset update, which sends no signals
+        if totals['processed'] and not self.options.get('dry_run'):
+            bump_version('members')
+
+    def _notify_relationship_manager(self, member, days_inactive):
+        """Notify the member's relationship manager about their inactivity"""
+        try:
+            if member.relationship_manager:
+                message = (
+                    f"Member {member.user.get_full_name()} ({member.member_id}) "
+                    f"has been inactive for {days_inactive} days. "
+                    f"Last attendance: {member.engagement.last_attendance_date}"
+                )
+                # notifications.send_notification(member.relationship_manager, 'member_inactive', message)
+                logger.info(f"Sent inactivity notification for member {member.member_id}")
+        except Exception as e:
+            logger.error(f"Error sending inactivity notification: {str(e)}")
+
+
+JOBS = {job.name: job for job in (SyncEngagementJob, InactiveMembersJob)}
+
+
+def plan_shards(queryset, shard_by, shard_count):
+    """
+    Shard descriptors for a queryset: {'key', 'branch'} per branch, or
+    {'key', 'min_id', 'max_id'} for `shard_count` equal id ranges.
+    """
+    if shard_by == 'branch':
+        branch_ids = queryset.order_by('branch_id').values_list('branch_id', flat=True).distinct()
+        return [{'key': f"branch:{branch_id}", 'branch': branch_id} for branch_id in branch_ids]
+
+    bounds = queryset.aggregate(low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is None:
+        return []
+    span = bounds['high'] - bounds['low'] + 1
+    step = -(-span // max(shard_count, 1))
+    shards = []
+    for low in range(bounds['low'], bounds['high'] + 1, step):
+        high = min(low + step - 1, bounds['high'])
+        shards.append({'key': f"range:{low}-{high}", 'min_id': low, 'max_id': high})
+    return shards
+
+
+def _checkpoint_name(job_name, shard_key):
+    return f"{job_name}:{shard_key}"
+
+
+def run_shard(job_name, options, shard, batch_size):
+    """
+    Process one shard from its checkpoint to the end. Runs in a worker
+    process; returns the shard's totals.
+    """
+    job = JOBS[job_name](options)
+    members = job.get_queryset()
+    if 'branch' in shard:
+        members = members.filter(branch_id=shard['branch'])
+    else:
+        members = members.filter(pk__gte=shard['min_id'], pk__lte=shard['max_id'])
+
+    state, _ = BatchJobState.objects.get_or_create(name=_checkpoint_name(job_name, shard['key']))
+    progress = {'last_id': None, 'processed': 0, 'failed': 0, 'seconds': 0.0, 'done': False, **state.last_run_stats}
+    lines = []
+    controller = BackpressureController(job_name, chunk_size=batch_size)
+    started = time.monotonic() - progress['seconds']
+
+    while not progress['done']:
+        pace = controller.wait_for_capacity()
+        page = members.order_by('pk')
+        if progress['last_id'] is not None:
+            page = page.filter(pk__gt=progress['last_id'])
+        member_ids = list(page.values_list('pk', flat=True)[:pace.chunk_size])
+
+        if not member_ids:
+            progress['done'] = True
+            result = PageResult()
+        else:
+            try:
+                with transaction.atomic():
+                    result = job.process_page(member_ids)
+                    checkpoint = {
+                        **progress, 'last_id': member_ids[-1],
+                        'processed': progress['processed'] + result.processed,
+                        'failed': progress['failed'] + result.failed,
+                    }
+                    _save_progress(state, checkpoint, started)
+            except Exception as e:
+                # The page rolled back; count it as failed and move past it
+                logger.error(f"{job_name} {shard['key']}: page after {progress['last_id']} failed: {str(e)}")
+                result = PageResult(failed=len(member_ids))
+                checkpoint = {**progress, 'last_id': member_ids[-1], 'failed': progress['failed'] + result.failed}
+            progress = checkpoint
+        lines.extend(result.lines)
+
+        if progress['done']:
+            _save_progress(state, progress, started)
+        elif member_ids:
+            logger.info(
+                f"{job_name} {shard['key']}: {progress['processed']} members "
+                f"({_rate(progress['processed'], time.monotonic() - started):.1f}/s)"
+            )
+
+    return {'key': shard['key'], 'lines': lines, **progress}
+
+
+def _save_progress(state, progress, started):
+    progress['seconds'] = round(time.monotonic() - started, 2)
+    state.last_run_stats = dict(progress)
+    state.last_run_at = timezone.now()
+    state.save()
+
+
+def _rate(count, seconds):
+    return count / seconds if seconds > 0 else 0.0
+
+
+class MemberBatchRunner:
+    """
+    Runs a MemberBatchJob across shards.
+
+    Usage:
+        runner = MemberBatchRunner(SyncEngagementJob({'branch': 3}), workers=4)
+        totals = runner.run(report=print)
+    """
+
+    def __init__(self, job, batch_size=100, workers=1, shard_by='branch', resume=False):
+        if shard_by not in SHARD_BY_CHOICES:
+            raise ValueError(f"shard_by must be one of {', '.join(SHARD_BY_CHOICES)}")
+        self.job = job
+        self.batch_size = batch_size
+        self.workers = max(workers, 1)
+        self.shard_by = shard_by
+        self.resume = resume
+
+    def prepare(self):
+        """
+        The shards for this run. Resuming an unfinished run reuses its shards
+        and options; otherwise a new plan is made and old checkpoints cleared.
+        """
+        state, _ = BatchJobState.objects.get_or_create(name=self.job.name)
+        plan = state.last_run_stats
+        if self.resume and plan.get('shards') is not None and not plan.get('complete'):
+            self.job.options = plan['options']
+            logger.info(f"{self.job.name}: resuming run started {state.watermark}")
+            return plan['shards']
+        if self.resume:
+            logger.info(f"{self.job.name}: no unfinished run to resume, starting over")
+
+        shards = plan_shards(self.job.get_queryset(), self.shard_by, self.workers)
+        BatchJobState.objects.filter(name__startswith=f"{self.job.name}:").delete()
+        state.last_run_stats = {
+            'options': self.job.options, 'shard_by': self.shard_by, 'shards': shards, 'complete': False,
+        }
+        state.watermark = timezone.now()
+        state.save()
+        return shards
+
+    def run(self, report=None):
+        """
+        Process every shard and return the run's totals. `report` is called
+        with a line of text per shard finished and per line a job emits.
+        """
+        report = report or logger.info
+        shards = self.prepare()
+        started = time.monotonic()
+        totals = {'processed': 0, 'failed': 0, 'shards': len(shards)}
+
+        for result in self._run_shards(shards):
+            for line in result['lines']:
+                report(line)
+            totals['processed'] += result['processed']
+            totals['failed'] += result['failed']
+            report(
+                f"Shard {result['key']}: {result['processed']} processed, {result['failed']} failed "
+                f"in {result['seconds']:.1f}s ({_rate(result['processed'], result['seconds']):.1f}/s)"
+            )
+
+        totals['seconds'] = round(time.monotonic() - started, 2)
+        totals['rate'] = round(_rate(totals['processed'], totals['seconds']), 1)
+        self.job.finish(totals)
+
+        state = BatchJobState.objects.get(name=self.job.name)
+        state.last_run_stats = {**state.last_run_stats, 'complete': True, 'totals': totals}
+        state.last_run_at = timezone.now()
+        state.save()
+        return totals
+
+    def _run_shards(self, shards):
+        args = [(self.job.name, self.job.options, shard, self.batch_size) for shard in shards]
+        if self.workers == 1 or len(shards) <= 1:
+            for shard_args in args:
+                yield run_shard(*shard_args)
+            return
+
+        # Forked workers must not share the parent's database connections
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(shards)), mp_context=context) as pool:
+            futures = [pool.submit(run_shard, *shard_args) for shard_args in args]
+            for future in as_completed(futures):
+                yield future.result()
@@ -0,0 +1,236 @@
+"""
+Engagement feature pipeline.
+
+Derives the MemberEngagement inputs that engagement scores are built from,
+instead of relying on hand-written sync calls:
+
+- attendance (last_attendance_date, attendance_streak, monthly_attendance_rate)
+  from the visits recorded against the member's guest profile; this
+  pipeline is the only writer of these fields
+- communication (communication_response_rate, last_communication) from
+  messages sent to the member, announcement receipts and inbound messages
+
+Each chunk of members is computed with a handful of aggregate queries,
+the attendance streak with window functions, and written back with
+bulk_update. Incremental runs only recompute members with events since
+the watermark stored in BatchJobState; a full run recomputes everyone so
+rolling windows (the last four weeks, the last 90 days) decay for members
+who have gone quiet.
+"""
+import logging
+from datetime import timedelta
+
+from django.db import connection
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from communications.models import AnnouncementReceipt, Message
+from core.backpressure import BackpressureController
+from core.result_cache import bump_version
+from guests.models import GuestProfile, GuestVisit
+from .models import BatchJobState, Member, MemberEngagement
+from .services import EngagementCalculator
+
+logger = logging.getLogger(__name__)
+
+JOB_NAME = 'engagement_features'
+
+ATTENDANCE_WEEKS = 4
+RESPONSE_WINDOW_DAYS = 90
+BULK_UPDATE_BATCH_SIZE = 1000
+
+# Statuses of messages that actually reached the member
+DELIVERED_STATUSES = ['sent', 'delivered', 'read']
+
+FEATURE_FIELDS = [
+    'last_attendance_date', 'attendance_streak', 'monthly_attendance_rate',
+    'communication_response_rate', 'last_communication', 'updated_at',
+]
+
+# Per member: last visit, distinct weeks attended recently, and the run of
+# consecutive attended weeks ending at their latest one. Consecutive weeks
+# share week - 7 * row_number, so each run is one GROUP BY island.
+ATTENDANCE_SQL = """
+WITH visits AS (
+    SELECT m.id AS member_id, v.visit_date
+    FROM {member_table} m
+    JOIN {guest_table} g ON g.user_id = m.user_id
+    JOIN {visit_table} v ON v.guest_id = g.id
+    WHERE m.id = ANY(%(member_ids)s) AND v.visit_date <= %(today)s
+),
+weeks AS (
+    SELECT DISTINCT member_id, date_trunc('week', visit_date)::date AS week
+    FROM visits
+),
+runs AS (
+    SELECT member_id, MAX(week) AS last_week, COUNT(*) AS weeks
+    FROM (
+        SELECT member_id, week,
+               week - 7 * (ROW_NUMBER() OVER (PARTITION BY member_id ORDER BY week))::int AS island
+        FROM weeks
+    ) numbered
+    GROUP BY member_id, island
+),
+latest_runs AS (
+    SELECT DISTINCT ON (member_id) member_id, last_week, weeks
+    FROM runs
+    ORDER BY member_id, last_week DESC
+)
+SELECT v.member_id,
+       MAX(v.visit_date),
+       COUNT(DISTINCT date_trunc('week', v.visit_date)) FILTER (WHERE v.visit_date > %(recent_since)s),
+       r.last_week,
+       r.weeks
+FROM visits v
+JOIN latest_runs r ON r.member_id = v.member_id
+GROUP BY v.member_id, r.last_week, r.weeks
+"""
+
+
+class EngagementFeaturePipeline:
+    """Computes engagement inputs for members from source tables"""
+
+    def run(self, full=False):
+        """
+        Refresh features for members with new events since the last run, or
+        for every active member when `full` is set (or on the first run).
+        Returns the number of members updated.
+        """
+        state, _ = BatchJobState.objects.get_or_create(name=JOB_NAME)
+        # Events landing while this run is in progress are picked up again next time
+        started_at = timezone.now()
+        since = None if full else state.watermark
+
+        members = Member.objects.filter(membership_status='active')
+        if since is not None:
+            members = members.filter(user_id__in=self.changed_user_ids(since))
+
+        updated = 0
+        controller = BackpressureController('refresh_engagement_features')
+        for chunk, _ in controller.iter_queryset(members.only('pk', 'user_id')):
+            updated += self.refresh(chunk, started_at)
+
+        # bulk_update sends no signals; drop cached reports and member lists once
+        if updated:
+            bump_version('members')
+
+        state.watermark = started_at
+        state.last_run_at = timezone.now()
+        state.last_run_stats = {
+            'full': since is None,
+            'members_updated': updated,
+            'seconds': round((state.last_run_at - started_at).total_seconds(), 1),
+        }
+        state.save()
+
+        logger.info(f"Engagement features refreshed for {updated} members ({'full' if since is None else 'incremental'})")
+        return updated
+
+    def changed_user_ids(self, since):
+        """
+        Users with attendance or communication events since the watermark.
+        Each event is found with its own indexed range query rather than one
+        OR across columns, which would scan the tables. Clicks without an
+        open set no timestamp, so they are picked up by the nightly full run.
+        """
+        event_queries = [
+            # Delivered: sent_at uses the (status, sent_at) index
+            Message.objects.filter(status__in=DELIVERED_STATUSES, sent_at__gte=since, to_user__isnull=False)
+            .values_list('to_user_id', flat=True),
+            Message.objects.filter(read_at__gte=since, to_user__isnull=False).values_list('to_user_id', flat=True),
+            Message.objects.filter(message_type='inbound', created_at__gte=since).values_list('from_user_id', flat=True),
+            AnnouncementReceipt.objects.filter(read_at__gte=since).values_list('user_id', flat=True),
+            # updated_at is set on creation too
+            GuestVisit.objects.filter(updated_at__gte=since).values_list('guest__user_id', flat=True),
+        ]
+        user_ids = set()
+        for query in event_queries:
+            user_ids.update(query.order_by())
+        user_ids.discard(None)
+        return user_ids
+
+    def refresh(self, members, now):
+        """Compute and store features for a chunk of members, then rescore them"""
+        member_ids = [member.pk for member in members]
+        user_to_member = {member.user_id: member.pk for member in members}
+
+        existing = set(MemberEngagement.objects.filter(member_id__in=member_ids).values_list('member_id', flat=True))
+        MemberEngagement.objects.bulk_create(
+            [MemberEngagement(member_id=member_id) for member_id in member_ids if member_id not in existing],
+            ignore_conflicts=True
+        )
+
+        attendance = self.attendance_features(member_ids, timezone.localdate(now))
+        communication = self.communication_features(user_to_member, now)
+
+        engagements = list(MemberEngagement.objects.filter(member_id__in=member_ids))
+        for engagement in engagements:
+            last_date, streak, rate = attendance.get(engagement.member_id, (None, 0, 0.0))
+            response_rate, last_communication = communication.get(engagement.member_id, (0.0, None))
+            engagement.last_attendance_date = last_date
+            engagement.attendance_streak = streak
+            engagement.monthly_attendance_rate = rate
+            engagement.communication_response_rate = response_rate
+            engagement.last_communication = last_communication
+            engagement.updated_at = now
+        MemberEngagement.objects.bulk_update(engagements, FEATURE_FIELDS, batch_size=BULK_UPDATE_BATCH_SIZE)
+
+        EngagementCalculator().calculate_engagement_scores_bulk(member_ids)
+        return len(engagements)
+
+    def attendance_features(self, member_ids, today):
+        """{member_id: (last_attendance_date, attendance_streak, monthly_attendance_rate)}"""
+        sql = ATTENDANCE_SQL.format(
+            member_table=Member._meta.db_table,
+            guest_table=GuestProfile._meta.db_table,
+            visit_table=GuestVisit._meta.db_table,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, {
+                'member_ids': member_ids,
+                'today': today,
+                'recent_since': today - timedelta(weeks=ATTENDANCE_WEEKS),
+            })
+            rows = cursor.fetchall()
+
+        # A streak is only current if it reaches this week or last week
+        this_week = today - timedelta(days=today.weekday())
+        features = {}
+        for member_id, last_date, recent_weeks, last_week, weeks in rows:
+            streak = weeks if last_week >= this_week - timedelta(weeks=1) else 0
+            rate = min(recent_weeks / ATTENDANCE_WEEKS * 100, 100.0)
+            features[member_id] = (last_date, streak, round(rate, 2))
+        return features
+
+    def communication_features(self, user_to_member, now):
+        """{member_id: (communication_response_rate, last_communication)}"""
+        user_ids = list(user_to_member)
+        window_start = now - timedelta(days=RESPONSE_WINDOW_DAYS)
+
+        received = Message.objects.filter(
+            to_user_id__in=user_ids, status__in=DELIVERED_STATUSES, sent_at__gte=window_start
+        ).order_by().values('to_user_id').annotate(
+            delivered=Count('id'),
+            responded=Count('id', filter=Q(read_at__isnull=False) | Q(open_count__gt=0) | Q(click_count__gt=0)),
+            last_read=Max('read_at'),
+        )
+        announcements_read = dict(
+            AnnouncementReceipt.objects.filter(user_id__in=user_ids)
+            .order_by().values('user_id').annotate(last_read=Max('read_at')).values_list('user_id', 'last_read')
+        )
+        last_replied = dict(
+            Message.objects.filter(from_user_id__in=user_ids, message_type='inbound')
+            .order_by().values('from_user_id').annotate(last=Max('created_at')).values_list('from_user_id', 'last')
+        )
+
+        rates = {}
+        last_read = {}
+        for row in received:
+            rates[row['to_user_id']] = round(row['responded'] / row['delivered'] * 100, 2)
+            last_read[row['to_user_id']] = row['last_read']
+
+        features = {}
+        for user_id, member_id in user_to_member.items():
+            touches = [t for t in (last_read.get(user_id), announcements_read.get(user_id), last_replied.get(user_id)) if t]
+            features[member_id] = (rates.get(user_id, 0.0), max(touches) if touches else None)
+        return features
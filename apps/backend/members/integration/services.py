@@ -1,8 +1,8 @@
 from django.utils import timezone
 from django.db import transaction
 import logging
-from members.models import Member, MemberEngagement
-from members.services import MemberService, EngagementCalculator
+from members.models import Member
+from members.services import MemberService
 
 logger = logging.getLogger(__name__)
 
@@ -185,22 +185,21 @@ class GuestManagementIntegrationService:
             logger.error(f"Error fetching guest history for member {member_id}: {str(e)}")
             return None
     
-    def sync_member_attendance(self, member_id, attendance_data):
+    def sync_member_attendance(self, member_id, attendance_data=None):
         """
-        Sync attendance data from guest system to member engagement
+        Sync attendance data from guest system to member engagement.
+        
+        Attendance features are derived from recorded guest visits by the
+        EngagementFeaturePipeline, which is their only source of truth. This
+        refreshes the member from those visits now instead of storing the
+        figures passed in, which the next hourly run would overwrite anyway.
+        `attendance_data` is accepted for compatibility and ignored.
         """
+        from members.feature_pipeline import EngagementFeaturePipeline
+        
         try:
             member = Member.objects.get(id=member_id)
-            engagement, created = MemberEngagement.objects.get_or_create(member=member)
-            
-            # Update attendance metrics
-            engagement.last_attendance_date = attendance_data.get('last_attendance_date')
-            engagement.attendance_streak = attendance_data.get('attendance_streak', 0)
-            engagement.monthly_attendance_rate = attendance_data.get('monthly_attendance_rate', 0)
-            
-            # Recalculate engagement score
-            calculator = EngagementCalculator()
-            calculator.calculate_engagement_score(member)
+            EngagementFeaturePipeline().refresh([member], timezone.now())
             
             logger.info(f"Synced attendance data for member {member.member_id}")
             
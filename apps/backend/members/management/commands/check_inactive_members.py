@@ -1,8 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from datetime import timedelta
-from members.models import Member, MemberEngagement
-from members.integration.services import CmasIntegrationService
+from members.batch_runner import InactiveMembersJob, MemberBatchRunner, SHARD_BY_CHOICES
 import logging
 
 logger = logging.getLogger(__name__)
@@ -22,6 +21,29 @@ class Command(BaseCommand):
             action='store_true',
             help='Show what would be done without making changes'
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Number of members to process in each batch (adjusted to load)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of worker processes to run shards in'
+        )
+        parser.add_argument(
+            '--shard-by',
+            choices=SHARD_BY_CHOICES,
+            default='branch',
+            help='Split the work by branch or into equal member id ranges'
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Continue an interrupted run from its checkpoints, with its original options'
+        )
 
     def handle(self, *args, **options):
         inactivity_days = options['inactivity_days']
@@ -29,61 +51,28 @@ class Command(BaseCommand):
         
         cutoff_date = timezone.now().date() - timedelta(days=inactivity_days)
         
-        # Find active members with no recent attendance
-        inactive_members = Member.objects.filter(
-            membership_status='active',
-            engagement__last_attendance_date__lt=cutoff_date
-        ).select_related('engagement')
-        
-        self.stdout.write(f"Found {inactive_members.count()} potentially inactive members")
+        # Find active members with no recent attendance. The cutoff is part of
+        # the job options, so a resumed run keeps the date it started with.
+        job = InactiveMembersJob({
+            'cutoff_date': cutoff_date.isoformat(),
+            'dry_run': dry_run,
+        })
+        runner = MemberBatchRunner(
+            job,
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            shard_by=options['shard_by'],
+            resume=options['resume'],
+        )
         
-        for member in inactive_members:
-            try:
-                days_inactive = (timezone.now().date() - member.engagement.last_attendance_date).days
-                
-                if dry_run:
-                    self.stdout.write(
-                        f"DRY RUN: Would flag member {member.member_id} "
-                        f"({member.user.get_full_name()}) as inactive. "
-                        f"Last attendance: {member.engagement.last_attendance_date} "
-                        f"({days_inactive} days ago)"
-                    )
-                else:
-                    # Update engagement tier
-                    member.engagement.engagement_tier = 'inactive'
-                    member.engagement.save()
-                    
-                    # Notify relationship manager
-                    self._notify_relationship_manager(member, days_inactive)
-                    
-                    self.stdout.write(
-                        f"Flagged member {member.member_id} as inactive "
-                        f"({days_inactive} days without attendance)"
-                    )
-                    
-            except Exception as e:
-                self.stderr.write(f"Error processing member {member.id}: {str(e)}")
-                logger.error(f"Error processing inactive member {member.id}: {str(e)}")
+        totals = runner.run(report=self.stdout.write)
         
+        if totals['failed']:
+            self.stderr.write(f"Failed to process {totals['failed']} inactive members")
         if not dry_run:
             self.stdout.write(
                 self.style.SUCCESS(
-                    f"Successfully processed {inactive_members.count()} inactive members"
+                    f"Successfully processed {totals['processed']} inactive members "
+                    f"in {totals['seconds']:.1f}s ({totals['rate']} members/s)"
                 )
             )
-
-    def _notify_relationship_manager(self, member, days_inactive):
-        """
-        Notify relationship manager about inactive member
-        """
-        try:
-            if member.relationship_manager:
-                message = (
-                    f"Member {member.user.get_full_name()} ({member.member_id}) "
-                    f"has been inactive for {days_inactive} days. "
-                    f"Last attendance: {member.engagement.last_attendance_date}"
-                )
-                # notifications.send_notification(member.relationship_manager, 'member_inactive', message)
-                logger.info(f"Sent inactivity notification for member {member.member_id}")
-        except Exception as e:
-            logger.error(f"Error sending inactivity notification: {str(e)}")
@@ -1,7 +1,5 @@
 from django.core.management.base import BaseCommand
-from django.utils import timezone
-from members.services import EngagementCalculator
-from members.models import Member
+from members.batch_runner import MemberBatchRunner, SHARD_BY_CHOICES, SyncEngagementJob
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,7 +12,7 @@ class Command(BaseCommand):
             '--batch-size',
             type=int,
             default=100,
-            help='Number of members to process in each batch'
+            help='Number of members to process in each batch (adjusted to load)'
         )
         parser.add_argument(
             '--members',
@@ -27,43 +25,45 @@ class Command(BaseCommand):
             type=int,
             help='Process members from specific branch only'
         )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of worker processes to run shards in'
+        )
+        parser.add_argument(
+            '--shard-by',
+            choices=SHARD_BY_CHOICES,
+            default='branch',
+            help='Split the work by branch or into equal member id ranges'
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Continue an interrupted run from its checkpoints, with its original options'
+        )
 
     def handle(self, *args, **options):
-        batch_size = options['batch_size']
-        specific_members = options['members']
-        branch_id = options['branch']
-        
-        calculator = EngagementCalculator()
-        
-        if specific_members:
-            members = Member.objects.filter(id__in=specific_members, membership_status='active')
-        elif branch_id:
-            members = Member.objects.filter(branch_id=branch_id, membership_status='active')
-        else:
-            members = Member.objects.filter(membership_status='active')
-        
-        total_members = members.count()
-        processed = 0
-        
-        self.stdout.write(f"Starting engagement score recalculation for {total_members} members...")
+        job = SyncEngagementJob({
+            'members': options['members'],
+            'branch': options['branch'],
+        })
+        runner = MemberBatchRunner(
+            job,
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            shard_by=options['shard_by'],
+            resume=options['resume'],
+        )
         
-        for i in range(0, total_members, batch_size):
-            batch = members[i:i + batch_size]
-            
-            for member in batch:
-                try:
-                    calculator.calculate_engagement_score(member)
-                    processed += 1
-                    
-                    if processed % 10 == 0:
-                        self.stdout.write(f"Processed {processed}/{total_members} members...")
-                        
-                except Exception as e:
-                    self.stderr.write(f"Error processing member {member.id}: {str(e)}")
-                    logger.error(f"Error processing member {member.id}: {str(e)}")
+        self.stdout.write("Starting engagement score recalculation...")
+        totals = runner.run(report=self.stdout.write)
         
+        if totals['failed']:
+            self.stderr.write(f"Failed to recalculate engagement scores for {totals['failed']} members")
         self.stdout.write(
             self.style.SUCCESS(
-                f"Successfully recalculated engagement scores for {processed}/{total_members} members"
+                f"Successfully recalculated engagement scores for {totals['processed']} members "
+                f"across {totals['shards']} shards in {totals['seconds']:.1f}s ({totals['rate']} members/s)"
             )
         )
@@ -3,6 +3,7 @@ from django.contrib.auth.models import User
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 from churches.models import Branch
+from core.tracking import FieldTrackerMixin
 
 class Family(models.Model):
     """Family unit for grouping members"""
@@ -16,7 +17,7 @@ class Family(models.Model):
     def __str__(self):
         return f"{self.family_name} ({self.family_id})"
 
-class Member(models.Model):
+class Member(FieldTrackerMixin, models.Model):
     MARITAL_STATUS = [
         ('single', 'Single'),
         ('married', 'Married'),
@@ -111,7 +112,7 @@ class Member(models.Model):
     def is_active_member(self):
         return self.membership_status == 'active'
 
-class WelfareCase(models.Model):
+class WelfareCase(FieldTrackerMixin, models.Model):
     CASE_TYPES = [
         ('financial', 'Financial Assistance'),
         ('medical', 'Medical Support'),
@@ -255,7 +256,7 @@ class MemberEngagement(models.Model):
     def __str__(self):
         return f"Engagement - {self.member.user.get_full_name()}"
 
-class MinistryParticipation(models.Model):
+class MinistryParticipation(FieldTrackerMixin, models.Model):
     """Track member involvement in ministries/departments"""
     ROLES = [
         ('member', 'Member'),
@@ -284,3 +285,17 @@ class MinistryParticipation(models.Model):
 
     def __str__(self):
         return f"{self.member.user.get_full_name()} - {self.ministry.name} ({self.role})"
+
+class BatchJobState(models.Model):
+    """Progress of an incremental batch job, such as the event watermark it has processed up to"""
+    name = models.CharField(max_length=100, unique=True)
+    watermark = models.DateTimeField(null=True, blank=True)
+    last_run_at = models.DateTimeField(null=True, blank=True)
+    last_run_stats = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'members_batch_job_state'
+
+    def __str__(self):
+        return f"{self.name} (watermark {self.watermark})"
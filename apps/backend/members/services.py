@@ -1,11 +1,28 @@
 from django.utils import timezone
+from django.db import transaction
 from django.db.models import Q, Count, Avg
 from datetime import timedelta, datetime
 import logging
-from .models import Member, MemberEngagement, WelfareCase
+import numpy as np
+from django_redis import get_redis_connection
+from core.backpressure import BackpressureController
+from core.result_cache import bump_version
+from communications.services.digest_service import NotificationDigestService
+from .models import Member, MemberEngagement, MinistryParticipation, WelfareCase
 
 logger = logging.getLogger(__name__)
 
+LEADERSHIP_ROLES = ['leader', 'coordinator', 'head']
+
+# Ministry base score by number of active ministries (3 or more score 100)
+MINISTRY_BASE_SCORES = np.array([0, 60, 80, 100])
+
+BULK_UPDATE_BATCH_SIZE = 1000
+
+MICROSECONDS_PER_DAY = 24 * 60 * 60 * 1000 * 1000
+
+ENGAGEMENT_DIRTY_KEY = 'members:engagement:dirty'
+
 class EngagementCalculator:
     """
     Service class for calculating and updating member engagement scores
@@ -83,7 +100,7 @@ class EngagementCalculator:
         # Role bonus
         leadership_roles = member.ministry_participation.filter(
             is_active=True, 
-            role__in=['leader', 'coordinator', 'head']
+            role__in=LEADERSHIP_ROLES
         ).count()
         
         role_bonus = leadership_roles * 10
@@ -131,24 +148,154 @@ class EngagementCalculator:
         else:
             return 'inactive'
     
+    def calculate_engagement_scores_bulk(self, member_ids):
+        """
+        Score many members at once with the same rules and results as
+        calculate_engagement_score, using a few grouped queries, NumPy
+        arrays and a bulk UPDATE. Returns {member_id: score}.
+        """
+        member_ids = list(member_ids)
+        
+        # Members scored for the first time get a default record, as get_or_create would
+        existing = set(MemberEngagement.objects.filter(member_id__in=member_ids).values_list('member_id', flat=True))
+        MemberEngagement.objects.bulk_create(
+            [MemberEngagement(member_id=member_id) for member_id in member_ids if member_id not in existing],
+            ignore_conflicts=True
+        )
+        
+        engagements = list(MemberEngagement.objects.filter(member_id__in=member_ids).only(
+            'id', 'member_id', 'monthly_attendance_rate', 'attendance_streak',
+            'communication_response_rate', 'last_communication', 'giving_consistency'
+        ))
+        if not engagements:
+            return {}
+        
+        ministries = {
+            row['member_id']: (row['active'], row['leaders'])
+            for row in MinistryParticipation.objects.filter(member_id__in=member_ids, is_active=True)
+            .values('member_id')
+            .annotate(active=Count('id'), leaders=Count('id', filter=Q(role__in=LEADERSHIP_ROLES)))
+        }
+        
+        scores = self._score_engagements(engagements, ministries, timezone.now())
+        tiers = np.select([scores >= 80, scores >= 50, scores >= 20], ['high', 'medium', 'low'], 'inactive')
+        
+        now = timezone.now()
+        for engagement, score, tier in zip(engagements, scores.tolist(), tiers.tolist()):
+            engagement.engagement_score = round(score, 2)
+            engagement.engagement_tier = tier
+            engagement.updated_at = now
+        MemberEngagement.objects.bulk_update(
+            engagements, ['engagement_score', 'engagement_tier', 'updated_at'], batch_size=BULK_UPDATE_BATCH_SIZE
+        )
+        
+        return {engagement.member_id: score for engagement, score in zip(engagements, scores.tolist())}
+    
+    def _score_engagements(self, engagements, ministries, now):
+        """Weighted engagement scores for a list of MemberEngagement rows"""
+        attendance_rate = np.array([e.monthly_attendance_rate or 0 for e in engagements], dtype=float)
+        streak = np.array([e.attendance_streak for e in engagements], dtype=float)
+        attendance = np.minimum(attendance_rate + np.minimum(streak * 2, 20), 100)
+        
+        counts = np.array([ministries.get(e.member_id, (0, 0)) for e in engagements], dtype=np.int64).reshape(-1, 2)
+        ministry = np.minimum(MINISTRY_BASE_SCORES[np.minimum(counts[:, 0], 3)] + counts[:, 1] * 10, 100)
+        
+        # Whole days since the last communication, floored like timedelta.days
+        communicated = np.array([e.last_communication is not None for e in engagements])
+        elapsed_us = np.array([
+            (now - e.last_communication) // timedelta(microseconds=1) if e.last_communication else 0
+            for e in engagements
+        ], dtype=np.int64)
+        days = elapsed_us // MICROSECONDS_PER_DAY
+        recency = np.where(communicated & (days <= 7), 20, np.where(communicated & (days <= 30), 10, 0))
+        response_rate = np.array([e.communication_response_rate or 0 for e in engagements], dtype=float)
+        communication = np.minimum(response_rate + recency, 100)
+        
+        giving = np.array([e.giving_consistency or 0 for e in engagements], dtype=float)
+        
+        return (
+            attendance * self.weights['attendance'] +
+            ministry * self.weights['ministry_participation'] +
+            communication * self.weights['communication'] +
+            giving * self.weights['giving']
+        )
+    
     def recalculate_all_engagement_scores(self):
         """
         Recalculate engagement scores for all active members
         """
-        active_members = Member.objects.filter(membership_status='active')
+        active_members = Member.objects.filter(membership_status='active').only('pk')
         updated_count = 0
         
-        for member in active_members:
+        controller = BackpressureController('recalculate_all_engagement_scores')
+        for chunk, _ in controller.iter_queryset(active_members):
             try:
-                self.calculate_engagement_score(member)
-                updated_count += 1
+                updated_count += len(self.calculate_engagement_scores_bulk([member.pk for member in chunk]))
             except Exception as e:
-                logger.error(f"Error recalculating score for {member.member_id}: {str(e)}")
+                logger.error(f"Error recalculating scores for members {chunk[0].pk}-{chunk[-1].pk}: {str(e)}")
                 continue
         
+        # bulk_update sends no signals; drop cached reports and member lists once
+        bump_version('members')
+        
         logger.info(f"Engagement scores recalculated for {updated_count} members")
         return updated_count
 
+class EngagementRecalculationQueue:
+    """
+    Debounced engagement rescoring.
+    
+    Writes that affect a member's score only add the member to a Redis set,
+    once their transaction commits. A periodic task drains the set in
+    batches through the bulk scorer, so a member edited many times between
+    drains is scored once and requests never wait on scoring.
+    """
+    
+    @staticmethod
+    def mark_dirty(member_ids):
+        member_ids = [member_id for member_id in member_ids if member_id]
+        if not member_ids:
+            return
+        
+        def add():
+            try:
+                get_redis_connection('default').sadd(ENGAGEMENT_DIRTY_KEY, *member_ids)
+            except Exception as e:
+                logger.error(f"Could not queue engagement rescoring for {len(member_ids)} members: {str(e)}")
+        
+        # Scoring before commit would read the old rows and drop the update
+        transaction.on_commit(add)
+    
+    def pending(self):
+        return get_redis_connection('default').scard(ENGAGEMENT_DIRTY_KEY)
+    
+    def drain(self, batch_size=1000, max_batches=None):
+        """Rescore queued members in batches; returns how many were scored"""
+        conn = get_redis_connection('default')
+        calculator = EngagementCalculator()
+        scored = 0
+        batches = 0
+        
+        while max_batches is None or batches < max_batches:
+            member_ids = [int(member_id) for member_id in conn.spop(ENGAGEMENT_DIRTY_KEY, batch_size) or []]
+            if not member_ids:
+                break
+            batches += 1
+            try:
+                active = list(Member.objects.filter(
+                    pk__in=member_ids, membership_status='active'
+                ).values_list('pk', flat=True))
+                scored += len(calculator.calculate_engagement_scores_bulk(active))
+            except Exception:
+                # Put the batch back for the next drain
+                conn.sadd(ENGAGEMENT_DIRTY_KEY, *member_ids)
+                raise
+        
+        if scored:
+            # bulk_update sends no signals; drop cached reports and member lists once
+            bump_version('members')
+        return scored
+
 class WelfareService:
     """
     Service class for welfare case management and automation
@@ -250,12 +397,29 @@ class WelfareService:
         """
         Notify officer about their assignment
         """
+        # Routine assignments are batched into the officer's digest; critical ones go out at once
+        NotificationDigestService().notify(
+            [officer.id], 'in_app',
+            title='New welfare case assigned',
+            message=f"You have been assigned a new welfare case: {welfare_case.title}",
+            category='welfare_assignment',
+            data={'welfare_case_id': welfare_case.id},
+            urgent=welfare_case.urgency == 'critical'
+        )
         logger.info(f"Notification: Officer {officer} assigned to case {welfare_case.title}")
     
     def _notify_escalation(self, welfare_case, reason):
         """
         Notify about case escalation
         """
+        if welfare_case.assigned_officer_id:
+            NotificationDigestService().notify(
+                [welfare_case.assigned_officer_id], 'in_app',
+                title='Welfare case escalated',
+                message=f"Welfare case '{welfare_case.title}' has been escalated: {reason}",
+                category='welfare_escalation',
+                data={'welfare_case_id': welfare_case.id}
+            )
         logger.info(f"Notification: Case {welfare_case.title} escalated - {reason}")
 
 class MemberService:
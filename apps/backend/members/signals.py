@@ -1,8 +1,30 @@
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_save, pre_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import Member, WelfareCase
-from .services import EngagementCalculator
+from core.result_cache import bump_version
+from core.tracking import changed_any
+from .models import Member, Family, WelfareCase, WelfareUpdate, MemberEngagement, MinistryParticipation
+from .services import EngagementCalculator, EngagementRecalculationQueue
+
+# Columns shown in the cached member and welfare case responses and reports;
+# saves that touch nothing else (such as timestamps) leave them valid
+MEMBER_RESPONSE_FIELDS = [
+    'user', 'member_id', 'branch', 'marital_status', 'occupation', 'education_level', 'skills',
+    'date_of_birth', 'salvation_date', 'baptism_date', 'membership_date', 'spiritual_gifts',
+    'family', 'family_role', 'welfare_category', 'special_needs', 'welfare_notes',
+    'relationship_manager', 'membership_status',
+]
+WELFARE_CASE_RESPONSE_FIELDS = [
+    'member', 'case_type', 'title', 'description', 'urgency', 'assigned_officer', 'status',
+    'resolution_notes', 'reported_date', 'target_resolution_date', 'resolved_date',
+]
+# Ministry lists are not cached; member lists and reports count active roles
+MINISTRY_SCORE_FIELDS = ['member', 'is_active', 'role']
+
+RELATED_RESPONSE_FIELDS = {
+    WelfareCase: WELFARE_CASE_RESPONSE_FIELDS,
+    MinistryParticipation: MINISTRY_SCORE_FIELDS,
+}
 
 @receiver(post_save, sender=User)
 def create_member_profile(sender, instance, created, **kwargs):
@@ -44,3 +66,51 @@ def validate_member_data(sender, instance, **kwargs):
         from django.utils import timezone
         if instance.date_of_birth > timezone.now().date():
             raise ValueError("Date of birth cannot be in the future")
+
+@receiver(post_save, sender=Member)
+def queue_member_rescore(sender, instance, created, **kwargs):
+    """Rescore members whose status changed in the background, once per drain"""
+    # Only active members are scored; no other member column feeds the score
+    if not created and changed_any(instance, ['membership_status']):
+        EngagementRecalculationQueue.mark_dirty([instance.pk])
+
+@receiver([post_save, post_delete], sender=MinistryParticipation)
+def queue_ministry_rescore(sender, instance, **kwargs):
+    """Ministry participation feeds the ministry part of the engagement score"""
+    if kwargs['signal'] is post_delete or changed_any(instance, MINISTRY_SCORE_FIELDS):
+        EngagementRecalculationQueue.mark_dirty([instance.member_id])
+
+@receiver([post_save, post_delete], sender=Member)
+def invalidate_member_reports(sender, instance, **kwargs):
+    """Drop cached engagement reports for the member's branch"""
+    if kwargs['signal'] is post_save and not changed_any(instance, MEMBER_RESPONSE_FIELDS):
+        return
+    bump_version('members', instance.branch_id)
+    # A member moving branch also leaves the old branch's lists and reports
+    previous_branch_id = instance.tracker.previous('branch')
+    if previous_branch_id and previous_branch_id != instance.branch_id:
+        bump_version('members', previous_branch_id)
+
+@receiver([post_save, post_delete], sender=MemberEngagement)
+@receiver([post_save, post_delete], sender=WelfareCase)
+@receiver([post_save, post_delete], sender=MinistryParticipation)
+def invalidate_member_reports_for_related(sender, instance, **kwargs):
+    """Engagement, welfare and ministry changes also feed the reports and member lists"""
+    if kwargs['signal'] is post_save and not changed_any(instance, RELATED_RESPONSE_FIELDS.get(sender, [])):
+        return
+    if sender._meta.get_field('member').is_cached(instance):
+        branch_id = instance.member.branch_id
+    else:
+        branch_id = Member.objects.filter(pk=instance.member_id).values_list('branch_id', flat=True).first()
+    bump_version('members', branch_id)
+
+@receiver([post_save, post_delete], sender=WelfareUpdate)
+def invalidate_welfare_case_lists(sender, instance, **kwargs):
+    """Welfare case responses include their updates"""
+    branch_id = WelfareCase.objects.filter(pk=instance.welfare_case_id).values_list('member__branch_id', flat=True).first()
+    bump_version('members', branch_id)
+
+@receiver([post_save, post_delete], sender=Family)
+def invalidate_family_members(sender, instance, **kwargs):
+    """Families can span branches, so drop every branch's member responses"""
+    bump_version('members')
@@ -3,7 +3,7 @@ from django.dispatch import receiver
 from django.utils import timezone
 from django.contrib.auth.models import User
 from members.models import Member, WelfareCase, MemberEngagement, MinistryParticipation
-from members.services import EngagementCalculator
+from members.services import EngagementRecalculationQueue
 from members.integration.services import CmasIntegrationService
 import logging
 
@@ -24,10 +24,9 @@ def handle_member_creation(sender, instance, created, **kwargs):
             cmas_service = CmasIntegrationService()
             cmas_service.sync_member_engagement_to_cmas(instance.id)
     
-    else:
-        # Member updated - recalculate engagement score
-        calculator = EngagementCalculator()
-        calculator.calculate_engagement_score(instance)
+    elif instance.tracker.has_changed('membership_status'):
+        # Only active members are scored; rescore in the background, once per drain
+        EngagementRecalculationQueue.mark_dirty([instance.pk])
 
 @receiver(post_save, sender=WelfareCase)
 def handle_welfare_case_update(sender, instance, created, **kwargs):
@@ -55,10 +54,9 @@ def handle_ministry_participation(sender, instance, created, **kwargs):
     """
     Handle ministry participation changes
     """
-    if created or instance.tracker.has_changed('is_active'):
-        # Recalculate engagement score when ministry participation changes
-        calculator = EngagementCalculator()
-        calculator.calculate_engagement_score(instance.member)
+    if created or instance.tracker.has_changed('is_active') or instance.tracker.has_changed('role'):
+        # Rescore in the background when ministry participation changes
+        EngagementRecalculationQueue.mark_dirty([instance.member_id])
 
 @receiver(m2m_changed, sender=Member.skills.through)
 def handle_skills_update(sender, instance, action, **kwargs):
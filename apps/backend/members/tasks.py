@@ -0,0 +1,26 @@
+import logging
+from celery import shared_task
+from .feature_pipeline import EngagementFeaturePipeline
+from .services import EngagementRecalculationQueue
+
+logger = logging.getLogger(__name__)
+
+@shared_task
+def refresh_engagement_features(full=False):
+    """Derive engagement inputs from messages and visits, then rescore the members"""
+    try:
+        updated = EngagementFeaturePipeline().run(full=full)
+        return f"Refreshed engagement features for {updated} members"
+    except Exception as e:
+        logger.error(f"Error refreshing engagement features: {str(e)}")
+        raise
+
+@shared_task
+def drain_engagement_queue(batch_size=1000):
+    """Rescore members whose data changed since the last drain"""
+    try:
+        scored = EngagementRecalculationQueue().drain(batch_size)
+        return f"Rescored {scored} members"
+    except Exception as e:
+        logger.error(f"Error draining engagement queue: {str(e)}")
+        raise
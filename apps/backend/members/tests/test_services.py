@@ -1,8 +1,13 @@
-from django.test import TestCase
+from datetime import timedelta
+from django.db.models.signals import post_save
+from django.test import TestCase, override_settings
+from django.utils import timezone
 from django.contrib.auth.models import User
-from members.models import Member, MemberEngagement
+from members.models import BatchJobState, Member, MemberEngagement
 from churches.models import Branch
-from members.services import EngagementCalculator, MemberService
+from core.tracking import changed_any
+from members.batch_runner import MemberBatchRunner, SyncEngagementJob, plan_shards
+from members.services import EngagementCalculator, EngagementRecalculationQueue, MemberService
 from members.integration.services import CmasIntegrationService
 
 class EngagementCalculatorTest(TestCase):
@@ -59,6 +64,210 @@ class EngagementCalculatorTest(TestCase):
         # Test inactive
         tier = self.calculator._determine_engagement_tier(15)
         self.assertEqual(tier, 'inactive')
+    
+    def test_bulk_scores_match_per_member_scores(self):
+        """Bulk scoring gives the same score and tier as the per-member path"""
+        other = Member.objects.create(
+            user=User.objects.create_user(username='quiet', email='quiet@example.com'),
+            branch=self.branch,
+            member_id='TEST20240002'
+        )
+        MemberEngagement.objects.filter(member=self.member).update(last_communication=timezone.now() - timedelta(days=10))
+        
+        bulk = self.calculator.calculate_engagement_scores_bulk([self.member.pk, other.pk])
+        bulk_rows = {e.member_id: (e.engagement_score, e.engagement_tier) for e in MemberEngagement.objects.all()}
+        
+        for member in (self.member, other):
+            score = self.calculator.calculate_engagement_score(member)
+            member.engagement.refresh_from_db()
+            self.assertEqual(bulk[member.pk], score)
+            self.assertEqual(bulk_rows[member.pk], (member.engagement.engagement_score, member.engagement.engagement_tier))
+
+class EngagementFeaturePipelineTest(TestCase):
+    
+    def setUp(self):
+        from communications.models import CommunicationChannel, MessageTemplate
+        
+        self.user = User.objects.create_user(username='reader', email='reader@example.com')
+        self.sender = User.objects.create_user(username='office', email='office@example.com')
+        self.branch = Branch.objects.create(name='Test Branch', code='TEST')
+        self.member = Member.objects.create(user=self.user, branch=self.branch, member_id='TEST20240003')
+        channel = CommunicationChannel.objects.create(name='Email', channel_type='email')
+        self.template = MessageTemplate.objects.create(
+            name='Notice', template_type='welcome', content='Hello', channel=channel, created_by=self.sender
+        )
+    
+    def _message(self, **fields):
+        from communications.models import Message
+        fields.setdefault('sent_at', timezone.now())
+        return Message.objects.create(
+            template=self.template, channel=self.template.channel, from_user=self.sender,
+            to_user=self.user, content='Hello', **fields
+        )
+    
+    def test_communication_features_from_messages(self):
+        """Response rate and last communication come from delivered messages"""
+        from members.feature_pipeline import EngagementFeaturePipeline
+        
+        read_at = timezone.now() - timedelta(days=2)
+        self._message(status='read', read_at=read_at)
+        self._message(status='delivered')
+        self._message(status='failed')
+        
+        features = EngagementFeaturePipeline().communication_features({self.user.id: self.member.id}, timezone.now())
+        
+        self.assertEqual(features[self.member.id], (50.0, read_at))
+    
+    def test_changed_users_since_watermark(self):
+        from members.feature_pipeline import EngagementFeaturePipeline
+        
+        watermark = timezone.now()
+        self.assertNotIn(self.user.id, EngagementFeaturePipeline().changed_user_ids(watermark))
+        
+        self._message(status='sent')
+        self.assertIn(self.user.id, EngagementFeaturePipeline().changed_user_ids(watermark))
+    
+    def test_reads_of_older_messages_are_changes(self):
+        from members.feature_pipeline import EngagementFeaturePipeline
+        
+        message = self._message(status='delivered', sent_at=timezone.now() - timedelta(days=3))
+        watermark = timezone.now()
+        self.assertNotIn(self.user.id, EngagementFeaturePipeline().changed_user_ids(watermark))
+        
+        type(message).objects.filter(pk=message.pk).update(status='read', read_at=timezone.now())
+        self.assertIn(self.user.id, EngagementFeaturePipeline().changed_user_ids(watermark))
+
+class EngagementRecalculationQueueTest(TestCase):
+    
+    def test_members_are_queued_only_after_commit(self):
+        """Nothing is queued while the writing transaction is still open"""
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            EngagementRecalculationQueue.mark_dirty([1, 2])
+            EngagementRecalculationQueue.mark_dirty([None])
+        
+        self.assertEqual(len(callbacks), 1)
+    
+    def test_member_updates_are_queued(self):
+        """The live Member receiver queues the member for rescoring"""
+        branch = Branch.objects.create(name='Test Branch', code='TEST')
+        member = Member.objects.create(
+            user=User.objects.create_user(username='queuedmember'),
+            branch=branch,
+            member_id='TEST20240010'
+        )
+        
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            member.membership_status = 'inactive'
+            member.save()
+        
+        queued = [callback for callback in callbacks if callback.__qualname__.startswith('EngagementRecalculationQueue.mark_dirty')]
+        self.assertEqual(len(queued), 1)
+        
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            member.occupation = 'Teacher'
+            member.save()
+        
+        # Occupation does not feed the score, so nothing is queued
+        queued = [callback for callback in callbacks if callback.__qualname__.startswith('EngagementRecalculationQueue.mark_dirty')]
+        self.assertEqual(queued, [])
+
+class MemberChangeTrackingTest(TestCase):
+    
+    def setUp(self):
+        user = User.objects.create_user(username='trackedmember')
+        branch = Branch.objects.create(name='Test Branch', code='TEST')
+        Member.objects.create(user=user, branch=branch, member_id='TEST20240003')
+        self.member = Member.objects.get(member_id='TEST20240003')
+        self.saves = []
+        post_save.connect(self._record_save, sender=Member)
+        self.addCleanup(post_save.disconnect, self._record_save, sender=Member)
+    
+    def _record_save(self, sender, instance, update_fields=None, **kwargs):
+        self.saves.append(set(update_fields or ()))
+    
+    def test_unchanged_save_is_skipped(self):
+        """Saving a member with no edits sends no query and no signals"""
+        with self.assertNumQueries(0):
+            self.member.save()
+        
+        self.assertEqual(self.saves, [])
+    
+    def test_only_changed_fields_are_written(self):
+        """Edits are saved with update_fields and visible to handlers"""
+        self.member.occupation = 'Teacher'
+        self.assertTrue(self.member.tracker.has_changed('occupation'))
+        self.assertFalse(self.member.tracker.has_changed('membership_status'))
+        self.assertEqual(self.member.tracker.previous('occupation'), '')
+        
+        self.member.save()
+        
+        self.assertEqual(self.saves, [{'occupation', 'updated_at'}])
+        self.assertEqual(self.member.tracker.changed(), {})
+        self.assertEqual(Member.objects.get(pk=self.member.pk).occupation, 'Teacher')
+    
+    def test_handlers_see_only_the_fields_that_changed(self):
+        """changed_any lets handlers skip work for unrelated columns"""
+        self.member.occupation = 'Teacher'
+        
+        self.assertTrue(changed_any(self.member, ['occupation', 'membership_status']))
+        self.assertFalse(changed_any(self.member, ['membership_status', 'branch']))
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'batch-runner-tests'}})
+class MemberBatchRunnerTest(TestCase):
+    
+    def setUp(self):
+        self.branches = [
+            Branch.objects.create(name='North Branch', code='NTH'),
+            Branch.objects.create(name='South Branch', code='STH'),
+        ]
+        self.members = [
+            Member.objects.create(
+                user=User.objects.create_user(username=f'batchmember{i}'),
+                branch=self.branches[i % 2],
+                member_id=f'TEST2024{i:04d}'
+            )
+            for i in range(5)
+        ]
+    
+    def test_shards_cover_every_member_once(self):
+        """Branch and id-range shards split the members without overlap"""
+        queryset = SyncEngagementJob().get_queryset()
+        
+        self.assertEqual(
+            {shard['branch'] for shard in plan_shards(queryset, 'branch', 4)},
+            {branch.id for branch in self.branches}
+        )
+        ranges = plan_shards(queryset, 'range', 2)
+        self.assertEqual(len(ranges), 2)
+        self.assertEqual(ranges[0]['min_id'], self.members[0].pk)
+        self.assertEqual(ranges[0]['max_id'] + 1, ranges[1]['min_id'])
+        self.assertEqual(ranges[1]['max_id'], self.members[-1].pk)
+    
+    def test_run_scores_members_and_records_checkpoints(self):
+        """Every member is scored once and the run is marked complete"""
+        totals = MemberBatchRunner(SyncEngagementJob(), batch_size=2, shard_by='range').run(report=lambda line: None)
+        
+        self.assertEqual(totals['processed'], len(self.members))
+        self.assertEqual(totals['failed'], 0)
+        self.assertEqual(MemberEngagement.objects.filter(member__in=self.members).count(), len(self.members))
+        self.assertTrue(BatchJobState.objects.get(name='sync_member_engagement').last_run_stats['complete'])
+    
+    def test_resume_skips_finished_work(self):
+        """A resumed run continues from each shard's last checkpoint"""
+        runner = MemberBatchRunner(SyncEngagementJob(), batch_size=10, shard_by='branch')
+        shards = runner.prepare()
+        # The first shard finished before the run was interrupted
+        done = shards[0]
+        BatchJobState.objects.create(
+            name=f"sync_member_engagement:{done['key']}",
+            last_run_stats={'last_id': self.members[-1].pk, 'processed': 3, 'failed': 0, 'seconds': 1.0, 'done': True}
+        )
+        
+        totals = MemberBatchRunner(SyncEngagementJob(), batch_size=10, shard_by='branch', resume=True).run(report=lambda line: None)
+        
+        remaining = Member.objects.exclude(branch_id=done['branch']).count()
+        self.assertEqual(totals['processed'], 3 + remaining)
+        self.assertFalse(MemberEngagement.objects.filter(member__branch_id=done['branch']).exists())
 
 class MemberServiceTest(TestCase):
     
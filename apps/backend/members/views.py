@@ -8,6 +8,8 @@ from django.utils import timezone
 from datetime import timedelta
 import logging
 
+from core.http_cache import ResponseCacheMixin
+from core.result_cache import get_or_compute
 from .models import Member, Family, WelfareCase, WelfareUpdate, MemberEngagement, MinistryParticipation
 from .serializers import (
     MemberSerializer, MemberCreateSerializer, FamilySerializer,
@@ -19,8 +21,9 @@ from .permissions import MemberPermissions, WelfareCasePermissions
 
 logger = logging.getLogger(__name__)
 
-class MemberViewSet(viewsets.ModelViewSet):
+class MemberViewSet(ResponseCacheMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated, MemberPermissions]
+    cache_namespace = 'members'
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_class = MemberFilter
     search_fields = ['user__first_name', 'user__last_name', 'user__email', 'member_id']
@@ -169,7 +172,22 @@ class MemberViewSet(viewsets.ModelViewSet):
     def engagement_report(self, request):
         """Generate engagement analytics for members"""
         queryset = self.get_queryset()
+        user = request.user
         
+        # Admin and branch-wide reports are shared; narrower views are computed per request
+        if user.groups.filter(name='Platform Admins').exists():
+            report = get_or_compute('members', None, 'engagement_report', [], lambda: self._engagement_report(queryset))
+        elif user.groups.filter(name='Branch Managers').exists() and getattr(user, 'managed_branch', None):
+            report = get_or_compute(
+                'members', user.managed_branch.pk, 'engagement_report', [],
+                lambda: self._engagement_report(queryset)
+            )
+        else:
+            report = self._engagement_report(queryset)
+        
+        return Response(report)
+
+    def _engagement_report(self, queryset):
         # Basic engagement stats
         total_members = queryset.count()
         active_members = queryset.filter(membership_status='active').count()
@@ -199,14 +217,14 @@ class MemberViewSet(viewsets.ModelViewSet):
         # Welfare category breakdown
         welfare_breakdown = list(queryset.values('welfare_category').annotate(count=Count('id')))
         
-        return Response({
+        return {
             'total_members': total_members,
             'active_members': active_members,
             'engagement_stats': engagement_stats,
             'welfare_summary': welfare_summary,
             'status_breakdown': status_breakdown,
             'welfare_breakdown': welfare_breakdown,
-        })
+        }
 
     @action(detail=True, methods=['get'])
     def welfare_cases(self, request, pk=None):
@@ -286,8 +304,9 @@ class MemberViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
-class WelfareCaseViewSet(viewsets.ModelViewSet):
+class WelfareCaseViewSet(ResponseCacheMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated, WelfareCasePermissions]
+    cache_namespace = 'members'
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_class = WelfareCaseFilter
     search_fields = ['title', 'member__user__first_name', 'member__user__last_name', 'member__member_id']